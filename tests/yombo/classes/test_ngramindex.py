@@ -0,0 +1,158 @@
+from yombo.classes.fuzzysearch import FuzzySearch
+from yombo.classes.ngramindex import NGramIndex
+from yombo.utils import do_search_instance
+
+from difflib import SequenceMatcher
+import random
+from types import SimpleNamespace
+import pytest
+
+LABELS = [
+    "Porch Light", "Kitchen Light", "Kitchen Fan", "Living Room Lamp", "Garage Door", "Front Door Lock",
+    "Back Door Lock", "Thermostat", "Basement Heater", "Pool Pump", "ab", "ba", "Xabcdefgh", "x",
+]
+LIMITERS = [0, .1, .3, .5, .6, .7, .75, .8, .85, .9, .99]
+
+
+def random_strings(count, seed):
+    rand = random.Random(seed)
+    return ["".join(rand.choice("abcdeXY ") for _ in range(rand.randint(1, 14))) for _ in range(count)]
+
+
+def brute_force(labels, text, limiter):
+    """ Every label that SequenceMatcher would accept, what the index must never drop. """
+    results = {}
+    for key, label in labels.items():
+        ratio = SequenceMatcher(None, label.lower(), str(text).lower()).ratio()
+        if ratio >= limiter:
+            results[key] = ratio
+    return results
+
+
+class TestNGramIndex:
+
+    @pytest.fixture
+    def labels(self):
+        return {f"id{i}": label for i, label in enumerate(LABELS)}
+
+    @pytest.fixture
+    def index(self, labels):
+        index = NGramIndex()
+        for key, label in labels.items():
+            index.add(key, label)
+        return index
+
+    def test_add_remove(self, index, labels):
+        assert len(index) == len(labels)
+        assert "id0" in index
+        index.remove("id0")
+        assert "id0" not in index
+        assert "id0" not in index.candidates("Porch Light", .9)
+        index.remove("id0")  # No error.
+        assert all(len(keys) for keys in index.grams.values())
+        index.clear()
+        assert len(index) == 0
+        assert index.grams == {}
+
+    def test_replace(self, index):
+        index.add("id0", "Deck Light")
+        assert "id0" in index.candidates("deck light", .9)
+        assert "id0" not in index.grams.get("por", ())  # The old string's n-grams are gone.
+        assert index.keys["id0"][0] == "Deck Light"
+
+    def test_candidates_order(self, index):
+        candidates = index.candidates("kitchen light", .5)
+        assert candidates.index("id1") < candidates.index("id2")  # Shares more n-grams.
+
+    def test_length_pruning(self, index):
+        assert "id13" not in index.candidates("Living Room Lamp", .5)  # "x" can't reach .5
+
+    def test_no_shared_ngrams_below_prune_limiter(self, index):
+        # "ab" and "ba" have no trigrams in common, but still have a ratio of .5
+        assert SequenceMatcher(None, "ab", "ba").ratio() == .5
+        assert "id11" in index.candidates("ab", .5)
+        assert "id11" not in index.candidates("ab", index.prune_limiter)
+
+        # Lots of 2 character blocks, one extra character between them.
+        text = "Yab_cd_ef_gh_"
+        assert not index.ngrams(text) & index.ngrams("Xabcdefgh")
+        assert SequenceMatcher(None, "xabcdefgh", text.lower()).ratio() >= .6
+        assert "id12" in index.candidates(text, .6)
+
+    @pytest.mark.parametrize("size", [1, 2, 3, 4])
+    def test_prune_limiter_is_an_upper_bound(self, size):
+        index = NGramIndex(size)
+        strings = random_strings(300, size)
+        for first in strings[:150]:
+            for second in strings[150:]:
+                if index.ngrams(first) & index.ngrams(second):
+                    continue
+                assert SequenceMatcher(None, first.lower(), second.lower()).ratio() < index.prune_limiter
+
+    @pytest.mark.parametrize("limiter", LIMITERS)
+    def test_search_parity(self, index, labels, limiter):
+        searches = LABELS + ["porch lite", "kitchn", "door", "lamp living", "THERMO", "zzz", "ab"]
+        for text in searches + random_strings(40, 1):
+            expected = brute_force(labels, text, limiter)
+            assert set(index.candidates(text, limiter)) >= set(expected), text
+            assert dict(index.search(text, limiter)) == expected, text
+
+    @pytest.mark.parametrize("limiter", LIMITERS)
+    def test_search_parity_random(self, limiter):
+        index = NGramIndex()
+        labels = dict(enumerate(random_strings(200, 2)))
+        for key, label in labels.items():
+            index.add(key, label)
+        for text in random_strings(40, 3):
+            assert dict(index.search(text, limiter)) == brute_force(labels, text, limiter), text
+
+    def test_search_max_results(self, index):
+        results = index.search("door lock", .5, max_results=2)
+        assert len(results) == 2
+        assert results[0][1] >= results[1][1]
+
+
+class TestFuzzySearchParity:
+
+    @pytest.mark.parametrize("limiter", [.1, .5, .75, .9])
+    def test_search(self, limiter):
+        labels = {label: label for label in LABELS + random_strings(100, 4)}
+        items = FuzzySearch(labels, limiter)
+        for text in random_strings(60, 5) + ["porch lite", "kitchn light", "ba"]:
+            expected = brute_force(labels, text, limiter)
+            results = items.search(text)
+            assert results["valid"] is (len(expected) > 0), text
+            if len(expected):
+                assert results["ratio"] == max(expected.values()), text
+
+
+class TestDoSearchInstanceParity:
+
+    @pytest.fixture
+    def haystack(self):
+        labels = LABELS + random_strings(100, 6)
+        return {f"id{i}": SimpleNamespace(label=label, status=i % 2) for i, label in enumerate(labels)}
+
+    @pytest.fixture
+    def indexes(self, haystack):
+        index = NGramIndex()
+        for item_id, item in haystack.items():
+            index.add(item_id, item.label)
+        return {"label": index}
+
+    @pytest.mark.parametrize("limiter", [.1, .3, .5, .7, .8, .9, .99])
+    def test_indexed_matches_brute_force(self, haystack, indexes, limiter):
+        for text in random_strings(40, 7) + ["porch lite", "Kitchen", "Door Lock", "ab"]:
+            arguments = {
+                "attributes": {"label": text},
+                "haystack": haystack,
+                "allowed_keys": ["label"],
+                "limiter": limiter,
+                "required_field": "status",
+                "required_value": 1,
+            }
+            expected = do_search_instance(**arguments)
+            results = do_search_instance(indexes=indexes, **arguments)
+            assert results["ratios"] == expected["ratios"], text
+            assert results["was_found"] == expected["was_found"], text
+            assert results["best_ratio"] == expected["best_ratio"], text
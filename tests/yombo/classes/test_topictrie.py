@@ -0,0 +1,124 @@
+from yombo.classes.topictrie import TopicDict, TopicTrie
+from yombo.utils import pattern_search
+
+import pytest
+
+KEYS = [
+    "yombo.status.hello",
+    "yombo.status.bye",
+    "yombo.device.porch.light",
+    "yombo.device.kitchen.light",
+    "visitor.livingroom.hello",
+    "visitor.kitchen.bye",
+]
+
+
+class TestTopicTrie:
+
+    @pytest.fixture
+    def trie(self):
+        return TopicTrie(KEYS)
+
+    def test_exact(self, trie):
+        assert len(trie) == len(KEYS)
+        assert "yombo.status.hello" in trie
+        assert "yombo.status" not in trie
+        assert trie.search("yombo.status.hello") == ["yombo.status.hello"]
+        assert trie.search("yombo.status.missing") == []
+
+    def test_single_level_wildcard(self, trie):
+        assert sorted(trie.search("yombo.status.+")) == ["yombo.status.bye", "yombo.status.hello"]
+        assert sorted(trie.search("yombo.device.+.light")) == ["yombo.device.kitchen.light",
+                                                               "yombo.device.porch.light"]
+        assert sorted(trie.search("+.kitchen.bye")) == ["visitor.kitchen.bye"]
+        assert trie.search("yombo.+") == []  # + is exactly one level.
+
+    def test_multi_level_wildcard(self, trie):
+        assert sorted(trie.search("#.hello")) == ["visitor.livingroom.hello", "yombo.status.hello"]
+        assert sorted(trie.search("yombo.#")) == sorted(key for key in KEYS if key.startswith("yombo."))
+        assert sorted(trie.search("#")) == sorted(KEYS)
+        assert sorted(trie.search("yombo.#.light")) == ["yombo.device.kitchen.light", "yombo.device.porch.light"]
+
+    def test_multi_level_wildcard_matches_no_levels(self):
+        trie = TopicTrie(["a.b", "a.x.b", "a.x.y.b"])
+        assert sorted(trie.search("a.#.b")) == ["a.b", "a.x.b", "a.x.y.b"]
+
+    def test_mixed_wildcards(self, trie):
+        assert sorted(trie.search("+.#.bye")) == ["visitor.kitchen.bye", "yombo.status.bye"]
+
+    def test_custom_separator(self):
+        trie = TopicTrie(["a/b/c", "a/d/c"], separator="/")
+        assert sorted(trie.search("a/+/c")) == ["a/b/c", "a/d/c"]
+
+    def test_add_duplicate(self, trie):
+        trie.add("yombo.status.hello")
+        assert len(trie) == len(KEYS)
+
+    def test_remove(self, trie):
+        trie.remove("yombo.status.hello")
+        assert "yombo.status.hello" not in trie
+        assert len(trie) == len(KEYS) - 1
+        assert trie.search("#.hello") == ["visitor.livingroom.hello"]
+        with pytest.raises(KeyError):
+            trie.remove("yombo.status.hello")
+        with pytest.raises(KeyError):
+            trie.remove("yombo.status")  # A branch, not a key.
+        trie.discard("yombo.status.hello")  # No error.
+
+    def test_remove_prunes_empty_nodes(self):
+        trie = TopicTrie(["a.b.c", "a.x"])
+        trie.remove("a.b.c")
+        assert "b" not in trie._root.children["a"].children
+        trie.remove("a.x")
+        assert trie._root.children == {}
+        assert len(trie) == 0
+
+    def test_remove_keeps_shared_nodes(self):
+        trie = TopicTrie(["a.b", "a.b.c"])
+        trie.remove("a.b.c")
+        assert "a.b" in trie
+        assert trie._root.children["a"].children["b"].children == {}
+        trie.add("a.b.c")
+        trie.remove("a.b")
+        assert "a.b.c" in trie
+        assert "a.b" not in trie
+
+    def test_iter_and_clear(self, trie):
+        assert sorted(trie) == sorted(KEYS)
+        trie.clear()
+        assert len(trie) == 0
+        assert trie.search("#") == []
+
+    @pytest.mark.parametrize("pattern", [
+        "yombo.status.+",
+        "yombo.device.+.light",
+        "#.hello",
+        "#.bye",
+        "yombo.#",
+        "visitor.#",
+        "#.light",
+        "+.kitchen.bye",
+        "nothing.+",
+    ])
+    def test_parity_with_pattern_search(self, trie, pattern):
+        assert sorted(trie.search(pattern)) == sorted(pattern_search(pattern, KEYS))
+
+
+class TestTopicDict:
+
+    def test_tracks_keys(self):
+        items = TopicDict({"yombo.status.hello": 1})
+        items["yombo.status.bye"] = 2
+        items.setdefault("visitor.kitchen.bye", 3)
+        items.update({"visitor.livingroom.hello": 4})
+        assert sorted(items.search("yombo.#")) == ["yombo.status.bye", "yombo.status.hello"]
+        assert sorted(items.search("#.bye")) == ["visitor.kitchen.bye", "yombo.status.bye"]
+
+        del items["yombo.status.bye"]
+        assert items.pop("visitor.kitchen.bye") == 3
+        assert items.pop("missing", None) is None
+        assert items.search("#.bye") == []
+        assert sorted(items.trie) == sorted(items.keys())
+
+        items.clear()
+        assert items.search("#") == []
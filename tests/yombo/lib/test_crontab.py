@@ -0,0 +1,131 @@
+from yombo.constants.crontabs import CRONTAB_CATCH_UP_MAX, CRONTAB_LATE_GRACE
+from yombo.core.exceptions import YomboCronTabError
+from yombo.lib.crontab import CronTask
+
+from datetime import datetime
+import pytest
+
+
+def ts(*args):
+    """ Local timestamp for the given datetime parts, matches how next_run_time works. """
+    return datetime(*args).timestamp()
+
+
+class FakeStatistics:
+    def __init__(self):
+        self.count = 0
+
+    def increment(self, *args, **kwargs):
+        self.count += 1
+
+
+class FakeCronTab:
+    """ Just enough of the CronTab library for a CronTask to run. """
+    def __init__(self):
+        self._Statistics = FakeStatistics()
+
+    def remove(self, cron_id):
+        pass
+
+
+class TestCronTaskNextRunTime:
+
+    def new_task(self, **kwargs):
+        return CronTask(FakeCronTab(), lambda: None, **kwargs)
+
+    def test_every_minute(self):
+        task = self.new_task()
+        assert task.next_run_time(ts(2024, 3, 10, 8, 15, 30)) == ts(2024, 3, 10, 8, 16)
+        assert task.next_run_time(ts(2024, 3, 10, 8, 15)) == ts(2024, 3, 10, 8, 16)  # Strictly after.
+
+    def test_minute_and_hour(self):
+        task = self.new_task(mins=0, hours=(0, 6, 12, 18))
+        assert task.next_run_time(ts(2024, 3, 10, 8, 15)) == ts(2024, 3, 10, 12, 0)
+        assert task.next_run_time(ts(2024, 3, 10, 18, 0)) == ts(2024, 3, 11, 0, 0)
+        assert task.next_run_time(ts(2024, 12, 31, 23, 59)) == ts(2025, 1, 1, 0, 0)
+
+    def test_minute_range(self):
+        task = self.new_task(mins=range(0, 60, 15))
+        assert task.next_run_time(ts(2024, 3, 10, 8, 1)) == ts(2024, 3, 10, 8, 15)
+        assert task.next_run_time(ts(2024, 3, 10, 8, 45)) == ts(2024, 3, 10, 9, 0)
+
+    def test_day_and_month(self):
+        task = self.new_task(mins=30, hours=9, days=15, months=(1, 7))
+        assert task.next_run_time(ts(2024, 3, 10, 8, 15)) == ts(2024, 7, 15, 9, 30)
+        assert task.next_run_time(ts(2024, 7, 15, 9, 30)) == ts(2025, 1, 15, 9, 30)
+        assert task.next_run_time(ts(2024, 7, 15, 9, 29)) == ts(2024, 7, 15, 9, 30)
+
+    def test_day_of_week(self):
+        task = self.new_task(mins=0, hours=12, dow=0)  # Monday, same as datetime.weekday().
+        assert datetime(2024, 1, 1).weekday() == 0
+        assert task.next_run_time(ts(2024, 1, 1, 12, 0)) == ts(2024, 1, 8, 12, 0)
+        assert task.next_run_time(ts(2024, 1, 3, 10, 0)) == ts(2024, 1, 8, 12, 0)
+
+    def test_day_of_month_and_week_must_both_match(self):
+        task = self.new_task(mins=0, hours=0, days=13, dow=4)  # Friday the 13th.
+        assert task.next_run_time(ts(2024, 1, 1)) == ts(2024, 9, 13, 0, 0)
+        assert task.next_run_time(ts(2024, 9, 13)) == ts(2024, 12, 13, 0, 0)
+
+    def test_leap_day(self):
+        task = self.new_task(mins=0, hours=0, days=29, months=2)
+        assert task.next_run_time(ts(2024, 3, 1)) == ts(2028, 2, 29, 0, 0)
+
+    @pytest.mark.parametrize("days, months", [
+        (30, 2),
+        (31, (4, 6, 9, 11)),
+        (32, "*"),
+    ])
+    def test_impossible_dates(self, days, months):
+        task = self.new_task(mins=0, hours=0, days=days, months=months)
+        assert task.next_run_time(ts(2024, 1, 1)) is None
+
+    def test_invalid_catch_up(self):
+        with pytest.raises(YomboCronTabError):
+            self.new_task(catch_up="sometimes")
+
+
+class TestCronTaskRunDue:
+
+    @pytest.fixture
+    def calls(self):
+        return []
+
+    def new_task(self, calls, catch_up=None, **kwargs):
+        task = CronTask(FakeCronTab(), lambda *args: calls.append(args), catch_up=catch_up,
+                        args=("hello",), **kwargs)
+        task.next_run = ts(2024, 3, 10, 8, 0)
+        return task
+
+    @pytest.mark.parametrize("catch_up", ["once", "all", "skip"])
+    def test_on_time(self, calls, catch_up):
+        task = self.new_task(calls, catch_up)
+        task.run_due(task.next_run + CRONTAB_LATE_GRACE)  # Late, but within the grace period.
+        assert calls == [("hello",)]
+        assert task._Parent._Statistics.count == 1
+
+    def test_late_once(self, calls):
+        task = self.new_task(calls, "once")
+        task.run_due(ts(2024, 3, 10, 8, 5))
+        assert len(calls) == 1
+
+    def test_late_all(self, calls):
+        task = self.new_task(calls, "all")
+        task.run_due(ts(2024, 3, 10, 8, 5, 30))  # Missed 8:00 through 8:05.
+        assert len(calls) == 6
+        assert task._Parent._Statistics.count == 6
+
+    def test_late_all_only_counts_matching_times(self, calls):
+        task = self.new_task(calls, "all", mins=(0, 30))
+        task.run_due(ts(2024, 3, 10, 10, 15))  # Missed 8:00, 8:30, 9:00, 9:30, 10:00.
+        assert len(calls) == 5
+
+    def test_late_all_is_capped(self, calls):
+        task = self.new_task(calls, "all")
+        task.run_due(ts(2024, 3, 11, 8, 0))
+        assert len(calls) == CRONTAB_CATCH_UP_MAX
+
+    def test_late_skip(self, calls):
+        task = self.new_task(calls, "skip")
+        task.run_due(ts(2024, 3, 10, 8, 5))
+        assert calls == []
+        assert task._Parent._Statistics.count == 0
@@ -4,6 +4,8 @@ Allows fuzzy, non-exact, key search on dictionary keys. This expands on the base
 This class is helpful for finding dictionary keys when the key only needs to be approximate and not exact. The search
 exactness can be fine tuned using a percent value from .99 - .10, the default 75%.
 
+String keys are kept in a trigram index, so only keys sharing part of the search string are scored.
+
 **Usage**:
 
 .. code-block:: python
@@ -39,6 +41,7 @@ import operator
 from typing import Optional, Union
 
 # Import Yombo libraries
+from yombo.classes.ngramindex import NGramIndex
 from yombo.core.exceptions import YomboFuzzySearchError
 
 
@@ -65,6 +68,7 @@ class FuzzySearch(dict):
             limiter = .10
     
         self.limiter = limiter
+        self.key_index = NGramIndex()
 
         if seed:
             self.update(seed)
@@ -76,6 +80,37 @@ class FuzzySearch(dict):
         self._dict_getitem = lambda key: \
             super(FuzzySearch, self).__getitem__(key)
 
+    def __setitem__(self, key, value):
+        super(FuzzySearch, self).__setitem__(key, value)
+        if isinstance(key, str):
+            self.key_index.add(key, key)
+
+    def __delitem__(self, key):
+        super(FuzzySearch, self).__delitem__(key)
+        self.key_index.remove(key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if not self._dict_contains(key):
+            self[key] = default
+        return self._dict_getitem(key)
+
+    def pop(self, key, *args):
+        self.key_index.remove(key)
+        return super(FuzzySearch, self).pop(key, *args)
+
+    def popitem(self):
+        key, value = super(FuzzySearch, self).popitem()
+        self.key_index.remove(key)
+        return key, value
+
+    def clear(self):
+        super(FuzzySearch, self).clear()
+        self.key_index.clear()
+
     def __contains__(self, search_for: Union[str, int]) -> bool:
         """
         Overides python dict __contains__ - Return true if search_for is
@@ -170,29 +205,33 @@ class FuzzySearch(dict):
         if self._dict_contains(search_for):
             return True, search_for, self._dict_getitem(search_for), 1, {}
 
+        limiter_final = None
+        if limiter is not None:
+            if limiter > .99999999999:
+                limiter = .99
+            elif limiter < .10:
+                limiter = .10
+            limiter_final = limiter
+        else:
+            limiter_final = self.limiter
+
         # otherwise, we will fuzzy search it. Prepare the minions.
         stringDiffLib = SequenceMatcher()
-        stringDiffLib.set_seq1(search_for.lower())
+        try:
+            stringDiffLib.set_seq2(search_for.lower())
+        except AttributeError:
+            return False, None, None, 0, None  # Only string keys are fuzzy searched.
 
-        # examine each key in the dict
+        # examine each key that shares part of the search string.
         best_ratio = 0
         best_match = None
         best_key = None
         
         key_list = {}
         sorted_list = None
-        for key in self:
-            # key must be a string, otherwise it is skipped!
-            try:
-                stringDiffLib.set_seq2(key.lower())
-            except TypeError:
-                continue                # might get here, even though it"s not a string. Catch it!
-
-            try:
-                # get the match ratio
-                curRatio = stringDiffLib.ratio()
-            except TypeError:
-                break
+        for key in self.key_index.candidates(search_for, limiter_final):
+            stringDiffLib.set_seq1(key.lower())
+            curRatio = stringDiffLib.ratio()
 
             # if this is the best ratio so far - save it and the value
             if curRatio > best_ratio:
@@ -202,18 +241,10 @@ class FuzzySearch(dict):
             
             # return a list of the top 5 key matches on failure.
             key_list[curRatio] = {"key": key, "value": self._dict_getitem(key), "ratio": curRatio}
+
+        if len(key_list):
             sorted_list = self.take(5, sorted(iter(key_list.items()), key=operator.itemgetter(0), reverse=True))
 
-        limiter_final = None
-        if limiter is not None:
-            if limiter > .99999999999:
-                limiter = .99
-            elif limiter < .10:
-                limiter = .10
-            limiter_final = limiter
-        else:
-            limiter_final = self.limiter
-            
         return (
             best_ratio >= limiter_final,  # the part that does the actual check.
             best_key,
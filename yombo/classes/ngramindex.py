@@ -0,0 +1,169 @@
+"""
+An n-gram (trigram by default) index of strings, used to quickly find candidates for a fuzzy search.
+
+Instead of comparing a search string to every item, only items that share at least one n-gram with the
+search string, and are of a length that could reach the requested match ratio, are returned as candidates.
+The candidates can then be scored using SequenceMatcher.
+
+Strings that don't share an n-gram can still have matching blocks shorter than the n-gram size, so for low
+match ratios (below 0.8 for trigrams) every item of a suitable length is returned.
+
+**Usage**:
+
+.. code-block:: python
+
+   from yombo.classes.ngramindex import NGramIndex
+
+   index = NGramIndex()
+   index.add("abc123", "Porch Light")
+   index.add("def456", "Kitchen Light")
+   index.candidates("porch lite", limiter=.80)  # ["abc123"]
+   index.remove("def456")
+
+.. moduleauthor:: Mitch Schwenk <mitch-gw@yombo.net>
+.. versionadded:: 0.24.0
+
+:copyright: Copyright 2020 by Yombo.
+:license: LICENSE for details.
+:view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/_modules/yombo/classes/ngramindex.html>`_
+"""
+# Import python libraries
+from difflib import SequenceMatcher
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+
+class NGramIndex:
+    """
+    Maps n-grams to the keys of the strings that contain them.
+    """
+    def __init__(self, size: Optional[int] = None):
+        """
+        Setup the index.
+
+        :param size: The n-gram size, default is 3.
+        """
+        self.size = size or 3
+        # Without a shared n-gram, each matching block is shorter than the n-gram size, and the padding forces
+        # at least one unmatched character per block. SequenceMatcher.ratio() then stays below this value.
+        self.prune_limiter = 2.0 * (self.size - 1) / (2 * self.size - 1)
+        self.grams: Dict[str, Set[Hashable]] = {}
+        self.keys: Dict[Hashable, Tuple[str, frozenset]] = {}  # key -> (text, grams)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.keys
+
+    def ngrams(self, text: str) -> frozenset:
+        """
+        Returns the set of n-grams for a string. The string is lower cased and padded so that short strings,
+        and the start and end of strings, still produce n-grams.
+
+        :param text:
+        :return:
+        """
+        text = f"{' ' * (self.size - 1)}{text.lower()} "
+        return frozenset(text[i:i + self.size] for i in range(len(text) - self.size + 1))
+
+    def add(self, key: Hashable, text: Any) -> None:
+        """
+        Add or replace the string for a key.
+
+        :param key: The key to return when this string is a candidate.
+        :param text: The string to index, non-strings are converted with str().
+        """
+        text = str(text)
+        if key in self.keys:
+            if self.keys[key][0] == text:
+                return
+            self.remove(key)
+        grams = self.ngrams(text)
+        self.keys[key] = (text, grams)
+        for gram in grams:
+            if gram not in self.grams:
+                self.grams[gram] = set()
+            self.grams[gram].add(key)
+
+    def remove(self, key: Hashable) -> None:
+        """
+        Remove a key from the index.
+
+        :param key:
+        """
+        if key not in self.keys:
+            return
+        text, grams = self.keys.pop(key)
+        for gram in grams:
+            keys = self.grams.get(gram)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if len(keys) == 0:
+                del self.grams[gram]
+
+    def clear(self) -> None:
+        """ Remove everything from the index. """
+        self.grams.clear()
+        self.keys.clear()
+
+    def candidates(self, text: Any, limiter: Optional[float] = None) -> List[Hashable]:
+        """
+        Returns the keys that may match the text, most shared n-grams first.
+
+        Keys with a string length that makes the limiter ratio impossible to reach are dropped. If the limiter
+        is below prune_limiter, keys that don't share an n-gram are included as well, after those that do.
+
+        :param text: The string to search for.
+        :param limiter: The minimum match ratio that will be accepted, default is 0.
+        :return: A list of keys.
+        """
+        text = str(text)
+        if limiter is None:
+            limiter = 0
+        text_length = len(text)
+        counts: Dict[Hashable, int] = {}
+        for gram in self.ngrams(text):
+            for key in self.grams.get(gram, ()):
+                counts[key] = counts.get(key, 0) + 1
+        if limiter < self.prune_limiter:
+            for key in self.keys:
+                if key not in counts:
+                    counts[key] = 0
+
+        results = []
+        for key, count in counts.items():
+            length = len(self.keys[key][0])
+            # SequenceMatcher.ratio() can never be higher than this.
+            if length + text_length and 2.0 * min(length, text_length) / (length + text_length) < limiter:
+                continue
+            results.append((count, key))
+        results.sort(key=lambda result: result[0], reverse=True)
+        return [key for count, key in results]
+
+    def search(self, text: Any, limiter: Optional[float] = None,
+               max_results: Optional[int] = None) -> List[Tuple[Hashable, float]]:
+        """
+        Score the candidates with SequenceMatcher and return the best matches.
+
+        :param text: The string to search for.
+        :param limiter: The minimum match ratio to include, default is 0.
+        :param max_results: Only return this many of the best results, default is all of them.
+        :return: List of (key, ratio) tuples, highest ratio first.
+        """
+        if limiter is None:
+            limiter = 0
+        matcher = SequenceMatcher()
+        matcher.set_seq2(str(text).lower())
+        results = []
+        for key in self.candidates(text, limiter):
+            matcher.set_seq1(self.keys[key][0].lower())
+            if matcher.real_quick_ratio() < limiter or matcher.quick_ratio() < limiter:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= limiter:
+                results.append((key, ratio))
+        results.sort(key=lambda result: result[1], reverse=True)
+        if max_results:
+            return results[:max_results]
+        return results
@@ -0,0 +1,96 @@
+"""
+A preallocated, fixed size first in first out queue. When full, adding an item drops the oldest item.
+
+**Usage**:
+
+.. code-block:: python
+
+   from yombo.classes.ringbuffer import RingBuffer
+
+   queue = RingBuffer(2)
+   queue.append("a")
+   queue.append("b")
+   queue.append("c")  # Returns "a", the dropped item.
+   queue[0]  # "b", the oldest item.
+   queue.drain()  # ["b", "c"], the queue is now empty.
+
+.. moduleauthor:: Mitch Schwenk <mitch-gw@yombo.net>
+.. versionadded:: 0.24.0
+
+:copyright: Copyright 2020 by Yombo.
+:license: LICENSE for details.
+:view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/_modules/yombo/classes/ringbuffer.html>`_
+"""
+# Import python libraries
+from typing import Any, List
+
+
+class RingBuffer:
+    """
+    A bounded queue backed by a preallocated list.
+    """
+    __slots__ = ("maxlen", "dropped", "_items", "_start", "_count")
+
+    def __init__(self, maxlen: int):
+        """
+        Setup the buffer.
+
+        :param maxlen: Maximum number of items to hold.
+        """
+        self.maxlen = max(int(maxlen), 1)
+        self.dropped = 0  # How many items have been dropped because the buffer was full.
+        self._items = [None] * self.maxlen
+        self._start = 0  # Slot of the oldest item.
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> Any:
+        """ Get an item by position, 0 being the oldest and -1 the newest. """
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError("ring buffer index out of range")
+        return self._items[(self._start + index) % self.maxlen]
+
+    def __repr__(self) -> str:
+        return f"RingBuffer({self.peek()}, maxlen={self.maxlen})"
+
+    def append(self, item: Any) -> Any:
+        """
+        Add an item. If the buffer is full, the oldest item is dropped.
+
+        :param item:
+        :return: The dropped item, or None.
+        """
+        slot = (self._start + self._count) % self.maxlen
+        if self._count == self.maxlen:
+            dropped = self._items[slot]
+            self._items[slot] = item
+            self._start = (self._start + 1) % self.maxlen
+            self.dropped += 1
+            return dropped
+        self._items[slot] = item
+        self._count += 1
+        return None
+
+    def peek(self) -> List[Any]:
+        """ Returns the items, oldest first, without removing them. """
+        end = self._start + self._count
+        if end <= self.maxlen:
+            return self._items[self._start:end]
+        return self._items[self._start:] + self._items[:end - self.maxlen]
+
+    def drain(self) -> List[Any]:
+        """
+        Remove and return all items, oldest first. The preallocated slots are reused.
+
+        :return:
+        """
+        items = self.peek()
+        for index in range(self._count):
+            self._items[(self._start + index) % self.maxlen] = None
+        self._start = 0
+        self._count = 0
+        return items
@@ -0,0 +1,138 @@
+"""
+A fixed size history of compact state entries, newest first. Used by devices to track their state history
+without keeping a full state object (and it's attributes) for every entry. The entries are stored oldest first in a
+:py:class:`RingBuffer <yombo.classes.ringbuffer.RingBuffer>`, this class only reverses the indexing and keeps the
+entries sorted.
+
+Each entry is a small StateHistoryEntry tuple of (created_at, machine_state, machine_state_extra, state_id), the
+machine_state_extra dictionary is a reference to the state's own dictionary. Indexing the history returns the full
+state object, provided by the materialize callable. Use entry() to get the compact tuple without materializing
+anything.
+
+**Usage**:
+
+.. code-block:: python
+
+   from yombo.classes.statehistory import StateHistory, StateHistoryEntry
+
+   history = StateHistory(10, materialize=lambda entry: entry.machine_state)
+   history.add(StateHistoryEntry(created_at=1588000000, machine_state=1, state_id="abc123"))
+   history.add(StateHistoryEntry(created_at=1588000100, machine_state=0, state_id="def456"))
+   history[0]  # 0, from the newest entry.
+   history.entry(1).state_id  # "abc123"
+
+.. moduleauthor:: Mitch Schwenk <mitch-gw@yombo.net>
+.. versionadded:: 0.24.0
+
+:copyright: Copyright 2020 by Yombo.
+:license: LICENSE for details.
+:view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/_modules/yombo/classes/statehistory.html>`_
+"""
+# Import python libraries
+from collections import namedtuple
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+# Import Yombo libraries
+from yombo.classes.ringbuffer import RingBuffer
+
+StateHistoryEntry = namedtuple("StateHistoryEntry", ["created_at", "machine_state", "machine_state_extra", "state_id"],
+                               defaults=(None, None))
+
+
+class StateHistory:
+    """
+    A history of StateHistoryEntry tuples, index 0 being the newest.
+    """
+    __slots__ = ("materialize", "_entries")
+
+    def __init__(self, maxlen: int, materialize: Optional[Callable[[StateHistoryEntry], Any]] = None):
+        """
+        Setup the history.
+
+        :param maxlen: Maximum number of entries to keep, the oldest entries are dropped first.
+        :param materialize: Called with an entry to return the full state, default is to return the entry.
+        """
+        self.materialize = materialize
+        self._entries = RingBuffer(maxlen)  # Oldest first.
+
+    @property
+    def maxlen(self) -> int:
+        return self._entries.maxlen
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, index: int) -> Any:
+        entry = self.entry(index)
+        if self.materialize is None:
+            return entry
+        return self.materialize(entry)
+
+    def __iter__(self) -> Iterator[Any]:
+        for index in range(len(self._entries)):
+            yield self[index]
+
+    def __repr__(self) -> str:
+        return f"StateHistory({list(self.entries())}, maxlen={self.maxlen})"
+
+    def entry(self, index: int) -> StateHistoryEntry:
+        """
+        Get the compact entry at the index, 0 being the newest.
+
+        :param index:
+        :return: A StateHistoryEntry tuple.
+        """
+        count = len(self._entries)
+        if index < 0:
+            index += count
+        if index < 0 or index >= count:
+            raise IndexError("state history index out of range")
+        return self._entries[count - 1 - index]
+
+    def entries(self) -> Iterator[StateHistoryEntry]:
+        """ Iterate the compact entries, newest first. """
+        return reversed(self._entries.peek())
+
+    def find(self, state_id: str) -> Optional[StateHistoryEntry]:
+        """
+        Find the entry for a state id.
+
+        :param state_id:
+        :return: A StateHistoryEntry, or None if the state isn't in the history.
+        """
+        for entry in self._entries.peek():
+            if entry.state_id == state_id:
+                return entry
+        return None
+
+    def add(self, entry: StateHistoryEntry) -> Tuple[Optional[int], Optional[StateHistoryEntry]]:
+        """
+        Add an entry, keeping the history sorted newest first. New states are a single append, older
+        states (such as history loaded later) are inserted into their place.
+
+        :param entry: A StateHistoryEntry.
+        :return: A tuple of (position, dropped entry). Position is None if the entry was older than everything
+            in a full history, and the entry itself is returned as the dropped entry.
+        """
+        count = len(self._entries)
+        if count == 0 or entry.created_at >= self._entries[-1].created_at:
+            return 0, self._entries.append(entry)
+
+        position = count
+        while position > 0 and self.entry(position - 1).created_at < entry.created_at:
+            position -= 1
+        if position == self.maxlen:
+            return None, entry
+
+        entries = self._entries.drain()
+        entries.insert(count - position, entry)
+        dropped = None
+        for item in entries:
+            item = self._entries.append(item)
+            if item is not None:
+                dropped = item
+        return position, dropped
+
+    def clear(self) -> None:
+        """ Remove all entries. """
+        self._entries.drain()
@@ -0,0 +1,237 @@
+"""
+An MQTT style topic trie. Keys are split into levels using a separator (default is ".") and stored in a tree.
+This allows wildcard searches to only walk the branches that can possibly match instead of testing every key.
+
+Wildcards:
+
+* "+" - Matches exactly one level.
+* "#" - Matches any number of levels, including none.
+
+**Usage**:
+
+.. code-block:: python
+
+   from yombo.classes.topictrie import TopicDict, TopicTrie
+
+   trie = TopicTrie(["yombo.status.hello", "yombo.status.bye", "visitor.livingroom.hello"])
+   trie.search("#.hello")  # ["yombo.status.hello", "visitor.livingroom.hello"]
+   trie.search("yombo.status.+")  # ["yombo.status.hello", "yombo.status.bye"]
+
+   items = TopicDict({"yombo.status.hello": 1})  # A dictionary that keeps a topic trie of it's keys.
+   items["yombo.status.bye"] = 2
+   items.search("yombo.#")  # ["yombo.status.hello", "yombo.status.bye"]
+
+
+.. moduleauthor:: Mitch Schwenk <mitch-gw@yombo.net>
+.. versionadded:: 0.24.0
+
+:copyright: Copyright 2020 by Yombo.
+:license: LICENSE for details.
+:view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/_modules/yombo/classes/topictrie.html>`_
+"""
+# Import python libraries
+from typing import Iterable, List, Optional
+
+WILDCARD_SINGLE = "+"
+WILDCARD_MULTI = "#"
+
+
+class TopicTrieNode:
+    """
+    A single level within the topic trie.
+    """
+    __slots__ = ("children", "key")
+
+    def __init__(self):
+        self.children = {}
+        self.key = None  # Set to the full key if a key ends at this node.
+
+
+class TopicTrie:
+    """
+    Stores keys in a trie, split by levels. Supports exact and wildcard searches.
+    """
+    def __init__(self, keys: Optional[Iterable[str]] = None, separator: Optional[str] = None):
+        """
+        Setup the trie.
+
+        :param keys: Optional list of keys to start with.
+        :param separator: Level separator, default is ".".
+        """
+        self.separator = separator or "."
+        self._root = TopicTrieNode()
+        self._size = 0
+        if keys is not None:
+            for key in keys:
+                self.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        node = self._find_node(key)
+        return node is not None and node.key is not None
+
+    def __iter__(self):
+        return iter(self._collect(self._root, []))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, key: str) -> None:
+        """
+        Add a key to the trie. Adding a key that already exists does nothing.
+
+        :param key: The key to add.
+        """
+        node = self._root
+        for part in key.split(self.separator):
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = TopicTrieNode()
+            node = child
+        if node.key is None:
+            node.key = key
+            self._size += 1
+
+    def remove(self, key: str) -> None:
+        """
+        Remove a key from the trie. Empty branches are pruned.
+
+        :raises KeyError: Raised when the key doesn't exist.
+        :param key: The key to remove.
+        """
+        path = [self._root]
+        parts = key.split(self.separator)
+        for part in parts:
+            child = path[-1].children.get(part)
+            if child is None:
+                raise KeyError(key)
+            path.append(child)
+        if path[-1].key is None:
+            raise KeyError(key)
+        path[-1].key = None
+        self._size -= 1
+
+        for index in range(len(parts), 0, -1):
+            node = path[index]
+            if node.key is not None or len(node.children) > 0:
+                break
+            del path[index - 1].children[parts[index - 1]]
+
+    def discard(self, key: str) -> None:
+        """ Remove a key if it exists. """
+        try:
+            self.remove(key)
+        except KeyError:
+            pass
+
+    def clear(self) -> None:
+        """ Removes all keys. """
+        self._root = TopicTrieNode()
+        self._size = 0
+
+    def search(self, pattern: str) -> List[str]:
+        """
+        Find all the keys matching the pattern. The pattern can contain "+" and "#" wildcards. Patterns without
+        wildcards are a simple exact lookup.
+
+        :param pattern: The key or pattern to search for.
+        :return: A list of matching keys.
+        """
+        if WILDCARD_SINGLE not in pattern and WILDCARD_MULTI not in pattern:
+            return [pattern] if pattern in self else []
+
+        results = {}
+        self._search(self._root, pattern.split(self.separator), 0, results)
+        return list(results)
+
+    def _find_node(self, key: str) -> Optional[TopicTrieNode]:
+        node = self._root
+        for part in key.split(self.separator):
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
+
+    def _collect(self, node: TopicTrieNode, results: list) -> list:
+        """ Collects all keys at or below the node. """
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current.key is not None:
+                results.append(current.key)
+            stack.extend(reversed(list(current.children.values())))
+        return results
+
+    def _search(self, node: TopicTrieNode, parts: List[str], index: int, results: dict) -> None:
+        if index == len(parts):
+            if node.key is not None:
+                results[node.key] = True
+            return
+
+        part = parts[index]
+        if part == WILDCARD_MULTI:
+            if index + 1 == len(parts):  # Trailing #, everything below matches.
+                for key in self._collect(node, []):
+                    results[key] = True
+                return
+            stack = [node]
+            while stack:
+                current = stack.pop()
+                self._search(current, parts, index + 1, results)
+                stack.extend(current.children.values())
+        elif part == WILDCARD_SINGLE:
+            for child in node.children.values():
+                self._search(child, parts, index + 1, results)
+        else:
+            child = node.children.get(part)
+            if child is not None:
+                self._search(child, parts, index + 1, results)
+
+
+class TopicDict(dict):
+    """
+    A dictionary that maintains a topic trie of it's keys, allowing wildcard searches of the keys.
+    """
+    def __init__(self, *args, separator: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.trie = TopicTrie(self.keys(), separator=separator)
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self.trie.add(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.trie.discard(key)
+
+    def pop(self, key, *args):
+        if key in self:
+            self.trie.discard(key)
+        return super().pop(key, *args)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.trie.discard(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.trie.add(key)
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        super().clear()
+        self.trie.clear()
+
+    def search(self, pattern: str) -> List[str]:
+        """
+        Find all the keys matching the pattern. See TopicTrie.search().
+
+        :param pattern: The key or pattern to search for.
+        :return: A list of matching keys.
+        """
+        return self.trie.search(pattern)
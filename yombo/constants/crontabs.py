@@ -1 +1,10 @@
 CRONTAB_ID_LENGTH = 38
+
+# What to do with ticks that were missed because the reactor was busy or the clock jumped forward.
+CRONTAB_CATCH_UP_ONCE = "once"  # Run the task once, no matter how many ticks were missed.
+CRONTAB_CATCH_UP_ALL = "all"  # Run the task once for every missed tick, up to CRONTAB_CATCH_UP_MAX.
+CRONTAB_CATCH_UP_SKIP = "skip"  # Don't run missed ticks, wait for the next tick.
+CRONTAB_CATCH_UP_POLICIES = (CRONTAB_CATCH_UP_ONCE, CRONTAB_CATCH_UP_ALL, CRONTAB_CATCH_UP_SKIP)
+CRONTAB_CATCH_UP_MAX = 60  # Most missed ticks to run for the "all" policy.
+CRONTAB_LATE_GRACE = 60  # Seconds a tick can run late before it's considered missed.
+CRONTAB_MAX_SLEEP = 60  # Longest the scheduler will sleep, used to notice clock jumps.
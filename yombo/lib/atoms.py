@@ -49,6 +49,7 @@ from typing import ClassVar, List
 from twisted.internet.defer import inlineCallbacks
 
 # Import Yombo libraries
+from yombo.classes.topictrie import TopicDict
 from yombo.core.entity import Entity
 from yombo.core.library import YomboLibrary
 from yombo.core.log import get_logger
@@ -127,13 +128,18 @@ class Atoms(YomboLibrary, SystemDataParentMixin, LibraryDBParentMixin, LibrarySe
         :return: None
         """
         self.logger = logger
-        self.atoms[self._gateway_id] = {}
+        self.atoms[self._gateway_id] = TopicDict()
         yield self.load_from_database()
         yield self.set_yield("app_dir", self._Configs.app_dir, value_type="string", request_context=self)
         yield self.set_yield("working_dir", self._Configs.working_dir, value_type="string", request_context=self)
         yield self.set_yield("gateway.running_since", time(), value_type="int", request_context=self)
         yield self.os_data()
 
+    @inlineCallbacks
+    def _stop_(self, **kwargs):
+        """ Save any coalesced atom values before the events and database libraries unload. """
+        yield self.coalesce_flush_all()
+
     def os_data(self) -> None:
         """
         Sets atoms concerning the operating system.
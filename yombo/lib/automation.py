@@ -25,7 +25,7 @@ import traceback
 from typing import Any, ClassVar, Dict, List, Optional, Type, Union
 
 # Import twisted libraries
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import Deferred, inlineCallbacks
 from twisted.internet import reactor
 
 # Import Yombo libraries
@@ -33,7 +33,7 @@ from yombo.core.exceptions import YomboWarning
 from yombo.core.library import YomboLibrary
 from yombo.core.log import get_logger
 from yombo.lib.nodes.node import Node
-from yombo.utils import is_true_false, random_string, sleep, bytes_to_unicode
+from yombo.utils import is_true_false, random_string, bytes_to_unicode
 from yombo.utils.datatypes import coerce_value
 
 logger = get_logger("library.automation")
@@ -49,6 +49,29 @@ REQUIRED_FILTER_FIELDS = ["platform"]
 CONDITION_TYPE_AND = "and"
 CONDITION_TYPE_OR = "or"
 
+STATE_TRIGGER_VALUE_TYPES = {  # state trigger value_type: coerce_value() value_type
+    "string": "string",
+    "integer": "int",
+    "float": "float",
+    "boolean": "bool",
+}
+
+
+def coerce_state_trigger_value(value: Any, value_type: str) -> Any:
+    """
+    Coerces a state value into the value type used by a state trigger for comparison. Value types
+    without a coercion, such as "any", are returned as is.
+
+    :param value: The value to coerce.
+    :param value_type: One of: string, integer, float, boolean, any
+    :return: The coerced value.
+    """
+    if value_type not in STATE_TRIGGER_VALUE_TYPES:
+        return value
+    if value_type == "boolean":
+        value = is_true_false(value)
+    return coerce_value(value, STATE_TRIGGER_VALUE_TYPES[value_type])
+
 # BASE_NODE_PLATFORMS = {
 #     "yombo.lib.automation.automation_rule": ["Automation_Rule", ],
 # }
@@ -167,6 +190,17 @@ class Automation(YomboLibrary):
         # self.load_platforms(BASE_NODE_PLATFORMS)
 
         self.active_triggers = {}  # Track various triggers - help find what rules to fire when a trigger matches.
+        # Dispatch index used by trigger_monitor. trigger_type -> watched item -> {rule_id: compiled trigger}
+        # Device triggers are keyed by device_id, scenes by (scene_machine_label, scene_action), and states by
+        # (name, gateway_id).
+        self.trigger_index = {
+            "device": {},
+            "scene": {},
+            "state": {},
+        }
+        self.trigger_index_keys = {}  # rule_id -> (trigger_type, key), used to remove a rule from the index.
+        self.rule_plans = {}  # rule_id -> compiled execution plan, see compile_rule_plan()
+        self.rule_delays = {}  # rule_id -> callLater of a paused rule, waiting to run the rest of its actions.
 
         self.action_types = {  # things that rules can do as a result if it being triggered.
             "device": {
@@ -471,6 +505,7 @@ class Automation(YomboLibrary):
         """
         if complete_validation is None:
             complete_validation = True
+        self.rule_plans.pop(rule.rule_id, None)
         rule.is_valid = False
         rule.is_valid_message = "Validation starting"
         if rule.status == 0:
@@ -514,6 +549,11 @@ class Automation(YomboLibrary):
 
         if complete_validation:
             self.setup_rule_trigger(rule, data["trigger"])
+            try:
+                self.rule_plans[rule.rule_id] = self.compile_rule_plan(rule)
+            except Exception as e:
+                rule.is_valid_message = f"Unable to prepare automation rule: {e}"
+                raise YomboWarning(f"Automation rule could not be compiled: {e}")
         rule.is_valid = True
         rule.is_valid_message = "Automation rule is ready."
         return True
@@ -600,17 +640,15 @@ class Automation(YomboLibrary):
         Adds an automation rule trigger to be monitored. Other libraries will call
         trigger_monitor() whenever a value changes.
 
+        The trigger is compiled into the trigger index: the watched item is resolved and any comparison
+        value is coerced once here instead of for every event. Disabled rules are not added to the index.
+
         :param rule:
         :param trigger:
         :return:
         """
         rule_id = rule.rule_id
-        if rule_id in self.triggers:
-            del self.triggers_by_rule[rule_id]
-
-        for local_trigger_type, monitored_trigger in self.triggers.items():
-            if rule_id in monitored_trigger:
-                del self.triggers[local_trigger_type][rule_id]
+        self.remove_rule_trigger(rule_id)
 
         trigger_type = trigger["trigger_type"]
         if trigger_type not in self.trigger_types:
@@ -625,34 +663,81 @@ class Automation(YomboLibrary):
             self.triggers["device"][rule_id] = {
                 "device_machine_label": device.machine_label
             }
+            index_key = device.device_id
+            compiled = {"rule_id": rule_id}
 
         elif trigger_type == "state":
             if not all(section in trigger for section in ["name", "value", "value_type", "gateway_id"]):
                 raise YomboWarning(f"Rule '{rule.label}': Trigger is missing a required field.")
             if "value" not in trigger:
                 trigger["value"] = None
+            value_type = trigger["value_type"]
             self.triggers["state"][rule_id] = {
                 "name": trigger["name"],
                 "value": trigger["value"],
-                "value_type": trigger["value_type"],
+                "value_type": value_type,
                 "gateway_id": trigger["gateway_id"],
             }
+            try:
+                value = coerce_state_trigger_value(trigger["value"], value_type)
+            except Exception:
+                raise YomboWarning(f"Rule '{rule.label}': Could not force trigger value to value type of"
+                                   f" {value_type}.")
+            index_key = (trigger["name"], trigger["gateway_id"])
+            compiled = {
+                "rule_id": rule_id,
+                "value_type": value_type,
+                "value": value,
+                "match_any": value_type == "any",
+            }
 
         elif trigger_type == "scene":
             if not all(section in trigger for section in ["scene_machine_label", "scene_action"]):
                 raise YomboWarning(
-                    "Rule '{label}': Trigger is missing a required field: scene_machine_label or scene_action",
-                    label=rule.label)
+                    f"Rule '{rule.label}': Trigger is missing a required field: scene_machine_label or scene_action")
             self.triggers["scene"][rule_id] = {
                 "scene_machine_label": trigger["scene_machine_label"],
                 "scene_action": trigger["scene_action"],
             }
+            index_key = (trigger["scene_machine_label"], trigger["scene_action"])
+            compiled = {"rule_id": rule_id}
+
+        if is_true_false(rule.data["config"].get("enabled", True)) is False:
+            return
+
+        index = self.trigger_index[trigger_type]
+        if index_key not in index:
+            index[index_key] = {}
+        index[index_key][rule_id] = compiled
+        self.trigger_index_keys[rule_id] = (trigger_type, index_key)
+
+    def remove_rule_trigger(self, rule_id):
+        """
+        Removes an automation rule from the trigger index, it will no longer be fired by trigger_monitor().
+
+        :param rule_id:
+        :return:
+        """
+        for trigger_type, monitored_trigger in self.triggers.items():
+            if rule_id in monitored_trigger:
+                del monitored_trigger[rule_id]
+
+        if rule_id not in self.trigger_index_keys:
+            return
+        trigger_type, index_key = self.trigger_index_keys.pop(rule_id)
+        index = self.trigger_index[trigger_type]
+        if index_key in index:
+            index[index_key].pop(rule_id, None)
+            if len(index[index_key]) == 0:
+                del index[index_key]
 
     def trigger_monitor(self, trigger_type, _run_on_start=None, source=None, **kwargs):
         """
         Various libraries will call this when something happens to see if an automation rule
         needs to be triggered.
 
+        Only the rules watching the changed item are checked, these are found using the trigger index.
+
         :param trigger_type:
         :param kwargs:
         :return:
@@ -663,7 +748,7 @@ class Automation(YomboLibrary):
         if run_phase_int < 5500:  # 'modules_prestart' is when we start processing automation triggers.
             return
         if trigger_type not in self.startup_items_checked:
-            self.startup_items_checked[trigger_type] = []
+            self.startup_items_checked[trigger_type] = set()
         if "called_by" not in kwargs:
             kwargs["called_by"] = "trigger_monitor"
         template_variables = {
@@ -674,207 +759,288 @@ class Automation(YomboLibrary):
         logger.debug("Trigger_monitor started: {trigger_type}", trigger_type=trigger_type)
         if trigger_type == "device":
             device = kwargs["device"]
-            if device.device_id not in self.startup_items_checked[trigger_type]:
-                self.startup_items_checked[trigger_type].append(device.device_id)
+            self.startup_items_checked[trigger_type].add(device.device_id)
+            compiled_triggers = self.trigger_index["device"].get(device.device_id)
+            if compiled_triggers is None:
+                return
 
             template_variables["trigger"]["device"] = device
-            for rule_id, trigger in self.triggers["device"].items():
-                rule = self.get(rule_id)
+            for rule_id in list(compiled_triggers):
+                rule = self.rules[rule_id]
                 if _run_on_start is True and rule.data["config"]["run_on_start"] is not True:
                     continue
-                if trigger["device_machine_label"] == device.machine_label:
-                    logger.debug("Scheduling device rule to run: {label}", label=rule.label)
-                    reactor.callLater(0.001, self.run_rule, rule_id, template_variables, **kwargs)
+                logger.debug("Scheduling device rule to run: {label}", label=rule.label)
+                reactor.callLater(0.001, self.run_rule, rule_id, template_variables, **kwargs)
 
         elif trigger_type == "scene":
             scene = kwargs["scene"]
-            if scene.scene_id not in self.startup_items_checked[trigger_type]:
-                self.startup_items_checked[trigger_type].append(scene.scene_id)
+            self.startup_items_checked[trigger_type].add(scene.scene_id)
+            compiled_triggers = self.trigger_index["scene"].get((scene.machine_label, kwargs["action"]))
+            if compiled_triggers is None:
+                return
+
             template_variables["trigger"]["scene"] = scene
             template_variables["trigger"]["action"] = kwargs["action"]
-            for rule_id, trigger in self.triggers["scene"].items():
-                rule = self.get(rule_id)
-                if trigger["scene_machine_label"] == scene.machine_label and trigger["scene_action"] == kwargs["action"]:
-                    logger.debug("Scheduling scene rule to run: {label}", label=rule.label)
-                    reactor.callLater(0.001, self.run_rule, rule_id, template_variables, **kwargs)
+            for rule_id in list(compiled_triggers):
+                logger.debug("Scheduling scene rule to run: {label}", label=self.rules[rule_id].label)
+                reactor.callLater(0.001, self.run_rule, rule_id, template_variables, **kwargs)
 
         elif trigger_type == "state":
             name = kwargs["key"]
-            if name not in self.startup_items_checked[trigger_type]:
-                self.startup_items_checked[trigger_type].append(name)
-            gateway_id = kwargs["gateway_id"]
+            self.startup_items_checked[trigger_type].add(name)
+            compiled_triggers = self.trigger_index["state"].get((name, kwargs["gateway_id"]))
+            if compiled_triggers is None:
+                return
+
             template_variables["trigger"]["name"] = kwargs["key"]
             template_variables["trigger"]["value"] = kwargs["value"]
             template_variables["trigger"]["value_full"] = kwargs["value_full"]
-            for rule_id, trigger in self.triggers["state"].items():
-                rule = self.get(rule_id)
+            coerced_values = {}  # Coerce the new value once per value type, not once per rule.
+            coerce_failed = object()
+            for rule_id, trigger in list(compiled_triggers.items()):
+                rule = self.rules[rule_id]
                 if _run_on_start is True and rule.data["config"]["run_on_start"] is not True:
                     continue
-                if trigger["name"] == name and trigger["gateway_id"] == gateway_id:
+                if trigger["match_any"] is False:
                     value_type = trigger["value_type"]
-                    # if trigger["value"] == "" or trigger["value"] is None:
-                    #     reactor.callLater(0.001, self.run_rule, rule_id, template_variables, **kwargs)
-                    #     continue
-                    trigger_value = deepcopy(trigger["value"])
-                    if value_type == "string":
-                        value = coerce_value(kwargs["value"], "string")
-                        trigger_value = coerce_value(trigger_value, "string")
-                    elif value_type == "integer":
+                    if value_type not in coerced_values:
                         try:
-                            value = coerce_value(kwargs["value"], "int")
-                            trigger_value = coerce_value(trigger_value, "int")
+                            coerced_values[value_type] = coerce_state_trigger_value(kwargs["value"], value_type)
                         except Exception:
-                            logger.info("Trigger monitor couldn't force state value to int.")
-                            continue
+                            logger.info("Trigger monitor couldn't force state value to {value_type}.",
+                                        value_type=value_type)
+                            coerced_values[value_type] = coerce_failed
+                    value = coerced_values[value_type]
+                    if value is coerce_failed or trigger["value"] != value:
+                        continue
 
-                    elif value_type == "float":
-                        try:
-                            value = coerce_value(kwargs["value"], "float")
-                            trigger_value = coerce_value(trigger_value, "float")
-                        except Exception:
-                            logger.info("Trigger monitor couldn't force state value to float.")
-                            continue
+                logger.debug("Scheduling state rule to run: {label}", label=rule.label)
+                reactor.callLater(0.001, self.run_rule,
+                                  rule_id, template_variables, **kwargs)
 
-                    elif value_type == "boolean":
-                        try:
-                            value = coerce_value(is_true_false(kwargs["value"]), "bool")
-                            trigger_value = coerce_value(is_true_false(trigger_value), "bool")
-                        except Exception:
-                            logger.info("Trigger monitor couldn't force state value to bool.")
-                            continue
+    def compile_rule_plan(self, rule):
+        """
+        Compiles a validated rule into an execution plan. Devices, commands, and scenes are looked up once and
+        templates are compiled once, so firing the rule only has to run the plan. Plans are dropped when the
+        rule changes, or when a device or scene used by the rule changes, and are compiled again on the next fire.
+
+        :param rule:
+        :return: A dictionary with the condition template and a tuple of steps to perform.
+        """
+        rule_id = rule.rule_id
+        data = rule.data
+        condition = None
+        if "template" in data["condition"]:
+            condition = self.condition_templates[rule_id]
+            condition.compile()
+
+        steps = []
+        device_ids = set()
+        scene_ids = set()
+        for action_id, action in self.get_action_items(rule_id).items():
+            action_type = action["action_type"]
+            if action_type == "device":
+                device = self.get_device(action["device_machine_label"])
+                command = self._Commands[action["command_machine_label"]]
+                device_ids.add(device.device_id)
+                steps.append((action_type, device, command, action["inputs"]))
+            elif action_type == "pause":
+                steps.append((action_type, action["duration"]))
+            elif action_type == "scene":
+                scene = self._Scenes.get(action["scene_machine_label"])
+                scene_ids.add(scene.scene_id)
+                steps.append((action_type, scene.scene_id, action["scene_action"]))
+            elif action_type == "state":
+                steps.append((action_type, action["name"], action["value"]))
+            elif action_type == "template":
+                template = self.action_templates[f"{rule_id}_{action_id}"]
+                template.compile()
+                steps.append((action_type, template))
+
+        return {
+            "rule_id": rule_id,
+            "condition": condition,
+            "steps": tuple(steps),
+            "device_ids": frozenset(device_ids),
+            "scene_ids": frozenset(scene_ids),
+        }
 
-                    if value_type == "any" or trigger_value == value:
-                        logger.debug("Scheduling state rule to run: {label}", label=rule.label)
-                        reactor.callLater(0.001, self.run_rule,
-                                          rule_id, template_variables, **kwargs)
+    def invalidate_rule_plans(self, device_id=None, scene_id=None):
+        """
+        Drops any compiled plans that reference the given device or scene.
+
+        :param device_id:
+        :param scene_id:
+        :return:
+        """
+        for rule_id, plan in list(self.rule_plans.items()):
+            if device_id in plan["device_ids"] or scene_id in plan["scene_ids"]:
+                del self.rule_plans[rule_id]
+
+    def _device_updated_(self, arguments, **kwargs):
+        self.invalidate_rule_plans(device_id=arguments["id"])
+
+    def _scene_edited_(self, arguments, **kwargs):
+        self.invalidate_rule_plans(scene_id=arguments["scene"].scene_id)
+
+    def _scene_deleted_(self, arguments, **kwargs):
+        self.invalidate_rule_plans(scene_id=arguments["scene"].scene_id)
+
+    def _node_updated_(self, arguments, **kwargs):
+        self.rule_plans.pop(arguments["node_id"], None)
 
-    @inlineCallbacks
     def run_rule(self, rule_id, template_variables=None, **kwargs):
         """
-        Called when a rule should fire.
+        Called when a rule should fire. Runs the rule's compiled plan, compiling it first if the rule has
+        changed since it last ran.
 
         :param rule_id:
         :param kwargs:
         :return:
         """
-        # if "called_by" in kwargs:
-        #     print("run_rule called by: %s" % kwargs["called_by"])
         rule = self.rules[rule_id]
         logger.debug("Rule is about to start: {label}", label=rule.label)
         if rule_id in self.actions_running:
             if self.actions_running[rule_id] in ("running", "stopping"):
                 logger.debug("Rule is stopping since it's already running: {label}", label=rule.label)
                 return False  # already running
-        self.actions_running[rule_id] = "running"
+
+        plan = self.rule_plans.get(rule_id)
+        if plan is None:
+            try:
+                self.validate_and_activate_rule(rule)
+            except Exception as e:
+                logger.debug("Rule is stopping since it's not valid: {label} - {e}", label=rule.label, e=e)
+                return False
+            plan = self.rule_plans[rule_id]
 
         if template_variables is None:
             template_variables = {}
         template_variables["current_rule"] = rule
 
-        data = rule.data
-        self.validate_and_activate_rule(rule)  # check everything before firing. Something may have changed.
-        if rule.is_valid is False:
-            logger.debug("Rule is stopping since it's not valid: {label}", label=rule.label)
-            return False
-
-        if len(data["condition"]) > 0:
+        if plan["condition"] is not None:
             try:
-                condition_results = yield self.condition_templates[rule_id].render(template_variables)
-                condition_results = condition_results.strip()
+                condition_results = plan["condition"].render_now(template_variables)
             except Exception as e:
                 logger.warn("-==(Warning: Automation library had trouble with template==-")
                 logger.warn("Input template:")
-                logger.warn("{template}", template=data["condition"]["template"])
+                logger.warn("{template}", template=rule.data["condition"]["template"])
                 logger.warn("---------------==(Traceback)==------------------------------")
                 logger.warn("{trace}", trace=traceback.format_exc())
                 logger.warn("------------------------------------------------------------")
                 logger.warn("Template processing error: {message}", message=e)
+                return False
             condition_results_bool = is_true_false(condition_results)
             if condition_results_bool is None:
-                logger.warn("Condition template for rule '{label}' must return true/false, or on/off, or 1/0. Returned invalid results: {results}.",
-                            rule.label, condition_results)
+                logger.warn("Condition template for rule '{label}' must return true/false, or on/off, or 1/0."
+                            " Returned invalid results: {results}.",
+                            label=rule.label, results=condition_results)
+                return False
             elif condition_results_bool is not True:
                 logger.debug("Stopping rule due to condition is false: {label}", label=rule.label)
-                return
+                return False
 
-        action_items = self.get_action_items(rule_id)
         logger.debug("Rule is firing {label} action:", label=rule.label)
-        for action_id, action in action_items.items():
-            action_type = action["action_type"]
-            if action_type not in self.action_types:
-                logger.info("Action type ({action_type}) doesn't exist as a possible trigger action type.",
-                            action_type=action["action_type"])
-                rule.is_valid = False
-                raise YomboWarning(f"Rule '{rule.label}': Action has invalid action type: {action_type}")
+        self.actions_running[rule_id] = "running"
+        return self.run_rule_steps(plan, 0, template_variables, kwargs)
 
+    def run_rule_steps(self, plan, position, template_variables, kwargs):
+        """
+        Runs the steps of a compiled rule plan, starting at position. Pauses schedule the remaining steps
+        using callLater. If a step returns a deferred, the remaining steps are run once it completes.
 
-            if action_type == "device":
-                device = self._Devices[action["device_machine_label"]]
-                command = self._Commands[action["command_machine_label"]]
-                device.command(command=command,
-                               authentication=self._Users.system_user,
-                               control_method="automation",
-                               inputs=action["inputs"],
-                               **kwargs)
+        :param plan: The compiled plan from compile_rule_plan().
+        :param position: Which step to start with.
+        :param template_variables:
+        :param kwargs: Items from the trigger, passed to device commands.
+        :return:
+        """
+        rule_id = plan["rule_id"]
+        self.rule_delays.pop(rule_id, None)
+        steps = plan["steps"]
+        while position < len(steps):
+            if self.actions_running[rule_id] != "running":  # a way to kill this trigger
+                self.actions_running[rule_id] = "stopped"
+                return False
 
-            elif action_type == "pause":
-                duration = action["duration"]
-                if duration < 6:
-                    final_duration = duration
-                    loops = 1
-                else:
-                    loops = int(round(duration/5))
-                    final_duration = duration / loops
-                for current_loop in range(loops):
-                    yield sleep(final_duration)
-                    if self.actions_running[rule_id] != "running":  # a way to kill this trigger
-                        self.actions_running[rule_id] = "stopped"
-                        return False
+            step = steps[position]
+            position += 1
+            if step[0] == "pause":
+                self.rule_delays[rule_id] = reactor.callLater(step[1], self.run_rule_steps,
+                                                              plan, position, template_variables, kwargs)
+                return
 
-            elif action_type == "scene":
-                local_scene = self._Scenes.get(action["scene_machine_label"])
-                scene_action = action["scene_action"]
-                if scene_action == "enable":
-                    self._Scenes.enable(local_scene.scene_id)
-                elif scene_action == "disable":
-                    self._Scenes.disable(local_scene.scene_id)
-                elif scene_action == "start":
-                    try:
-                        self._Scenes.start(local_scene.scene_id)
-                    except Exception as e:  # Gobble everything up..
-                        pass
-                elif scene_action == "stop":
-                    try:
-                        self._Scenes.stop(local_scene.scene_id)
-                    except Exception as e:  # Gobble everything up..
-                        pass
+            try:
+                results = self.run_rule_step(step, template_variables, kwargs)
+            except Exception as e:
+                logger.warn("Automation rule '{label}' stopped, an action failed: {e}",
+                            label=self.rules[rule_id].label, e=e)
+                self.actions_running[rule_id] = "stopped"
+                return False
 
-            elif action_type == "state":
-                yield self._States.set_yield(action["name"], action["value"], request_context=self._FullName)
+            if isinstance(results, Deferred):
+                results.addErrback(lambda failure: logger.warn("Automation rule action failed: {failure}",
+                                                               failure=failure))
+                results.addCallback(lambda ignored, next_position=position:
+                                    self.run_rule_steps(plan, next_position, template_variables, kwargs))
+                return results
 
-            elif action_type == "template":
+        self.actions_running[rule_id] = "stopped"
+
+    def run_rule_step(self, step, template_variables, kwargs):
+        """
+        Perform a single step of a rule plan.
+
+        :param step: A step tuple from compile_rule_plan().
+        :param template_variables:
+        :param kwargs:
+        :return: A deferred if the next step should wait for this one to complete.
+        """
+        action_type = step[0]
+        if action_type == "device":
+            device, command, inputs = step[1:]
+            device.command(command=command,
+                           authentication=self._Users.system_user,
+                           control_method="automation",
+                           inputs=inputs,
+                           **kwargs)
+
+        elif action_type == "scene":
+            scene_id, scene_action = step[1:]
+            if scene_action == "enable":
+                self._Scenes.enable(scene_id)
+            elif scene_action == "disable":
+                self._Scenes.disable(scene_id)
+            elif scene_action == "start":
                 try:
-                    yield self.action_templates[f"{rule.rule_id}_{action['action_id']}"].render(
-                        template_variables
-                    )
-                except Exception as e:
-                    logger.warn("-==(Warning: Automation library had trouble with template==-")
-                    logger.warn("Input template:")
-                    logger.warn("{template}", template=self.action_templates[f"{rule.rule_id}_{action['action_id']}"])
-                    logger.warn("---------------==(Traceback)==------------------------------")
-                    logger.warn("{trace}", trace=traceback.format_exc())
-                    logger.warn("------------------------------------------------------------")
-                    logger.warn("Template processing error: {message}", message=e)
+                    self._Scenes.start(scene_id)
+                except Exception as e:  # Gobble everything up..
+                    pass
+            elif scene_action == "stop":
+                try:
+                    self._Scenes.stop(scene_id)
+                except Exception as e:  # Gobble everything up..
+                    pass
 
-            if self.actions_running[rule_id] != "running":  # a way to kill this trigger
-                self.actions_running[rule_id] = "stopped"
-                return False
+        elif action_type == "state":
+            return self._States.set_yield(step[1], step[2], request_context=self._FullName)
 
-        self.actions_running[rule_id] = "stopped"
+        elif action_type == "template":
+            template = step[1]
+            try:
+                template.render_now(template_variables)
+            except Exception as e:
+                logger.warn("-==(Warning: Automation library had trouble with template==-")
+                logger.warn("Input template:")
+                logger.warn("{template}", template=template.template)
+                logger.warn("---------------==(Traceback)==------------------------------")
+                logger.warn("{trace}", trace=traceback.format_exc())
+                logger.warn("------------------------------------------------------------")
+                logger.warn("Template processing error: {message}", message=e)
 
     def stop(self, rule_id, **kwargs):
         """
-        Stop a currently running action.
+        Stop a currently running action. If the rule is paused, it's stopped right away.
 
         :param rule_id:
         :param kwargs:
@@ -883,6 +1049,10 @@ class Automation(YomboLibrary):
         rule = self.get(rule_id)
         if rule_id in self.actions_running and self.actions_running[rule_id] == "running":
             self.actions_running[rule_id] = "stopping"
+            delay = self.rule_delays.pop(rule_id, None)
+            if delay is not None and delay.active():
+                delay.cancel()
+                self.actions_running[rule_id] = "stopped"
             return True
         return False
 
@@ -915,6 +1085,7 @@ class Automation(YomboLibrary):
         rule = self.rules.get(rule_id)
         data = rule.data
         data["config"]["enabled"] = False
+        self.remove_rule_trigger(rule.rule_id)
         rule.on_change()
 
     def enable(self, rule_id, **kwargs):
@@ -927,6 +1098,10 @@ class Automation(YomboLibrary):
         rule = self.rules[rule_id]
         data = rule.data
         data["config"]["enabled"] = True
+        try:
+            self.validate_and_activate_rule(rule)
+        except Exception:
+            pass
         rule.on_change()
 
     @inlineCallbacks
@@ -990,6 +1165,13 @@ class Automation(YomboLibrary):
         if rule is not None:
             rule.status = is_true_false(status)
             rule.data["config"]["enabled"] = rule.status
+            if rule.status is False:
+                self.remove_rule_trigger(rule.rule_id)
+            else:
+                try:
+                    self.validate_and_activate_rule(rule)
+                except Exception:
+                    pass
         if run_on_start is not None:
             rule.data["config"]["run_on_start"] = run_on_start
         return rule
@@ -1006,6 +1188,7 @@ class Automation(YomboLibrary):
         rule = self.get(rule_id)
         data = rule.data
         data["config"]["enabled"] = False
+        self.remove_rule_trigger(rule.rule_id)
         results = yield self._Nodes.delete_node(rule.rule_id, session=session)
         return results
 
@@ -1340,6 +1523,7 @@ class Automation(YomboLibrary):
         action = self.get_action_items(rule_id, action_id)
         action["weight"] += 11
         self.balance_action_weights(rule_id)
+        self.rule_plans.pop(rule.rule_id, None)
         return action
 
     def move_action_up(self, rule_id, action_id):
@@ -1354,6 +1538,7 @@ class Automation(YomboLibrary):
         action = self.get_action_items(rule_id, action_id)
         action["weight"] -= 11
         self.balance_action_weights(rule_id)
+        self.rule_plans.pop(rule.rule_id, None)
         return action
 
     def rule_to_dict(self, rule):
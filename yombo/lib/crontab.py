@@ -52,6 +52,14 @@ Usage example
    #label it
    self.MyCron.label = "modules.myModule.Lunchtime on Sundays"
 
+Each cron task computes the next time it should run. The tasks are kept in a heap, sorted by the next run
+time, and only the earliest one is waited on. If the reactor was too busy to run a task on time, or the
+clock jumped forward, the task's "catch_up" setting determines what happens to the missed runs:
+
+* "once" (default) - Run the task once.
+* "all" - Run the task once for every missed run, up to 60.
+* "skip" - Don't run, wait for the next run time.
+
 .. moduleauthor:: Mitch Schwenk <mitch-gw@yombo.net>
 
 :copyright: Copyright 2013-2020 by Yombo.
@@ -59,15 +67,18 @@ Usage example
 :view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/_modules/yombo/lib/crontab.html>`_
 """
 # Import python libraries
-from datetime import datetime, timedelta
+from datetime import datetime, time as dt_time, timedelta
+import heapq
+from time import time
 from typing import Any, Callable, ClassVar, Dict, List, Optional, Type, Union
 
 # Import twisted libraries
-from twisted.internet.task import LoopingCall
 from twisted.internet import reactor
 
 # Import Yombo libraries
-from yombo.constants.crontabs import CRONTAB_ID_LENGTH
+from yombo.constants.crontabs import (CRONTAB_ID_LENGTH, CRONTAB_CATCH_UP_ONCE, CRONTAB_CATCH_UP_ALL,
+                                      CRONTAB_CATCH_UP_SKIP, CRONTAB_CATCH_UP_POLICIES, CRONTAB_CATCH_UP_MAX,
+                                      CRONTAB_LATE_GRACE, CRONTAB_MAX_SLEEP)
 from yombo.core.entity import Entity
 from yombo.core.exceptions import YomboCronTabError
 from yombo.core.library import YomboLibrary
@@ -88,7 +99,7 @@ class AllMatch(set):
 
 def conv_to_set(obj):  # Allow single integer to be provided
     if (isinstance(obj, str) and obj == "*") or obj is None:  # return AllMatch
-        return set(AllMatch())
+        return AllMatch()
     if isinstance(obj, int):
         return set([obj])  # Single item
     if not isinstance(obj, set):
@@ -104,7 +115,11 @@ class CronTab(YomboLibrary, ParentStorageAccessorsMixin, LibrarySearchMixin):
     `self._CronTab`. All documentation will reference this use case.
     """
     crontabs: ClassVar[dict] = {}
-    check_cron_tabs_loop = None  # a simple loop that checks all cron tabs to see if they need to run.
+    cron_heap: ClassVar[list] = []  # (next_run, sequence, cron_id), the earliest task to run is first.
+    cron_sequence: ClassVar[int] = 0  # Tie breaker for tasks with the same next_run.
+    cron_running: ClassVar[bool] = False  # Set to true once the scheduler is started.
+    check_cron_tabs_callLater = None  # callLater for the earliest task, or CRONTAB_MAX_SLEEP seconds.
+    last_check: ClassVar[float] = 0
 
     _storage_attribute_name: ClassVar[str] = "crontabs"
     _storage_attribute_sort_key: ClassVar[str] = "label"
@@ -215,53 +230,106 @@ class CronTab(YomboLibrary, ParentStorageAccessorsMixin, LibrarySearchMixin):
     def values(self):
         return list(self.crontabs.values())
 
-    def _init_(self, **kwargs):
-        """
-        Setups up the basic framework.
-
-        :param loader: A pointer to the Loader library.
-        :type loader: Instance of Loader
-        """
-        self.check_cron_tabs_loop = LoopingCall(self.check_cron_tabs)
-
     def _start_(self, **kwargs):
         """
-        Start the looping call to check for cron every minute.
+        Start the cron task scheduler.
         """
-        now = datetime.now()
-        cron_next_minute = now - timedelta(seconds=now.second - 61)  # we always run cron near the top of the minute
-        cron_start = float(cron_next_minute.strftime("%s.%f")) - float(now.strftime("%s.%f")) - 0.2
-
-        reactor.callLater(cron_start, self.start_cron_loop)
+        self.cron_running = True
+        self.last_check = time()
+        self.schedule_next()
 
     def _stop_(self, **kwargs):
         """
         Simply stop the cron tab from running.
         """
-        if self.check_cron_tabs_loop is not None and self.check_cron_tabs_loop.running:
-            self.check_cron_tabs_loop.stop()
+        self.cron_running = False
+        if self.check_cron_tabs_callLater is not None and self.check_cron_tabs_callLater.active():
+            self.check_cron_tabs_callLater.cancel()
 
-    def start_cron_loop(self):
+    def schedule_task(self, task, after: Optional[float] = None):
         """
-        Start the cron task loop. This was called from _start_ in an attempt to run the loop at the top
-        of every second.
+        Computes the task's next run time and adds it to the heap. Any existing heap entry for the task
+        becomes stale and is skipped when it reaches the top of the heap.
+
+        :param task: The CronTask to schedule.
+        :param after: Find the next run after this timestamp, default is now.
         """
-        self.check_cron_tabs_loop.start(60)
+        task.next_run = None
+        if task.enabled is not True or task.cron_id not in self.crontabs:
+            return
+        task.next_run = task.next_run_time(time() if after is None else after)
+        if task.next_run is None:
+            return
+        self.cron_sequence += 1
+        heapq.heappush(self.cron_heap, (task.next_run, self.cron_sequence, task.cron_id))
+        if self.cron_running and self.cron_heap[0][2] == task.cron_id:
+            self.schedule_next()
+
+    def schedule_next(self):
+        """
+        Arms a single callLater for the earliest task. It never waits longer than CRONTAB_MAX_SLEEP seconds
+        so that clock changes are noticed.
+        """
+        heap = self.cron_heap
+        while len(heap) and self.is_stale(heap[0]):
+            heapq.heappop(heap)
+
+        delay = CRONTAB_MAX_SLEEP
+        if len(heap):
+            delay = min(max(heap[0][0] - time(), 0), CRONTAB_MAX_SLEEP)
+
+        if self.check_cron_tabs_callLater is not None and self.check_cron_tabs_callLater.active():
+            self.check_cron_tabs_callLater.cancel()
+        self.check_cron_tabs_callLater = reactor.callLater(delay, self.check_cron_tabs)
+
+    def is_stale(self, entry: tuple) -> bool:
+        """ Returns True if the heap entry is for a task that was removed, disabled, or rescheduled. """
+        next_run, sequence, cron_id = entry
+        if cron_id not in self.crontabs:
+            return True
+        task = self.crontabs[cron_id]
+        return task.enabled is not True or task.next_run != next_run
 
     def check_cron_tabs(self):
         """
-        Checks to see if cron needs to run anything.
+        Runs any tasks that are due and then waits for the next one.
         """
-        the_time = datetime(*datetime.now().timetuple()[:5])
-        logger.debug("Check if cronjobs need to be run.: {the_time}", the_time=the_time)
-        for task in self.crontabs:
-            self.crontabs[task].check(the_time)
+        now = time()
+        if now < self.last_check - 1:  # Clock went backwards, all the next run times are too far out.
+            logger.info("Clock moved backwards, rescheduling all cron tasks.")
+            self.reschedule_all(now)
+        self.last_check = now
+
+        heap = self.cron_heap
+        while len(heap) and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            if self.is_stale(entry):
+                continue
+            task = self.crontabs[entry[2]]
+            try:
+                task.run_due(now)
+            except Exception as e:
+                logger.warn("Cron task '{label}' had an error: {e}", label=task.label, e=e)
+            self.schedule_task(task, after=now)
+
+        if self.cron_running:
+            self.schedule_next()
+
+    def reschedule_all(self, after: Optional[float] = None):
+        """
+        Rebuilds the heap, computing the next run time for every task.
+
+        :param after: Find the next run after this timestamp, default is now.
+        """
+        self.cron_heap.clear()
+        for task in self.crontabs.values():
+            self.schedule_task(task, after=after)
 
     def new(self, crontab_callback: Callable, mins: Optional[Union[str, int, list]] = None,
             hours: Optional[Union[str, int, list]] = None, days: Optional[Union[str, int, list]] = None,
             months: Optional[Union[str, int, list]] = None, dow: Optional[Union[str, int, list]] = None,
             label="", enabled=True, args: Optional[list] = None, kwargs: Optional[dict] = {},
-            cron_id: Optional[str] = None, load_source: Optional = None):
+            cron_id: Optional[str] = None, load_source: Optional = None, catch_up: Optional[str] = None):
         """
         Add a new :class:`CronTask`.
 
@@ -286,14 +354,16 @@ class CronTab(YomboLibrary, ParentStorageAccessorsMixin, LibrarySearchMixin):
         :param kwargs: (optional) Keyword arguments to pass to "crontab_callback"
         :type kwargs: Dict of arguments
         :param cron_id: A label for the cron task, used to find it again later.
+        :param catch_up: What to do with missed runs: once (default), all, skip
         """
         if load_source is None:
             load_source = "system"
 
         new_cron = CronTask(self, crontab_callback, mins=mins, hours=hours, days=days, months=months,
                             dow=dow, label=label, enabled=enabled, args=args,
-                            kwargs=kwargs, cron_id=cron_id, load_source=load_source)
+                            kwargs=kwargs, cron_id=cron_id, load_source=load_source, catch_up=catch_up)
         self.crontabs[new_cron.cron_id] = new_cron
+        self.schedule_task(new_cron)
         return new_cron
 
     def remove(self, cron_task_requested):
@@ -442,12 +512,12 @@ class CronTask(Entity, ChildStorageAccessorsMixin):
                  hours: Optional[Union[str, int, list]] = None, days: Optional[Union[str, int, list]] = None,
                  months: Optional[Union[str, int, list]] = None, dow: Optional[Union[str, int, list]] = None,
                  label="", enabled=True, args: Optional[list] = None, kwargs: Optional[dict] = {},
-                 cron_id: Optional[str] = None, load_source: Optional = None) -> None:
+                 cron_id: Optional[str] = None, load_source: Optional = None,
+                 catch_up: Optional[str] = None) -> None:
         """
         Setup the cron event.
         """
         super().__init__(parent)  # Setup entity.
-
         self.mins_orig = mins if mins is not None else "*"
         self.hours_orig = hours if hours is not None else "*"
         self.days_orig = days if days is not None else "*"
@@ -455,6 +525,10 @@ class CronTask(Entity, ChildStorageAccessorsMixin):
         self.dow_orig = dow if dow is not None else "*"
 
         self.cron_id = cron_id or random_string(length=CRONTAB_ID_LENGTH)
+        if catch_up is None:
+            catch_up = CRONTAB_CATCH_UP_ONCE
+        if catch_up not in CRONTAB_CATCH_UP_POLICIES:
+            raise YomboCronTabError(f"Invalid catch_up, must be one of: {', '.join(CRONTAB_CATCH_UP_POLICIES)}")
         self.crontab_callback = crontab_callback
         self.mins = conv_to_set(mins)
         self.hours = conv_to_set(hours)
@@ -463,9 +537,13 @@ class CronTask(Entity, ChildStorageAccessorsMixin):
         self.dow = conv_to_set(dow)
         self.label = label
         self.enabled = enabled
-        self.args = args
+        self.args = args if args is not None else ()
         self.kwargs = kwargs
         self.load_source = load_source
+        self.catch_up = catch_up
+        self.next_run = None  # Timestamp of the next run, set by the parent when scheduled.
+        self._hours_list = [hour for hour in range(24) if hour in self.hours]
+        self._mins_list = [minute for minute in range(60) if minute in self.mins]
 
     def __del__(self):
         """
@@ -480,12 +558,14 @@ class CronTask(Entity, ChildStorageAccessorsMixin):
         Enable this CronTask.
         """
         self.enabled = True
+        self._Parent.schedule_task(self)
 
     def disable(self):
         """
         Disable this CronTask.
         """
         self.enabled = False
+        self.next_run = None
 
     def status(self):
         """
@@ -496,28 +576,50 @@ class CronTask(Entity, ChildStorageAccessorsMixin):
         """
         self.enabled = False
 
-    def match_time(self, t):
-        """
-        Return True if this event should trigger at the specified datetime
-        """
-        return ((t.minute in self.mins) and
-                (t.hour in self.hours) and
-                (t.day in self.days) and
-                (t.month in self.months) and
-                (t.weekday() in self.dow))
-
-    def check(self, t):
-        """"
-        Called by the parent to see if the cron needs to run. This function should not be
-        called externally.
-
-        :param t: Current time in a format for the cron task.
-        :return: None
-        """
-        logger.debug("CronTask::check({t}) -- {crontab_callback}", t=t, crontab_callback=self.crontab_callback)
-        if self.enabled is True and self.match_time(t):
-            logger.info("CronTask::check - enabled: {enabled}, match_time: {match_time}",
-                        enabled=self.enabled, match_time=self.match_time(t))
+    def next_run_time(self, after: float) -> Optional[float]:
+        """
+        Finds the next time this task should run, after the provided timestamp. Only days that match the
+        day, month, and day of week are checked, and then only matching hours and minutes.
+
+        :param after: Timestamp to start searching after.
+        :return: Timestamp of the next run, or None if the task will never run.
+        """
+        start = datetime.fromtimestamp(after).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        start_date = start.date()
+        day = start_date
+        for _ in range(366 * 5):  # Leap days can take up to 4 years to come around.
+            if day.month in self.months and day.day in self.days and day.weekday() in self.dow:
+                for hour in self._hours_list:
+                    if day == start_date and hour < start.hour:
+                        continue
+                    for minute in self._mins_list:
+                        if day == start_date and hour == start.hour and minute < start.minute:
+                            continue
+                        return datetime.combine(day, dt_time(hour, minute)).timestamp()
+            day += timedelta(days=1)
+        return None
+
+    def run_due(self, now: float):
+        """
+        Called by the parent when the task's next run time has passed. Handles any missed runs based
+        on the catch_up setting. This function should not be called externally.
+
+        :param now: The current timestamp.
+        """
+        runs = 1
+        if now - self.next_run > CRONTAB_LATE_GRACE:  # The run was missed, the reactor was busy or clock jumped.
+            if self.catch_up == CRONTAB_CATCH_UP_SKIP:
+                logger.info("Cron task '{label}' missed it's run time, skipping.", label=self.label)
+                return
+            if self.catch_up == CRONTAB_CATCH_UP_ALL:
+                next_run = self.next_run_time(self.next_run)
+                while next_run is not None and next_run <= now and runs < CRONTAB_CATCH_UP_MAX:
+                    runs += 1
+                    next_run = self.next_run_time(next_run)
+            logger.info("Cron task '{label}' missed it's run time, running {runs} time(s).",
+                        label=self.label, runs=runs)
+
+        for _ in range(runs):
             self._Parent._Statistics.increment("lib.crontab.jobs", bucket_size=15, anon=True)
             self.crontab_callback(*self.args, **self.kwargs)
 
@@ -105,6 +105,7 @@ class Devices(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
         "device_id", "device_type_id", "machine_label", "label", "area_label_lower", "full_label_lower",
         "area_label", "full_label", "description"
     ]
+    _storage_index_fields: ClassVar[List[str]] = ["machine_label", "label", "device_type_id"]
     _storage_attribute_sort_key: ClassVar[str] = "machine_label"
 
     @inlineCallbacks
@@ -114,6 +115,7 @@ class Devices(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
         """
         self.all_energy_usage = yield self._SQLDicts.get(self, "all_energy_usage")
         self.all_energy_usage_calllater = None
+        self.state_coalesce_window = self._Configs.get("devices.state_coalesce_window", 0, False)
 
     @inlineCallbacks
     def _load_(self, **kwargs):
@@ -125,6 +127,19 @@ class Devices(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
         """
         yield self.load_from_database()
 
+    @inlineCallbacks
+    def _stop_(self, **kwargs):
+        """
+        Send any coalesced device states to set_state() before the events and database libraries unload.
+
+        :param kwargs:
+        :return:
+        """
+        for device in list(self.devices.values()):
+            if device.state_coalesce_calllater is not None and device.state_coalesce_calllater.active():
+                device.state_coalesce_calllater.cancel()
+                yield device.do_set_state_coalesced()
+
     # @inlineCallbacks
     # def _start_(self, **kwargs):
     #     """testing"""
@@ -33,6 +33,7 @@ from yombo.constants.features import (FEATURE_ALL_OFF, FEATURE_ALL_ON, FEATURE_P
                                       FEATURE_SEND_UPDATES, FEATURE_POWER_CONTROL, FEATURE_ALLOW_IN_SCENES,
                                       FEATURE_SCENE_CONTROLLABLE, FEATURE_ALLOW_DIRECT_CONTROL)
 # Import Yombo libraries
+from yombo.classes.statehistory import StateHistory
 from yombo.core.exceptions import YomboWarning
 from yombo.core.log import get_logger
 from yombo.utils import instance_properties
@@ -71,7 +72,7 @@ class Device(DeviceAttributesMixin, DeviceCommandMixin, DeviceStateMixin):
             system to deliver commands and state update requests.
         :ivar created_at: *(int)* - When the device was created; in seconds since EPOCH.
         :ivar updated_at: *(int)* - When the device was last updated; in seconds since EPOCH.
-        :ivar state_history: *(list)* - A list of state_history items, 0 being newest.
+        :ivar state_history: *(StateHistory)* - Ring buffer of state history items, 0 being newest.
         :ivar available_commands: *(list)* - A list of command_id's that are valid for this device.
         """
         super().__init__(parent, **kwargs)
@@ -141,16 +142,20 @@ class Device(DeviceAttributesMixin, DeviceCommandMixin, DeviceStateMixin):
         self.device_serial = f"ybo-{YOMBOVERSION}"
         self.state_delayed = {}
         self.state_delayed_calllater = None
+        self.state_coalesce_window = None  # Seconds, None uses the 'devices.state_coalesce_window' config.
+        self.state_coalesced = {}  # Latest held state while within the coalescing window.
+        self.state_coalesce_until = 0
+        self.state_coalesce_calllater = None
         self.device_parent = None  # Only set if this device is a child to anther device.
         self.auxiliary_device = None  # Set by modules for to map their device to yombo device.
 
         sizes = memory_sizing[self._Parent._Atoms["system.memory_sizing"]]
         if self.gateway_id != self._gateway_id:
             self.device_commands = deque([], sizes["other_device_commands"])
-            self.state_history = deque([], sizes["other_state_history"])
+            self.state_history = StateHistory(sizes["other_state_history"], self.materialize_state)
         else:
             self.device_commands = deque([], sizes["local_device_commands"])
-            self.state_history = deque([], sizes["local_state_history"])
+            self.state_history = StateHistory(sizes["local_state_history"], self.materialize_state)
 
         if self.test_device is False and self.device_is_new is True:
             self.device_is_new = False
@@ -275,7 +280,7 @@ class Device(DeviceAttributesMixin, DeviceCommandMixin, DeviceStateMixin):
         if "machine_state" in kwargs:
             machine_state = kwargs["machine_state"]
         else:
-            machine_state = self.state_history[0]["machine_state"]
+            machine_state = self.state_history.entry(0).machine_state
 
         if machine_state is None:
             machine_state = 0
@@ -285,7 +290,7 @@ class Device(DeviceAttributesMixin, DeviceCommandMixin, DeviceStateMixin):
         if "machine_state_extra" in kwargs:
             machine_state_extra = kwargs["machine_state_extra"]
         else:
-            machine_state_extra = self.state_history[0]["machine_state_extra"]
+            machine_state_extra = self.state_history.entry(0).machine_state_extra
 
         # print("energy_calc: machine_state: %s" % machine_state)
         # print("energy_calc: machine_state_extra: %s" % machine_state_extra)
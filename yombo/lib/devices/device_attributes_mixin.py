@@ -211,25 +211,33 @@ class DeviceAttributesMixin(Entity, LibraryDBChildMixin):
         """
         Return the machine state of the device.
         """
-        return self.state_all.machine_state
+        return self.machine_state
 
     @property
     def machine_state(self) -> Union[int, float]:
         """
-        Get the current machine state for a device. This is an alias for 'state' property.
+        Get the current machine state for a device. This is an alias for 'state' property. If a state is
+        being held by the coalescing window, the held machine state is returned.
 
         :return:
         """
+        if "machine_state" in self.state_coalesced:
+            return self.state_coalesced["machine_state"]
         return self.state_all.machine_state
 
     @property
     def machine_state_extra(self) -> Dict[str, Any]:
         """
-        Get the current machine state extra details for a device.
+        Get the current machine state extra details for a device, including any held by the coalescing window.
 
         :return:
         """
-        return self.state_all.machine_state_extra
+        machine_state_extra = self.state_all.machine_state_extra
+        if isinstance(self.state_coalesced.get("machine_state_extra"), dict):
+            if isinstance(machine_state_extra, dict) is False:
+                machine_state_extra = {}
+            return {**machine_state_extra, **self.state_coalesced["machine_state_extra"]}
+        return machine_state_extra
 
     @property
     def human_state(self) -> str:
@@ -254,6 +262,9 @@ class DeviceAttributesMixin(Entity, LibraryDBChildMixin):
         """
         Return the device's current state. Will return fake state of
         there is no current state which basically says the state is unknown.
+
+        This is the last saved state, a state held by the coalescing window is only reflected in
+        machine_state and machine_state_extra until it's saved.
         """
         if len(self.state_history) == 0:
             return self._default_state
@@ -317,9 +328,8 @@ class DeviceAttributesMixin(Entity, LibraryDBChildMixin):
 
         If the machine_state is 0, returns. Otherwise returns 100.
         """
-        if len(self.state_history) > 0:
-            machine_state = self.state_history[0].machine_state
-            return self.calc_percent(machine_state, self.machine_state_extra)
+        if len(self.state_history) > 0 or "machine_state" in self.state_coalesced:
+            return self.calc_percent(self.machine_state, self.machine_state_extra)
         return 0
 
     @property
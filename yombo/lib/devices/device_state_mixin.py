@@ -42,6 +42,15 @@ logger = get_logger("library.devices.device")
 
 
 class DeviceStateMixin:
+    def materialize_state(self, entry):
+        """
+        Called by the state history to get the full device state for a history entry.
+
+        :param entry: A StateHistoryEntry from self.state_history.
+        :return: The device state instance.
+        """
+        return self._DeviceStates.materialize_state(self, entry)
+
     def set_state_process(self, **kwargs):
         """
         A place for modules to process any state updates. Make any last minute changes before it's saved and
@@ -54,7 +63,7 @@ class DeviceStateMixin:
         if len(self.state_history) == 0:
             previous_extra = {}
         else:
-            previous_extra = self.state_history[0].machine_state_extra
+            previous_extra = self.state_history.entry(0).machine_state_extra
 
         if isinstance(previous_extra, dict) is False:
             previous_extra = {}
@@ -122,7 +131,7 @@ class DeviceStateMixin:
 
         self.state_delayed = recursive_dict_merge(self.state_delayed, kwargs)
         if DEVICE_COMMAND_REPORTING_SOURCE not in self.state_delayed:
-            self.state_delayed[DEVICE_COMMAND_REPORTING_SOURCE] = caller_string(prefix=f"g=self._gateway_id")
+            self.state_delayed[DEVICE_COMMAND_REPORTING_SOURCE] = caller_string(prefix=f"g={self._gateway_id}")
 
         if self.state_delayed_calllater is not None and self.state_delayed_calllater.active():
             self.state_delayed_calllater.cancel()
@@ -142,6 +151,54 @@ class DeviceStateMixin:
         yield self.set_state(**self.state_delayed)
         self.state_delayed.clear()
 
+    def coalesce_state(self, kwargs: dict) -> bool:
+        """
+        Check if a state change should be held because the device already changed state within it's
+        coalescing window. Held states are still added to the device statistics, and the latest one is
+        sent to set_state() when the window ends. Devices that update often, such as power meters, then only
+        send one state per window through hooks, events, and the database. Until then, machine_state and
+        machine_state_extra return the held state.
+
+        :param kwargs: The set_state() arguments.
+        :return: True if the state was held.
+        """
+        window = self.state_coalesce_window
+        if window is None:
+            window = self._Parent.state_coalesce_window
+        if not window:
+            return False
+        now = time()
+        if now >= self.state_coalesce_until and len(self.state_coalesced) == 0:
+            self.state_coalesce_until = now + window
+            return False
+
+        self.state_coalesced = recursive_dict_merge(self.state_coalesced, kwargs)
+        if DEVICE_COMMAND_REPORTING_SOURCE not in self.state_coalesced:
+            self.state_coalesced[DEVICE_COMMAND_REPORTING_SOURCE] = caller_string(prefix=f"g={self._gateway_id}")
+        if "machine_state" in kwargs:
+            machine_state_extra = kwargs.get("machine_state_extra", {})
+            energy_usage, energy_type = self.energy_calc(command=kwargs.get(DEVICE_COMMAND_COMMAND),
+                                                         machine_state=kwargs["machine_state"],
+                                                         machine_state_extra=machine_state_extra)
+            self.state_statistics(kwargs["machine_state"], energy_usage)
+        if self.state_coalesce_calllater is None or self.state_coalesce_calllater.active() is False:
+            self.state_coalesce_calllater = reactor.callLater(max(self.state_coalesce_until - now, 0),
+                                                              self.do_set_state_coalesced)
+        return True
+
+    def do_set_state_coalesced(self):
+        """
+        Sends the latest held state to set_state(), this starts a new coalescing window. The held state
+        was already added to the statistics by coalesce_state().
+
+        :return:
+        """
+        state_coalesced = self.state_coalesced
+        self.state_coalesced = {}
+        self.state_coalesce_until = 0
+        if len(state_coalesced):
+            return self.set_state(**state_coalesced, statistics_counted=True)
+
     @inlineCallbacks
     def set_state(self, **kwargs):
         """
@@ -160,11 +217,15 @@ class DeviceStateMixin:
             - machine_state *(decimal)* - The new status.
             - machine_state_extra *(dict)* - Extra status as a dictionary.
             - silent *(any)* - If defined, will not broadcast a status update message; atypical.
+            - statistics_counted *(bool)* - If True, the state was already added to the statistics.
 
         """
+        if self.coalesce_state(kwargs) is True:
+            return None
+
         self.state_delayed = recursive_dict_merge(self.state_delayed, kwargs)
         if DEVICE_COMMAND_REPORTING_SOURCE not in self.state_delayed:
-            self.state_delayed[DEVICE_COMMAND_REPORTING_SOURCE] = caller_string(prefix=f"g=self._gateway_id")
+            self.state_delayed[DEVICE_COMMAND_REPORTING_SOURCE] = caller_string(prefix=f"g={self._gateway_id}")
 
         delayed_args = copy(self.state_delayed)
         self.state_delayed.clear()
@@ -203,9 +264,11 @@ class DeviceStateMixin:
         machine_state = kwargs["machine_state"]
         machine_state_extra = kwargs.get("machine_state_extra", {})
         kwargs["machine_state_extra"] = machine_state_extra
-        if machine_state == self.machine_state:
-            if self.machine_state_extra is not None:
-                added, removed, modified, same = dict_diff(machine_state_extra, self.machine_state_extra)
+        statistics_counted = kwargs.pop("statistics_counted", None)
+        current_state = self.state_all  # The last saved state, not a held one.
+        if machine_state == current_state.machine_state:
+            if current_state.machine_state_extra is not None:
+                added, removed, modified, same = dict_diff(machine_state_extra, current_state.machine_state_extra)
                 if len(added) == 0 and len(removed) == 0 and len(modified) == 0:
                     logger.info("Was asked to set state for device ({label}), but state matches. Aborting..",
                                 label=self.full_label)
@@ -263,21 +326,8 @@ class DeviceStateMixin:
                                                      machine_state_extra=machine_state_extra,
                                                      )
 
-        if self.statistic_type not in (None, "", "None", "none"):
-            if self.statistic_type.lower() == "datapoint" or self.statistic_type.lower() == "average":
-                statistic_label_slug = self.statistic_label_slug
-            if self.statistic_type.lower() == "datapoint":
-                self._Parent._Statistics.datapoint(f"devices.{statistic_label_slug}", machine_state)
-                if self.energy_type not in (None, "", "none", "None"):
-                    self._Parent._Statistics.datapoint(f"energy.{statistic_label_slug}", energy_usage)
-            elif self.statistic_type.lower() == "average":
-                self._Parent._Statistics.averages(f"devices.{statistic_label_slug}",
-                                                  machine_state,
-                                                  int(self.statistic_bucket_size))
-                if self.energy_type not in (None, "", "none", "None"):
-                    self._Parent._Statistics.averages(f"energy.{statistic_label_slug}",
-                                                      energy_usage,
-                                                      int(self.statistic_bucket_size))
+        if statistics_counted is not True:
+            self.state_statistics(machine_state, energy_usage)
 
         logger.warn("_set_state - about to call _DeviceStates.....")
         self.set_state_machine_extra(**kwargs)
@@ -326,6 +376,30 @@ class DeviceStateMixin:
 
         return kwargs, device_state
 
+    def state_statistics(self, machine_state, energy_usage):
+        """
+        Add a machine state and energy usage to the device's statistics, if the device has a statistic type.
+
+        :param machine_state:
+        :param energy_usage:
+        :return:
+        """
+        if self.statistic_type not in (None, "", "None", "none"):
+            if self.statistic_type.lower() == "datapoint" or self.statistic_type.lower() == "average":
+                statistic_label_slug = self.statistic_label_slug
+            if self.statistic_type.lower() == "datapoint":
+                self._Parent._Statistics.datapoint(f"devices.{statistic_label_slug}", machine_state)
+                if self.energy_type not in (None, "", "none", "None"):
+                    self._Parent._Statistics.datapoint(f"energy.{statistic_label_slug}", energy_usage)
+            elif self.statistic_type.lower() == "average":
+                self._Parent._Statistics.averages(f"devices.{statistic_label_slug}",
+                                                  machine_state,
+                                                  int(self.statistic_bucket_size))
+                if self.energy_type not in (None, "", "none", "None"):
+                    self._Parent._Statistics.averages(f"energy.{statistic_label_slug}",
+                                                      energy_usage,
+                                                      int(self.statistic_bucket_size))
+
     def send_state(self, device_state):
         """
         Calls the _device_state_ hook to send current device status. Useful if you just want to send a status of
@@ -388,4 +462,5 @@ class DeviceStateMixin:
         global_invoke_all("_device_state_",
                           called_by=self,
                           arguments=message,
+                          concurrent=True,
                           )
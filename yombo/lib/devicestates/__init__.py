@@ -15,16 +15,18 @@ Manages device states.
 :license: LICENSE for details.
 :view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/_modules/yombo/lib/devicestates/__init__.html>`_
 """
-from copy import copy
 from decimal import Decimal
+from sqlite3 import sqlite_version_info
 from time import time
 from typing import Any, ClassVar, Dict, List, Optional, Type, Union
-import weakref
 
 # Import twisted libraries
+from twisted.internet import reactor
 from twisted.internet.defer import inlineCallbacks
 
 # Import Yombo libraries
+from yombo.classes.maxdict import MaxDict
+from yombo.classes.statehistory import StateHistoryEntry
 from yombo.constants.device_states import DEVICESTATE_ID_LENGTH
 from yombo.core.exceptions import YomboWarning
 from yombo.core.library import YomboLibrary
@@ -36,18 +38,28 @@ from yombo.lib.devicecommands import DeviceCommand
 from yombo.mixins.auth_mixin import AuthMixin
 from yombo.mixins.library_db_parent_mixin import LibraryDBParentMixin
 from yombo.mixins.library_search_mixin import LibrarySearchMixin
+from yombo.utils import sleep
 from yombo.utils.caller import caller_string
 from yombo.utils.decorators import cached
 from .device_state import DeviceState
 
+# ROW_NUMBER() OVER (...) requires SQLite 3.25.0 or newer, older versions use one query per device.
+SQLITE_WINDOW_FUNCTIONS = sqlite_version_info >= (3, 25, 0)
+
 logger = get_logger("library.device_commands")
 
 
 class DeviceStates(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
     """
     Stores and track device states.
+
+    Only the newest devices.state_history_full_depth states for each device are kept in device_states, and so
+    are the only ones found by search() or get_advanced(). Older states are kept in the device's state_history,
+    get() and the state_history itself return them as rebuilt DeviceState instances.
     """
     device_states: dict = {}
+    state_history_full_depth: int = 2  # Replaced by devices.state_history_full_depth once _init_ runs.
+    materialized_states: Optional[MaxDict] = None  # state id -> DeviceState, recently released or rebuilt states.
 
     # The remaining attributes are used by various mixins.
     _storage_primary_field_name: ClassVar[str] = "device_state_id"
@@ -66,23 +78,136 @@ class DeviceStates(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
 
     def _init_(self, **kwargs) -> None:
         """
-        Setups up the basic framework. Nothing is loaded in here until the
-        Load() stage.
+        Setups up the basic framework.
         """
         self.clean_device_state_loop = None
+        self.load_history_depth = self._Configs.get("devices.load_history_depth", 30)
+        self.load_history_lazy = self._Configs.get("devices.load_history_lazy", False)
+        self.history_loaded = set()  # Device ids that have their full history loaded.
+        self.history_preloaded = {}  # Device id -> (rows preloaded, oldest preloaded created_at).
+        self.history_loaded_at = None  # When the startup history was loaded.
+        self.state_history_full_depth = self._Configs.get("devices.state_history_full_depth", 2)
+        self.materialized_states = MaxDict(self._Configs.get("devices.state_history_cache_size", 100))
+
+    @inlineCallbacks
+    def _load_(self, **kwargs) -> None:
+        """
+        Loads the recent state history for all devices. Devices are loaded into memory during the Devices
+        library _load_, which runs before this one.
+
+        If devices.load_history_lazy is True, only the current state for each device is loaded. The remaining
+        history is loaded in the background once the gateway has started, or sooner with load_history().
+        """
+        device_ids = list(self._Devices.devices.keys())
+        self.history_loaded_at = time()
+        if self.load_history_lazy is True:
+            yield self.load_devices_history(device_ids, 0, 1, before=self.history_loaded_at)
+        else:
+            yield self.load_devices_history(device_ids, 0, self.load_history_depth)
+            self.history_loaded.update(device_ids)
+
+    def _start_(self, **kwargs) -> None:
+        """ When loading lazily, load the remaining history in the background. """
+        if self.load_history_lazy is True:
+            reactor.callLater(5, self.load_remaining_history)
+
+    @inlineCallbacks
+    def load_remaining_history(self, chunk_size: Optional[int] = None) -> None:
+        """
+        Loads the remaining state history for devices that only had their current state loaded. Devices are
+        loaded in chunks, one query per chunk, with a short pause between chunks to keep the load off the reactor.
 
-        load_history_depth = self._Configs.get("devices.load_history_depth", 30)
-        for device_id, device in self._Devices.devices.items():
-            items = yield self.load_from_database(
-                return_data=True,
-                db_args={"where": {"created_at": [time() - 60*60*24*180, ">"],
-                                   "device_id": device_id},
-                         "limit": load_history_depth,
-                         }
-            )
-            # print(f"devices states starting - for device {device.label} - {items}")
+        :param chunk_size: How many devices to load per query, default is 250.
+        """
+        chunk_size = chunk_size or 250
+        device_ids = [device_id for device_id in self._Devices.devices if device_id not in self.history_loaded]
+        for index in range(0, len(device_ids), chunk_size):
+            chunk = [device_id for device_id in device_ids[index:index + chunk_size]
+                     if device_id not in self.history_loaded]  # load_history() may have loaded some already.
+            self.history_loaded.update(chunk)
+            # The startup load got the newest state before history_loaded_at, if the device had one.
+            yield self.load_devices_history(chunk, 1, self.load_history_depth, chunk_size=chunk_size,
+                                            before=self.history_loaded_at)
+            yield sleep(0.05)
+
+    @inlineCallbacks
+    def load_devices_history(self, device_ids: List[str], skip: int, depth: int, chunk_size: Optional[int] = None,
+                             before: Optional[Union[int, float]] = None):
+        """
+        Loads the state history for many devices. Uses one query per chunk of devices, each query returns
+        the newest states for every device in the chunk. Each chunk is loaded into memory as it arrives. SQLite
+        versions without window functions fall back to one query per device.
+
+        The number of rows and the oldest row loaded for each device are kept in history_preloaded.
+
+        :param device_ids: List of device ids to load.
+        :param skip: Skip this many of the newest states for each device.
+        :param depth: Load states up to this depth.
+        :param chunk_size: How many devices to load per query, default is 250.
+        :param before: Only load states created before this time.
+        """
+        chunk_size = chunk_size or 250
+        if depth <= skip:
+            return
+        oldest = int(time() - 60*60*24*180)
+        before_where = ""
+        before_args = []
+        if before is not None:
+            before_where = " AND created_at < ?"
+            before_args = [before]
+        for index in range(0, len(device_ids), chunk_size):
+            chunk = device_ids[index:index + chunk_size]
+            if SQLITE_WINDOW_FUNCTIONS is True:
+                placeholders = ", ".join(["?"] * len(chunk))
+                records = yield self._LocalDB.db_select_query(
+                    f"SELECT * FROM ("
+                    f"SELECT *, ROW_NUMBER() OVER (PARTITION BY device_id ORDER BY created_at DESC) AS history_row "
+                    f"FROM {self._storage_attribute_name} WHERE device_id IN ({placeholders}) AND created_at > ?"
+                    f"{before_where}) WHERE history_row > ? AND history_row <= ? ORDER BY device_id, created_at ASC",
+                    chunk + [oldest] + before_args + [skip, depth])
+                if records is None:
+                    continue
+                for record in records:
+                    del record["history_row"]
+            else:
+                records = []
+                for device_id in chunk:
+                    device_records = yield self._LocalDB.db_select_query(
+                        f"SELECT * FROM {self._storage_attribute_name} WHERE device_id = ? AND created_at > ?"
+                        f"{before_where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                        [device_id, oldest] + before_args + [depth - skip, skip])
+                    if device_records is not None:
+                        records.extend(reversed(device_records))
+            if len(records) == 0:
+                continue
+            for record in records:
+                count, oldest_loaded = self.history_preloaded.get(record["device_id"], (0, None))
+                if oldest_loaded is None or record["created_at"] < oldest_loaded:
+                    oldest_loaded = record["created_at"]
+                self.history_preloaded[record["device_id"]] = (count + 1, oldest_loaded)
+            items = self.unpickle_data_records(records, self._storage_pickled_fields)
             yield self.load_db_items_to_memory(items, load_source="database")
 
+    @inlineCallbacks
+    def load_history(self, device: Union[str, Device]) -> None:
+        """
+        Make sure the state history for a device is loaded. Only needed if devices.load_history_lazy is True,
+        the remaining history is also loaded in the background after the gateway starts.
+
+        Only states older than the ones already loaded (or older than the startup load if none were found) are
+        requested, so states saved after startup aren't loaded twice.
+
+        :param device: Device instance or device id.
+        """
+        if isinstance(device, Device) is False:
+            device = self._Devices.get(device)
+        if device.device_id in self.history_loaded:
+            return
+        self.history_loaded.add(device.device_id)
+        count, oldest_loaded = self.history_preloaded.get(device.device_id, (0, self.history_loaded_at))
+        yield self.load_devices_history([device.device_id], 0, self.load_history_depth - count,
+                                        before=oldest_loaded)
+
     def load_an_item_to_memory_pre_process(self, incoming: dict, **kwargs) -> None:
         """
         Receive the item before being loading to memory.
@@ -102,33 +227,128 @@ class DeviceStates(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
 
     def load_an_item_to_memory_post_process(self, instance: DeviceState) -> None:
         """
-        Used to create a weakref to the local device.state_history. This allows each device to keep it's state
-        history, but at the same time, that list will be cleaned up if the primary reference has been removed.
+        Adds a compact entry for the state to the device's state_history ring buffer. Only the newest
+        devices.state_history_full_depth states for a device are kept as full DeviceState instances, older
+        states are released from memory and materialized from their history entry when requested.
+
+        The device's default (fake) state isn't history and isn't added.
 
         :param instance: device state instance
         :return:
         """
-        instance.device.state_history.appendleft(weakref.proxy(instance))
-        f = weakref.finalize(instance, self.remove_weakref_state_history, copy(instance.device_id), copy(instance.device_state_id))
-        f.atexit = False
-
-    def remove_weakref_state_history(self, device_id: str, device_state_id: str) -> None:
+        if instance._fake_data is True:
+            return
+        state_history = instance.device.state_history
+        position, dropped = state_history.add(StateHistoryEntry(instance.created_at, instance.machine_state,
+                                                                instance.machine_state_extra,
+                                                                instance.device_state_id))
+        if dropped is not None:  # Out of the history, nothing can request it anymore.
+            self.release_state(dropped.state_id)
+            self.materialized_states.pop(dropped.state_id, None)
+        if position is None:
+            return
+        if position >= self.state_history_full_depth:
+            self.release_state(instance.device_state_id)
+        elif len(state_history) > self.state_history_full_depth:
+            self.release_state(state_history.entry(self.state_history_full_depth).state_id)
+
+    def release_state(self, device_state_id: str) -> None:
         """
-        This is called buy the weakref module when the primary reference has been removed. This removes
-        the reference within the device instance.
+        Removes a full device state instance from storage, it's compact entry remains in the device's
+        state_history. The instance is kept in materialized_states until newer releases push it out. Pending
+        database syncs keep their own reference to the instance until they complete.
 
-        :param device_id:
         :param device_state_id:
         :return:
         """
-        device = self._Devices[device_id]
+        if device_state_id in self.device_states:
+            self.materialized_states[device_state_id] = self.device_states.pop(device_state_id)
+            self.storage_index_remove(device_state_id)
 
-        for i, obj in enumerate(device.state_history):
-            try:
-                if obj.device_state_id == device_state_id:
-                    del device.state_history[i]
-            except ReferenceError:
-                del device.state_history[i]
+    def materialize_state(self, device: Device, entry: StateHistoryEntry) -> DeviceState:
+        """
+        Returns the full device state for a state_history entry. States that were released from memory are
+        rebuilt from the entry, the remaining values are generated by the device the same way _set_state() does
+        for a new state. Who requested the state and why is only kept in the database, rebuilt states list the
+        system user. A rebuilt state is a read only snapshot, it isn't placed back into storage and changes to it
+        aren't saved.
+
+        Rebuilt states are kept in materialized_states, so requesting the same entry again returns the same instance.
+
+        :param device: The device the entry belongs to.
+        :param entry: A StateHistoryEntry.
+        :return:
+        """
+        if entry.state_id in self.device_states:
+            return self.device_states[entry.state_id]
+        if entry.state_id in self.materialized_states:
+            return self.materialized_states[entry.state_id]
+
+        machine_state = entry.machine_state
+        machine_state_extra = entry.machine_state_extra
+        try:
+            energy_usage, energy_type = device.energy_calc(machine_state=machine_state,
+                                                           machine_state_extra=machine_state_extra)
+        except ValueError:
+            energy_usage, energy_type = 0, device.energy_type
+        device_state = DeviceState(self,
+                                   incoming={
+                                       "id": entry.state_id,
+                                       "device": device,
+                                       "command": device.command_from_status(machine_state, machine_state_extra),
+                                       "device_command": None,
+                                       "machine_state": machine_state,
+                                       "machine_state_extra": machine_state_extra,
+                                       "human_state": device.generate_human_state(machine_state,
+                                                                                  machine_state_extra),
+                                       "human_message": device.generate_human_message(machine_state,
+                                                                                      machine_state_extra),
+                                       "energy_usage": energy_usage,
+                                       "energy_type": energy_type,
+                                       "gateway_id": device.gateway_id,
+                                       "reporting_source": None,
+                                       "uploaded": None,
+                                       "uploadable": None,
+                                       "request_by": self._Users.system_user.accessor_id,
+                                       "request_by_type": self._Users.system_user.accessor_type,
+                                       "request_context": None,
+                                       "created_at": entry.created_at,
+                                   },
+                                   load_source="database")
+        self.materialized_states[entry.state_id] = device_state
+        return device_state
+
+    def find_released_state(self, device_state_id: str) -> Optional[DeviceState]:
+        """
+        Find a device state that was released from storage by looking through the device state histories.
+
+        :param device_state_id:
+        :return: The device state, or None if it's not in any device's state_history.
+        """
+        if device_state_id in self.materialized_states:
+            return self.materialized_states[device_state_id]
+        for device in self._Devices.devices.values():
+            entry = device.state_history.find(device_state_id)
+            if entry is not None:
+                return self.materialize_state(device, entry)
+        return None
+
+    def get(self, item_requested, limiter=None):
+        """
+        Get a device state by it's ID. States that are no longer kept in storage are found through the
+        device state histories, see find_released_state().
+
+        :param item_requested: The device state ID.
+        :param limiter: If set, and no exact match is found, return the best search() result above this ratio.
+        :return:
+        """
+        try:
+            return super().get(item_requested, limiter=limiter)
+        except KeyError:
+            device_state = self.find_released_state(item_requested)
+            if device_state is None:
+                raise
+            return device_state
 
     def mqtt_incoming(self, topic, payload, qos, retain) -> None:
         pass
@@ -246,13 +466,11 @@ class DeviceStates(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
     @cached(1)  # memoize for 5 seconds
     def state(self, device_id):
         """
-        Returns a list of device states for a given device, but only those loaded in memory.
+        Returns a list of device states for a given device, but only those loaded in memory. Newest first.
 
         :param device_id:
         :return:
         """
-        results = []
-        for device_state_id, device_state in self.device_states.items():
-            if device_state.device_id == device_id:
-                results.append(device_state)
-        return results
+        if device_id not in self._Devices.devices:
+            return []
+        return list(self._Devices.devices[device_id].state_history)
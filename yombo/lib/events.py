@@ -18,26 +18,55 @@ https://stackoverflow.com/questions/2797592/best-practice-logging-events-general
 :license: LICENSE for details.
 :view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/_modules/yombo/lib/events.html>`_
 """
-from collections import OrderedDict
 from copy import deepcopy
 from time import time
 from typing import Any, ClassVar, Dict, List, Optional, Type, Union
 
 # Import twisted libraries
+from twisted.internet import reactor
 from twisted.internet.defer import inlineCallbacks
-from twisted.internet.task import LoopingCall
 
 # Import Yombo libraries
+from yombo.classes.ringbuffer import RingBuffer
 from yombo.constants.events import SYSTEM_EVENT_TYPES
 from yombo.core.exceptions import YomboWarning
 from yombo.core.library import YomboLibrary
 from yombo.core.log import get_logger
 from yombo.mixins.auth_mixin import AuthMixin
+from yombo.utils import sleep
 from yombo.utils.caller import caller_string
 from yombo.utils.hookinvoke import global_invoke_all
 
 logger = get_logger("library.events")
 
+EVENT_COLUMNS = ("event_type", "event_subtype", "priority", "request_by", "request_by_type", "request_context",
+                 "created_at")
+EVENT_MAX_ATTRIBUTES = 10  # The events table has attr1 through attr10.
+
+
+class EventType:
+    """
+    A registered event type and sub-type, compiled into what's needed to queue and save it's events.
+    """
+    __slots__ = ("event_type", "event_subtype", "slot", "attribute_count", "columns", "padding", "statement")
+
+    def __init__(self, event_type: str, event_subtype: str, slot: int, attributes: Union[list, tuple]):
+        """
+        :param event_type:
+        :param event_subtype:
+        :param slot: Index of the event queue for this event type.
+        :param attributes: The attribute names registered for the event type.
+        """
+        if len(attributes) > EVENT_MAX_ATTRIBUTES:
+            raise YomboWarning(f"Event type {event_type}:{event_subtype} has more than {EVENT_MAX_ATTRIBUTES}"
+                               f" attributes.")
+        self.event_type = event_type
+        self.event_subtype = event_subtype
+        self.slot = slot
+        self.attribute_count = len(attributes)
+        self.columns = EVENT_COLUMNS + tuple(f"attr{index + 1}" for index in range(len(attributes)))
+        self.padding = (None, ) * len(attributes)  # Fills in attributes that weren't provided.
+        self.statement = None  # INSERT statement, set on first save since the database may not be connected yet.
 
 
 class Events(YomboLibrary):
@@ -63,15 +92,31 @@ class Events(YomboLibrary):
     def _init_(self, **kwargs):
         """
         Setup the queue so events can be saved right away.
+
+        Events are queued as row tuples into a ring buffer per event type and sub-type. The queues are saved
+        once events.flush_size events are waiting, or once the oldest waiting event is events.flush_age seconds
+        old. If saving falls behind, each queue holds at most events.queue_size events and drops the oldest.
+        Events that fail to save are put back into their queues and retried after events.flush_age seconds.
+
         :param kwargs:
         :return:
         """
         self.enabled = self._Configs.get("events.enabled", True)
-        self.event_queue = {}  # Save events in bulk.
+        self.queue_size = self._Configs.get("events.queue_size", 500)
+        self.flush_size = self._Configs.get("events.flush_size", 250)
+        self.flush_age = self._Configs.get("events.flush_age", 47)
+        self.event_queue = []  # RingBuffer of row tuples, indexed by EventType.slot.
+        self.event_queue_count = 0
+        self.event_counters = {"queued": 0, "saved": 0, "dropped": 0, "failed": 0}
+        self.event_dropped_reported = 0
         self.event_types = deepcopy(SYSTEM_EVENT_TYPES)
+        self.event_descriptors = {}  # (event_type, event_subtype): EventType
+        for event_type, event_data in self.event_types.items():
+            for event_subtype, event_subdata in event_data.items():
+                self.compile_event_type(event_type, event_subtype, event_subdata)
         self.save_event_queue_running = False
-        self.save_event_queue_loop = LoopingCall(self.save_event_queue)
-        self.save_event_queue_loop.start(47, False)
+        self.save_event_queue_retrying = False  # The last save failed, wait for the retry instead of saving early.
+        self.save_event_queue_callLater = None
 
     @inlineCallbacks
     def _load_(self, **kwargs):
@@ -87,22 +132,30 @@ class Events(YomboLibrary):
                 if event_type not in self.event_types:
                     self.event_types[event_type] = {}
                 for event_subtype, event_subdata in event_data.items():
-                    if event_subtype in self.event_types:
+                    if event_subtype in self.event_types[event_type]:
                         logger.warn("Cannot add event type, already exists: {event_type}:{event_subtype}",
                                     event_type=event_type, event_subtype=event_subtype)
                         continue
+                    try:
+                        self.compile_event_type(event_type, event_subtype, event_subdata)
+                    except YomboWarning as e:
+                        logger.warn("Cannot add event type: {e}", e=e)
+                        continue
                     self.event_types[event_type][event_subtype] = event_subdata
 
     @inlineCallbacks
     def _unload_(self, **kwargs):
         """
-        Save remaining events on gateways shutdown.
+        Save remaining events on gateways shutdown. If a save is already running, wait for it and then
+        save anything queued since.
 
         :return:
         """
         if self.enabled is False:
             return
 
+        while self.save_event_queue_running is True:
+            yield sleep(0.05)
         yield self.save_event_queue()
 
     def new(self, event_type: str, event_subtype: str, attributes: list = None, priority: str = None,
@@ -123,38 +176,58 @@ class Events(YomboLibrary):
         if request_context is None:
             request_context = caller_string()  # get the module/class/function name of caller
 
-        if event_type not in self.event_types:
-            raise YomboWarning(f"Invalid event type: {event_type}")
-        if event_subtype not in self.event_types[event_type]:
+        descriptor = self.event_descriptors.get((event_type, event_subtype))
+        if descriptor is None:
+            if event_type not in self.event_types:
+                raise YomboWarning(f"Invalid event type: {event_type}")
             raise YomboWarning(f"Invalid event sub-type: {event_subtype}")
         if isinstance(attributes, list) is False and isinstance(attributes, tuple) is False:
-            attributes = [attributes, ]
+            attributes = (attributes, )
+        if len(attributes) > descriptor.attribute_count:
+            raise YomboWarning(f"Event {event_type}:{event_subtype} accepts at most {descriptor.attribute_count}"
+                               f" attributes, received {len(attributes)}.")
 
         try:
             request_by, request_by_type = self._Permissions.request_by_info(
                 authentication, request_by, request_by_type)
         except YomboWarning:
             request_by, request_by_type = self._Permissions.request_by_info(self._Users.system_user)
-        if request_context is None:
-            request_context = caller_string()  # get the module/class/function name of caller
 
-        event = {
-            "event_type": event_type,
-            "event_subtype": event_subtype,
-            "priority": priority,
-            "request_by": request_by,
-            "request_by_type": request_by_type,
-            "request_context": request_context,
-            "created_at": created_at,
-            }
-        event.update(OrderedDict({f"attr{v + 1}": k for v, k in enumerate(attributes)}))
-        length = str(len(event))
-        if length not in self.event_queue:
-            self.event_queue[length] = []
+        self.queue_event(descriptor, (event_type, event_subtype, priority, request_by, request_by_type,
+                                      request_context, created_at, *attributes,
+                                      *descriptor.padding[len(attributes):]))
 
-        self.event_queue[length].append(event)
+    def queue_event(self, descriptor: EventType, row: tuple) -> None:
+        """
+        Add an event row to it's queue, and schedule saving the queues based on size or age.
 
-    def new_type(self, event_type: str, event_subtype: str, description: str, attributes: Union[list, tuple]) -> None:
+        :param descriptor: The EventType for the event.
+        :param row: Tuple of values, in the same order as the descriptor's columns.
+        """
+        if self.event_queue[descriptor.slot].append(row) is None:
+            self.event_queue_count += 1
+        else:
+            self.event_counters["dropped"] += 1
+        self.event_counters["queued"] += 1
+
+        if self.event_queue_count >= self.flush_size:
+            if self.save_event_queue_running is False and self.save_event_queue_retrying is False:
+                self.save_event_queue()
+        elif self.save_event_queue_callLater is None:
+            self.schedule_save_event_queue(self.flush_age)
+
+    def schedule_save_event_queue(self, delay: Union[int, float]) -> None:
+        """
+        Save the event queues after a delay, replacing any save already scheduled.
+
+        :param delay: Seconds to wait.
+        """
+        if self.save_event_queue_callLater is not None and self.save_event_queue_callLater.active():
+            self.save_event_queue_callLater.cancel()
+        self.save_event_queue_callLater = reactor.callLater(delay, self.save_event_queue)
+
+    def new_type(self, event_type: str, event_subtype: str, description: str, attributes: Union[list, tuple],
+                 expires: Optional[int] = None) -> None:
         """
         Used by modules to create new event types.
 
@@ -162,37 +235,109 @@ class Events(YomboLibrary):
         :param event_subtype:
         :param description:
         :param attributes:
+        :param expires: How long to keep the events, 0 keeps them forever. Default is 2160, same as most
+            system event types.
         :return:
         """
-        if event_type not in self.event_types:
-            self.event_types[event_type] = {}
-        if event_subtype in self.event_types[event_type]:
+        if event_type in self.event_types and event_subtype in self.event_types[event_type]:
             raise YomboWarning("Event type & sub type combo already exists.")
-        self.event_types[event_type][event_subtype] = {
-            "descrption": description,
+        event_subdata = {
+            "description": description,
             "attributes": attributes,
+            "expires": 2160 if expires is None else expires,
         }
+        self.compile_event_type(event_type, event_subtype, event_subdata)
+        if event_type not in self.event_types:
+            self.event_types[event_type] = {}
+        self.event_types[event_type][event_subtype] = event_subdata
+
+    def compile_event_type(self, event_type: str, event_subtype: str, event_subdata: dict) -> EventType:
+        """
+        Creates the EventType descriptor and event queue for a registered event type, so that new() only needs
+        a single lookup.
+
+        :param event_type:
+        :param event_subtype:
+        :param event_subdata: The event type details, including it's attributes.
+        :return:
+        """
+        descriptor = EventType(event_type, event_subtype, len(self.event_queue), event_subdata["attributes"])
+        self.event_queue.append(RingBuffer(self.queue_size))
+        self.event_descriptors[(event_type, event_subtype)] = descriptor
+        return descriptor
 
     @inlineCallbacks
     def save_event_queue(self):
         """
-        Bulk save events into the database.
+        Bulk save events into the database. All queued rows are saved within a single transaction, one
+        executemany per queue. If the save fails, the rows are put back into their queues ahead of any
+        events queued during the save, the queues still drop the oldest events when full.
+
         :return:
         """
+        if self.save_event_queue_callLater is not None and self.save_event_queue_callLater.active():
+            self.save_event_queue_callLater.cancel()
+        self.save_event_queue_callLater = None
+
         if self.enabled is False:
-            self.event_queue = {}
+            for queue in self.event_queue:
+                queue.drain()
+            self.event_queue_count = 0
             return
 
-        if self.save_event_queue_running is True:
+        if self.save_event_queue_running is True or self.event_queue_count == 0:
             return
         self.save_event_queue_running = True
 
-        if len(self.event_queue) == 0:
-            return
+        dropped = self.event_counters["dropped"] - self.event_dropped_reported
+        if dropped > 0:
+            logger.warn("Event queues were full, dropped the oldest {dropped} events.", dropped=dropped)
+            self.event_dropped_reported = self.event_counters["dropped"]
 
-        event_queue = deepcopy(self.event_queue)
-        self.event_queue = {}
-        for key, data in event_queue.items():
-            yield self._LocalDB.database.db_insert("events", data)
+        database = self._LocalDB.database
+        slots = []
+        batches = []
+        try:
+            for descriptor in self.event_descriptors.values():
+                queue = self.event_queue[descriptor.slot]
+                if len(queue) == 0:
+                    continue
+                if descriptor.statement is None:
+                    descriptor.statement = database.insert_statement("events", descriptor.columns)
+                slots.append(descriptor.slot)
+                batches.append((descriptor.statement, queue.drain()))
+            self.event_queue_count = 0
+            count = yield database.db_execute_batches(batches)
+            self.event_counters["saved"] += count
+            self.save_event_queue_retrying = False
+        except Exception as e:
+            count = sum(len(rows) for query, rows in batches)
+            self.event_counters["failed"] += count
+            logger.warn("Unable to save {count} events, will retry: {e}", count=count, e=e)
+            self.requeue_events(slots, batches)
+            self.save_event_queue_retrying = True
+        finally:
+            self.save_event_queue_running = False
+
+        if self.save_event_queue_retrying is True:
+            if self.event_queue_count > 0:
+                self.schedule_save_event_queue(self.flush_age)
+        elif self.event_queue_count >= self.flush_size:
+            self.schedule_save_event_queue(0)
+        elif self.event_queue_count > 0:
+            self.schedule_save_event_queue(self.flush_age)
+
+    def requeue_events(self, slots: List[int], batches: List[tuple]) -> None:
+        """
+        Put rows that failed to save back into their queues. They are older than any events queued during
+        the save, so they go in first. If a queue overflows, the oldest events are dropped and counted.
 
-        self.save_event_queue_running = False
+        :param slots: The EventType.slot for each batch.
+        :param batches: List of (statement, rows) tuples that failed to save.
+        """
+        for slot, (statement, rows) in zip(slots, batches):
+            queue = self.event_queue[slot]
+            for row in rows + queue.drain():
+                if queue.append(row) is not None:
+                    self.event_counters["dropped"] += 1
+        self.event_queue_count = sum(len(queue) for queue in self.event_queue)
@@ -40,6 +40,55 @@ logger = get_logger("library.intents")
 
 SLOT_SCHEMA = vol.Schema({}, extra=vol.ALLOW_EXTRA)
 
+# Pattern matches : Change light to [the color] {name}
+STATEMENT_PARTS = re.compile(r"({\w+}|\[[\w\s]+\] *)")
+# GROUP, Matches {name}
+GROUP_MATCHER = re.compile(r"{(\w+)}")
+# OPTIONAL, Matches [the color]
+OPTIONAL_MATCHER = re.compile(r"\[([\w ]+)\] *")
+
+
+def statement_pattern(statement: str, slot_choices: Optional[dict] = None, prefix: Optional[str] = None):
+    """
+    Convert an intent statement into a regex pattern, without anchors.
+
+    Slots listed in slot_choices only match one of the provided values, other slots match any words.
+
+    :param statement: The statement, such as: Turn on [the] {name}
+    :param slot_choices: Optional dictionary of slot name: list of values.
+    :param prefix: Prefix added to the group names, used when combining patterns into one regex.
+    :return: A tuple of the pattern and a list of slot names. Returns None if a slot has no choices.
+    """
+    slot_choices = slot_choices or {}
+    prefix = prefix or ""
+    pattern = []
+    groups = []
+    for part in STATEMENT_PARTS.split(statement):
+        group_match = GROUP_MATCHER.match(part)
+        optional_match = OPTIONAL_MATCHER.match(part)
+
+        # Normal part
+        if group_match is None and optional_match is None:
+            pattern.append(re.escape(part))
+            continue
+
+        # Group part
+        if group_match is not None:
+            name = group_match.groups()[0]
+            groups.append(name)
+            if name in slot_choices:
+                if len(slot_choices[name]) == 0:
+                    return None
+                choices = "|".join(re.escape(choice) for choice in sorted(slot_choices[name], key=len, reverse=True))
+                pattern.append(r"(?P<{}{}>{})\s*".format(prefix, name, choices))
+            else:
+                pattern.append(r"(?P<{}{}>[\w ]+?)\s*".format(prefix, name))
+
+        # Optional part
+        elif optional_match is not None:
+            pattern.append(r"(?:{} *)?".format(optional_match.groups()[0]))
+    return "".join(pattern), groups
+
 
 class Intents(YomboLibrary):
     """
@@ -50,6 +99,11 @@ class Intents(YomboLibrary):
         self.history = deque([], 100)
         self.off_locations = None
         self.on_locations = None
+        self.compiled_matcher = None  # (regex, [(intent, match_info)]), every intent statement in one regex.
+        self.location_labels = {}  # label -> location_id
+        self.area_labels = {}  # label -> location_id (of the area)
+        self.area_devices = None  # (location_id, area_id) -> [device_ids]
+        self.area_devices_count = None
 
     def _load_(self, **kwargs):
         """
@@ -75,6 +129,7 @@ class Intents(YomboLibrary):
         }
 
         # By location
+        self.update_location_labels()
         statements = self.generate_location_statements("On")
         self.on_locations = self.add(
             statements,
@@ -234,44 +289,51 @@ class Intents(YomboLibrary):
         # except YomboWarning as e:
         #     print("(intents) ERROR: %s" % e)
 
-    def generate_location_statements(self, action):
-        statements = []
+    def update_location_labels(self):
+        """
+        Build the label to id lookups for locations and areas, used to match location statements.
+        """
+        self.location_labels = {}
+        self.area_labels = {}
         for location_id, location in self._Locations.locations.items():
-            if location.location_type != "location" or location.machine_label == "none":
+            if location.machine_label == "none":
                 continue
-            location_label = location.label.lower()
-            for area_id, area in self._Locations.locations.items():
-                if area.location_type != "area" or area.machine_label == "none":
-                    continue
-                area_label = area.label.lower()
-                statements.append({
-                    "statement": f"Turn [all] [the] {location_label} {area_label} {{item_type}}[s] {action.lower()}",
-                    "statement_slots": {"location_id": {"value": location_id},
-                              "area_id": {"value": area_id},
-                              }
-                    }
-                )
+            if location.location_type == "location":
+                self.location_labels[location.label.lower()] = location_id
+            elif location.location_type == "area":
+                self.area_labels[location.label.lower()] = location_id
 
-                statements.append({
-                    "statement": f"Turn {action.lower()} [all] [the] {location_label} {{area_label}} {{item_type}}[s]",
-                    "statement_slots": {"location_id": {"value": location_id},
-                              "area_id": {"value": area_id}
-                              },
-                    }
-                )
-
-                statements.append({
-                    "statement": f"Turn [all] [the] {area_label} {{item_type}}[s] {action.lower()}",
-                    "statement_slots": {"area_id": {"value": area_id}},
-                    }
-                )
+    def generate_location_statements(self, action):
+        """
+        Generate the location statements. The location and area names are matched against the current label
+        lookups, instead of one statement for every location and area combination.
 
-                statements.append({
-                    "statement": f"Turn {action.lower()} [all] [the] {area_label} {{item_type}}[s]",
-                    "statement_slots": {"area_id": {"value": area_id}},
-                    }
-                )
-        return statements
+        :param action: On or Off.
+        :return:
+        """
+        action = action.lower()
+        slot_choices = {
+            "location_label": list(self.location_labels),
+            "area_label": list(self.area_labels),
+        }
+        return [
+            {"statement": f"Turn [all] [the] {{location_label}} {{area_label}} {{item_type}}[s] {action}",
+             "statement_slots": {},
+             "slot_choices": slot_choices,
+             },
+            {"statement": f"Turn {action} [all] [the] {{location_label}} {{area_label}} {{item_type}}[s]",
+             "statement_slots": {},
+             "slot_choices": slot_choices,
+             },
+            {"statement": f"Turn [all] [the] {{area_label}} {{item_type}}[s] {action}",
+             "statement_slots": {},
+             "slot_choices": slot_choices,
+             },
+            {"statement": f"Turn {action} [all] [the] {{area_label}} {{item_type}}[s]",
+             "statement_slots": {},
+             "slot_choices": slot_choices,
+             },
+        ]
 
     def generate_scene_statements(self, action):
         statements = []
@@ -323,12 +385,44 @@ class Intents(YomboLibrary):
     def _locations_updated_(self, arguments, **kwargs):
         self.update_locations()
 
-    def _locations_deleted_(self, arguments, **kwargs):
+    def _location_loaded_(self, arguments, **kwargs):
+        self.update_locations()
+
+    def _location_updated_(self, arguments, **kwargs):
         self.update_locations()
 
     def update_locations(self, **kwargs):
+        if self.on_locations is None:  # Intents haven't been setup yet.
+            return
+        self.update_location_labels()
         self.on_locations.statements = self.generate_location_statements("on")
         self.off_locations.statements = self.generate_location_statements("off")
+        self.area_devices = None
+
+    def _device_loaded_(self, arguments, **kwargs):
+        self.area_devices = None
+
+    def _device_updated_(self, arguments, **kwargs):
+        self.area_devices = None
+
+    def devices_in_area(self, location_id, area_id):
+        """
+        Returns the devices within a location and area. The lookup is built once and rebuilt after devices
+        are loaded or updated.
+
+        :param location_id:
+        :param area_id:
+        :return: List of devices.
+        """
+        devices = self._Devices.devices
+        if self.area_devices is None or self.area_devices_count != len(devices):
+            area_devices = {}
+            for device_id, device in devices.items():
+                area_devices.setdefault((device.location_id, device.area_id), []).append(device_id)
+            self.area_devices = area_devices
+            self.area_devices_count = len(devices)
+        return [devices[device_id] for device_id in self.area_devices.get((location_id, area_id), ())
+                if device_id in devices]
 
     def _scene_added_(self, arguments, **kwargs):
         self.update_scenes()
@@ -447,16 +541,20 @@ class Intents(YomboLibrary):
         item_type = slots["item_type"]["value"]
 
         location_id = slots.get("location_id", None)
+        if location_id is not None:
+            location_id = location_id["value"]
+        elif "location_label" in slots:
+            location_id = self.location_labels.get(slots["location_label"]["value"].lower())
         if location_id is None:
             location_id = self._Locations.location_id
-        else:
-            location_id = location_id["value"]
 
         area_id = slots.get("area_id", None)
+        if area_id is not None:
+            area_id = area_id["value"]
+        elif "area_label" in slots:
+            area_id = self.area_labels.get(slots["area_label"]["value"].lower())
         if area_id is None:
             area_id = self._Locations.area_id
-        else:
-            area_id = area_id["value"]
 
         location = self._Locations.get(location_id)
         area = self._Locations.get(area_id)
@@ -464,14 +562,7 @@ class Intents(YomboLibrary):
         if item_type not in ("light", "device"):
             return
 
-        for device_id, device in self._Devices.devices.items():
-            if device.location_id != location_id:
-                print("device (%s) is not in the right location_id: %s" % (device.full_label, location_id))
-                continue
-            if device.area_id != area_id:
-                print("device (%s) is not in the right area_id: %s" % (device.full_label, area_id))
-                continue
-
+        for device in self.devices_in_area(location_id, area_id):
             if item_type == "light":
                 if device.PLATFORM_BASE != PLATFORM_LIGHT:
                     continue
@@ -529,6 +620,7 @@ class Intents(YomboLibrary):
                 hash_string += description
             intent_id = self._Hash.sha224_compact(hash_string)[:15]
 
+        self.compiled_matcher = None
         self.intents[intent_id] = Intent(self,
                                          statements=statements,
                                          intent_id=intent_id,
@@ -563,11 +655,8 @@ class Intents(YomboLibrary):
         #     "slots": {},
         # }
         intent_request = None
-        for intent_id, intent in self.intents.items():
-            try:
-                intent_request = intent.match(statement, source)
-            except YomboWarning:
-                continue
+        for intent, match_info, values in self.matching_intents(statement):
+            intent_request = intent.request_from_match(match_info, values, statement, source)
             print("(intents) Found a matchin: %s" % intent_request)
             print("(intents) Found a callback: %s" % intent.callback)
             # intent_response = intent.callback(intent_request)
@@ -585,6 +674,55 @@ class Intents(YomboLibrary):
 
         raise YomboWarning("No intents matched request statement: %s" % statement)
 
+    def compile_matcher(self):
+        """
+        Combine the statements of every intent into a single regex. Each statement is wrapped in a named group
+        so the matching statement can be found from match.lastgroup.
+        """
+        entries = []
+        patterns = []
+        for intent in self.intents.values():
+            for match_info in intent.matchers:
+                index = len(entries)
+                pattern, groups = statement_pattern(match_info["statement"], match_info["slot_choices"],
+                                                    f"m{index}_")
+                patterns.append(f"(?P<m{index}>{pattern})")
+                entries.append((intent, match_info))
+        if len(patterns):
+            regex = re.compile("^(?:{})$".format("|".join(patterns)), re.I)
+        else:
+            regex = None
+        self.compiled_matcher = (regex, entries)
+
+    def matching_intents(self, statement):
+        """
+        Yields (intent, match_info, slot values) for intents matching the statement, in the order the intents
+        were added. Only one match per intent is returned.
+
+        The first match is found using the combined regex. Later intents are only checked if the caller
+        asks for more, such as when an intent callback couldn't handle the request.
+
+        :param statement:
+        :return:
+        """
+        if self.compiled_matcher is None:
+            self.compile_matcher()
+        regex, entries = self.compiled_matcher
+        if regex is None:
+            return
+        match = regex.match(statement)
+        if match is None:
+            return
+        index = int(match.lastgroup[1:])
+        intent, match_info = entries[index]
+        yield intent, match_info, {name: match.group(f"m{index}_{name}") for name in match_info["groups"]}
+
+        intents = list(self.intents.values())
+        for later_intent in intents[intents.index(intent) + 1:]:
+            found = later_intent.find_match(statement)
+            if found is not None:
+                yield later_intent, found[0], found[1]
+
     def get(self, intent_id):
         if intent_id in self.intents:
             return self.intents[intent_id]
@@ -599,7 +737,7 @@ class Intent(Entity):
     @statements.setter
     def statements(self, value):
         self._statements = value
-        self.matchers = self.create_matchers()
+        self.create_matchers()
 
     def __init__(self, parent, statements, intent_id, callback, meta, description, source, slot_schema,
                  intent_type):
@@ -625,30 +763,50 @@ class Intent(Entity):
         :return:
         """
         print("(intents)   * intent::match - intent=%s" % statement)
+        found = self.find_match(statement)
+        if found is None:
+            raise YomboWarning("Intent not matched.")
+        return self.request_from_match(found[0], found[1], statement, source)
+
+    def find_match(self, statement):
+        """
+        Returns the first matcher that matches the statement and the slot values, or None.
+
+        :param statement:
+        :return:
+        """
         for match_info in self.matchers:
-            matcher = match_info["matcher"]
-            match = matcher.match(statement)
-            if not match:
-                continue
+            match = match_info["matcher"].match(statement)
+            if match:
+                return match_info, match.groupdict()
+        return None
 
-            print("(intents)     * intent::match - matcher=%s" % matcher)
-            print("(intents)     * intent::match - match_info=%s" % match_info)
-            # we have a matching intent, now lets check if it has the required slots.
-            slots = match_info["statement_slots"]
-            slots.update(
-                {key: {"value": value} for key, value in match.groupdict().items()}
-            )
+    def request_from_match(self, match_info, values, statement, source=None):
+        """
+        Validate the slots of a matched statement and create the intent request.
 
-            something = self.validate_slots(slots)
-            print("(intents) got something from validate_slots: %s" % something)
-            self.match_count += 1
-            return IntentRequest(intent=self,
-                                 slots=slots,
-                                 source=source,
-                                 statement=statement,
-                                 statement_slots=match_info["statement_slots"],
-                                 )
-        raise YomboWarning("Intent not matched.")
+        :param match_info: The matcher that matched.
+        :param values: Dictionary of slot name: matched value.
+        :param statement:
+        :param source:
+        :return:
+        """
+        print("(intents)     * intent::match - match_info=%s" % match_info)
+        # we have a matching intent, now lets check if it has the required slots.
+        slots = dict(match_info["statement_slots"])
+        slots.update(
+            {key: {"value": value} for key, value in values.items()}
+        )
+
+        something = self.validate_slots(slots)
+        print("(intents) got something from validate_slots: %s" % something)
+        self.match_count += 1
+        return IntentRequest(intent=self,
+                             slots=slots,
+                             source=source,
+                             statement=statement,
+                             statement_slots=match_info["statement_slots"],
+                             )
 
     def validate_slots(self, slots):
         """
@@ -673,42 +831,23 @@ class Intent(Entity):
         """
         Create a regex that matches the intent (voice command / speech).
         """
+        self.matchers = []
         for temp_statement in self._statements:
             statement = temp_statement["statement"]
-            statement_slots = temp_statement["statement_slots"]
-            # Pattern matches : Change light to [the color] {name}
-            parts = re.split(r"({\w+}|\[[\w\s]+\] *)", statement)
-
-            # GROUP, Matches {name}
-            group_matcher = re.compile(r"{(\w+)}")
-            # OPTIONAL, Matches [the color]
-            optional_matcher = re.compile(r"\[([\w ]+)\] *")
-
-            pattern = ["^"]
-            for part in parts:
-                group_match = group_matcher.match(part)
-                optional_match = optional_matcher.match(part)
-
-                # Normal part
-                if group_match is None and optional_match is None:
-                    pattern.append(part)
-                    continue
-
-                # Group part
-                if group_match is not None:
-                    pattern.append(
-                        r"(?P<{}>[\w ]+?)\s*".format(group_match.groups()[0]))
-
-                # Optional part
-                elif optional_match is not None:
-                    pattern.append(r"(?:{} *)?".format(optional_match.groups()[0]))
-
-            pattern.append("$")
+            slot_choices = temp_statement.get("slot_choices", {})
+            results = statement_pattern(statement, slot_choices)
+            if results is None:  # A slot has nothing to match, such as no areas.
+                continue
+            pattern, groups = results
             self.matchers.append({
-                "matcher": re.compile("".join(pattern), re.I),
-                "statement_slots": statement_slots,
+                "matcher": re.compile(f"^{pattern}$", re.I),
+                "statement": statement,
+                "slot_choices": slot_choices,
+                "groups": groups,
+                "statement_slots": temp_statement["statement_slots"],
                 }
             )
+        self._Parent.compiled_matcher = None
 
 
 class IntentRequest(object):
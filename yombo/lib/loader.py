@@ -54,7 +54,7 @@ from typing import Any, ClassVar, Dict, List, Optional, Type, Union
 
 # Import twisted libraries
 from twisted.internet import reactor, threads
-from twisted.internet.defer import inlineCallbacks, maybeDeferred, Deferred
+from twisted.internet.defer import inlineCallbacks, maybeDeferred, Deferred, DeferredList
 from twisted.web import client
 from functools import reduce
 
@@ -171,9 +171,13 @@ class Loader(YomboLibrary):
 
         self.loaded_components = FuzzySearch({self._ClassPath.lower(): self}, .95)
         self.loaded_libraries = FuzzySearch({self._Name.lower(): self}, .95)
-        self._invoke_list_cache = {}  # Store a list of hooks that exist or not. A cache.
+        self._hook_dispatch_table = {"library": {}, "module": {}}  # hook name -> list of callables implementing it.
         self.sigint = False  # will be set to true if SIGINT is received
         self.hook_counts = {"library": {}, "module": {}}  # keep track of hook names, and how many times it's called.
+        self.hook_options = {}  # hook name -> {"ordered": bool, "timeout": float}, see set_hook_options().
+        # Hooks that can veto the action with YomboHookStopProcessing must be called one at a time.
+        for hook_name in ("_states_preset_", "_atoms_preset_", "_device_before_add_", "_time_event_"):
+            self.set_hook_options(hook_name, ordered=True)
 
         reactor.addSystemEventTrigger("before", "shutdown", self.shutdown)
 
@@ -577,18 +581,43 @@ class Loader(YomboLibrary):
                      hook_name=hook_name,
                      failure=failure)
 
+    def set_hook_options(self, hook_name: str, ordered: Optional[bool] = None, timeout: Optional[float] = None):
+        """
+        Set options for a hook name. Used by libraries and modules that own a hook to declare how it should be
+        called when invoke_all is running in concurrent mode.
+
+        :param hook_name: Name of the hook.
+        :param ordered: If True, the hook is always called one component at a time, even in concurrent mode.
+        :param timeout: Number of seconds each implementation of the hook is allowed to take.
+        """
+        options = self.hook_options.setdefault(hook_name, {"ordered": False, "timeout": None})
+        if ordered is not None:
+            options["ordered"] = ordered
+        if timeout is not None:
+            options["timeout"] = timeout
+
+    def hook_is_ordered(self, hook_name: str) -> bool:
+        """ Returns True if the hook must be called in order, see set_hook_options(). """
+        return hook_name in self.hook_options and self.hook_options[hook_name]["ordered"] is True
+
     @inlineCallbacks
     def invoke_all(self, item_type: str, hook_name: str, called_by, stop_on_error: Optional[bool] = None,
-                   hook_items: Optional[list] = None, arguments: Optional = None, _force_debug: Optional[bool] = None):
+                   hook_items: Optional[list] = None, arguments: Optional = None, concurrent: Optional[bool] = None,
+                   timeout: Optional[float] = None, _force_debug: Optional[bool] = None):
         """
         Calls invoke_hook for all loaded item_type.
 
+        Only components that actually implement the hook are called, see get_hook_dispatch().
+
         :param item_type: Either library or module.
         :param hook_name: Name of the hook to call within the library or module.
         :param called_by: Reference of the caller.
         :param stop_on_error: If an exception is raise, should hooks in other item_type be called - default is False.
         :param hook_items: Call only these modules and/or libraries.
         :param arguments: Pass any arguments to the hook. Accepts anything, hook dependant.
+        :param concurrent: If True, all hooks are fired at once, unless the hook was set as ordered or
+            stop_on_error is True, since stopping requires calling the hooks in order.
+        :param timeout: Seconds each hook is allowed to run. Defaults to the timeout from set_hook_options().
         """
         results = {}
 
@@ -598,27 +627,25 @@ class Loader(YomboLibrary):
             raise YomboWarning(f"Unknown item type for invoke_all: {item_type}")
 
         if hook_items is not None:
-            hook_items = hook_items
+            hook_callables = self.build_hook_dispatch(hook_items, hook_name)
         else:
-            if item_type == "library":
-                hook_items = self.loaded_libraries
-            elif item_type == "module":
-                hook_items = self._Modules.modules
+            hook_callables = self.get_hook_dispatch(item_type, hook_name)
         if stop_on_error is None:
             stop_on_error = False
+        if timeout is None and hook_name in self.hook_options:
+            timeout = self.hook_options[hook_name]["timeout"]
 
-        # if _force_debug:
-        #     print(f"invoke_all- starting: hook_items: {hook_items}")
+        if concurrent is True and stop_on_error is False and self.hook_is_ordered(hook_name) is False:
+            results = yield self.invoke_all_concurrent(hook_callables, called_by, arguments, timeout)
+            return results
 
-        for item_name, item in hook_items.items():
-            if item._Entity_type == "module" and item._status != 1:  # Only enabled modules.
-                continue
+        for item, actual_hook_name, method in hook_callables:
             if _force_debug:
                 logger.info("invoke all: {item_type}::{item_name} -> {hook_name}",
                          item_type=item._Entity_type, item_name=item._FullName, hook_name=hook_name
                          )
             try:
-                response = yield self.do_invoke_hook(item, hook_name, called_by, arguments, _force_debug)
+                response = yield self.call_hook(item, actual_hook_name, method, called_by, arguments, timeout)
                 if response is None:
                     continue
                 results[item._FullName] = response
@@ -640,6 +667,129 @@ class Loader(YomboLibrary):
 
         return results
 
+    @inlineCallbacks
+    def invoke_all_concurrent(self, hook_callables: list, called_by, arguments: Optional = None,
+                              timeout: Optional[float] = None):
+        """
+        Fires all the hook callables at once and waits for all of them to finish. The results are collected
+        in the same order as the hook dispatch list, so the output is the same as calling them one at a time.
+
+        :param hook_callables: List of (item, actual_hook_name, method) tuples from get_hook_dispatch().
+        :param called_by: Reference of the caller.
+        :param arguments: Pass any arguments to the hook. Accepts anything, hook dependant.
+        :param timeout: Seconds each hook is allowed to run.
+        :return: Dictionary of results.
+        """
+        deferreds = []
+        for item, actual_hook_name, method in hook_callables:
+            deferreds.append(self.call_hook(item, actual_hook_name, method, called_by, arguments, timeout))
+
+        responses = yield DeferredList(deferreds, consumeErrors=True)
+        results = {}
+        for (item, actual_hook_name, method), (success, response) in zip(hook_callables, responses):
+            if success is False or response is None:
+                continue
+            results[item._FullName] = response
+        return results
+
+    def get_hook_dispatch(self, item_type: str, hook_name: str):
+        """
+        Returns a list of (item, actual_hook_name, method) tuples for every library or module that implements
+        the requested hook.
+
+        Once libraries (or modules) have completed their _load_ and _start_ phases, the list is cached per hook
+        name. The cache is dropped by reset_hook_dispatch() whenever components are imported or removed.
+
+        :param item_type: Either library or module.
+        :param hook_name: Name of the hook.
+        :return: List of tuples.
+        """
+        dispatch_table = self._hook_dispatch_table[item_type]
+        if hook_name in dispatch_table:
+            return dispatch_table[hook_name]
+
+        if item_type == "library":
+            hook_items = self.loaded_libraries
+            cache_phase = RUN_PHASE["libraries_started"]
+        else:
+            hook_items = self._Modules.modules
+            cache_phase = RUN_PHASE["modules_started"]
+
+        hook_callables = self.build_hook_dispatch(hook_items, hook_name)
+        if RUN_PHASE[self._run_phase] >= cache_phase:
+            dispatch_table[hook_name] = hook_callables
+        return hook_callables
+
+    def hook_implemented(self, hook_name: str, item_types: Optional[list] = None) -> bool:
+        """
+        Checks if any library or module implements a hook. Used to skip building hook arguments when nothing
+        would receive them.
+
+        :param hook_name: Name of the hook.
+        :param item_types: List of item types to check, default is both library and module.
+        :return: True if at least one component implements the hook.
+        """
+        if item_types is None:
+            item_types = ("library", "module")
+        for item_type in item_types:
+            if len(self.get_hook_dispatch(item_type, hook_name)) > 0:
+                return True
+        return False
+
+    def build_hook_dispatch(self, hook_items: dict, hook_name: str):
+        """
+        Walks the provided libraries or modules and collects the callables that implement the hook.
+
+        :param hook_items: Dictionary of libraries or modules.
+        :param hook_name: Name of the hook.
+        :return: List of (item, actual_hook_name, method) tuples.
+        """
+        hook_callables = []
+        for item_name, item in hook_items.items():
+            if item._Entity_type == "module" and item._status != 1:  # Only enabled modules.
+                continue
+            found = self.find_hook_callable(item, hook_name)
+            if found is not None:
+                hook_callables.append((item, *found))
+        return hook_callables
+
+    def reset_hook_dispatch(self, item_type: Optional[str] = None):
+        """
+        Drops the cached hook dispatch table. Called when libraries or modules are loaded or unloaded.
+
+        :param item_type: Either library or module. If not set, both are reset.
+        """
+        if item_type is None:
+            self._hook_dispatch_table = {"library": {}, "module": {}}
+        else:
+            self._hook_dispatch_table[item_type] = {}
+
+    @staticmethod
+    def find_hook_callable(item, hook_name: str):
+        """
+        Checks if a library or module implements the given hook.
+
+        :param item: The library or module to check.
+        :param hook_name: Name of the hook.
+        :return: Tuple of (actual_hook_name, method), or None if the item doesn't implement the hook.
+        """
+        if item._Name.lower() == "loader" and item._Entity_type == "library":
+            return None
+
+        if not (hook_name.startswith("_") and hook_name.endswith("_")):
+            actual_hook_name = item._Name.lower() + "_" + hook_name
+        else:
+            actual_hook_name = hook_name
+
+        method = getattr(item, actual_hook_name, None)
+        if method is None:
+            return None
+        if not isinstance(method, Callable):
+            logger.warn("Hook is not callable: {item_name}:{actual_hook_name}",
+                        item_name=item._FullName, actual_hook_name=actual_hook_name)
+            return None
+        return actual_hook_name, method
+
     @inlineCallbacks
     def invoke_hook(self, item_type: str, item_name: str, hook_name: str, called_by,
                     arguments: Optional = None):
@@ -661,6 +811,7 @@ class Loader(YomboLibrary):
         else:
             raise YomboWarning(f"Unknown item type for invoke_hook: {item_type}")
 
+        results = None
         try:
             results = yield self.do_invoke_hook(item, hook_name, called_by, arguments)
         except Exception as e:
@@ -671,85 +822,53 @@ class Loader(YomboLibrary):
     def do_invoke_hook(self, item, hook_name: str, called_by, arguments: Optional = None,
                        _force_debug: Optional[bool] = None):
         """
-        Does the actual call to the hook.
+        Looks up the hook within a single library or module and calls it.
 
         :param item: The library or module the hook resides in.
         :param hook_name: Name of the hook to call within the library or module.
         :param called_by: Reference of the caller.
         :param arguments: Pass any arguments to the hook. Accepts anything, hook dependant.
         """
-        cache_key = f"{item._Entity_type}.{item._Name.lower()}."
-        # logger.info("do_invoke_hook, cache_key: {cache_key}", cache_key=cache_key)
-        item_type = item._Entity_type
-        final_results = None
-        for hook in [hook_name]:
-            cache_key_local = f"{cache_key}.{hook}"
-        # for hook in [hook_name, "_yombo_universal_hook_"]:
-            if cache_key in self._invoke_list_cache:
-                if self._invoke_list_cache[cache_key_local] is False:
-                    if _force_debug:
-                        logger.info("Cache hook ({cache_key_local})...SKIPPED", cache_key_local=cache_key_local)
-                    continue  # skip. We already know function doesn"t exist.
-
-            if item._Name.lower() == "loader" and item._Entity_type == "library":
-                return
-
-            if not (hook.startswith("_") and hook.endswith("_")):
-                actual_hook_name = item._Name.lower() + "_" + hook
-            else:
-                actual_hook_name = hook
+        found = self.find_hook_callable(item, hook_name)
+        if found is None:
+            if _force_debug:
+                logger.warn("Library/module hook ({item_name}:{hook_name}) doesn't exist.",
+                            item_name=item._FullName, hook_name=hook_name)
+            return None
+        results = yield self.call_hook(item, found[0], found[1], called_by, arguments)
+        return results
 
-            attributes = {
-                "called_by": called_by,
-                "hook_name": actual_hook_name,
-            }
+    def call_hook(self, item, actual_hook_name: str, method, called_by, arguments: Optional = None,
+                  timeout: Optional[float] = None):
+        """
+        Does the actual call to the hook.
 
-            if hasattr(item, actual_hook_name):
-                method = getattr(item, actual_hook_name)
-                if isinstance(method, Callable):
-                    if item._Name not in self.hook_counts[item_type]:
-                        self.hook_counts[item_type][item._Name] = {}
-                    if hook not in self.hook_counts[item_type]:
-                        self.hook_counts[item_type][item._Name][actual_hook_name] = {"Total Count": {"count": 0}}
-                    if called_by._FullName not in self.hook_counts[item_type][item._Name][actual_hook_name]:
-                        self.hook_counts[item_type][item._Name][actual_hook_name][called_by._FullName] = {"count": 0}
-                    self.hook_counts[item_type][item._Name][actual_hook_name][called_by._FullName]["count"] = \
-                        self.hook_counts[item_type][item._Name][actual_hook_name][called_by._FullName]["count"] + 1
-                    self.hook_counts[item_type][item._Name][actual_hook_name]["Total Count"]["count"] = \
-                        self.hook_counts[item_type][item._Name][actual_hook_name]["Total Count"]["count"] + 1
-                    self._invoke_list_cache[cache_key_local] = True
-
-                    try:
-                        d = Deferred()
-                        if hook != "_yombo_universal_hook_":
-                            d.addCallback(lambda ignored: self._log_loader(
-                                "debug", item._Name, item_type, actual_hook_name, f"About to call {actual_hook_name}"))
-                        d.addCallback(lambda ignored: maybeDeferred(method,
-                                                                    attributes=attributes,
-                                                                    arguments=arguments)
-                                      )
-                        d.addErrback(self.invoke_failure, item, actual_hook_name)
-                        d.callback(1)
-                        if actual_hook_name == "_yombo_universal_hook_":
-                            yield d
-                        else:
-                            final_results = yield d
-                    except RuntimeWarning as e:
-                        logger.error("Error calling {item_type} '{item_name}' hook ({hook}): {e}",
-                                     item_type=item_type, item_name=item._Name, hook=hook, e=e)
-
-                else:
-                    if _force_debug:
-                        logger.warn("Cache library hook ({item_name}:{actual_hook_name}) is false: not callable",
-                                    item_name=item._FullName, actual_hook_name=actual_hook_name)
-                    self._invoke_list_cache[cache_key_local] = False
-                    raise YomboWarning(f"Hook is not callable: {actual_hook_name}")
-            else:
-                if _force_debug:
-                    logger.warn("Cache library hook ({item_name}:{actual_hook_name}) is false: non-existent",
-                                item_name=item._FullName, actual_hook_name=actual_hook_name)
-                self._invoke_list_cache[cache_key_local] = False
-        return final_results
+        :param item: The library or module the hook resides in.
+        :param actual_hook_name: Name of the method being called.
+        :param method: The bound method to call.
+        :param called_by: Reference of the caller.
+        :param arguments: Pass any arguments to the hook. Accepts anything, hook dependant.
+        :param timeout: If set, the hook is cancelled after this many seconds.
+        :return: A deferred.
+        """
+        item_type = item._Entity_type
+        caller_name = getattr(called_by, "_FullName", str(called_by))
+        item_counts = self.hook_counts[item_type].setdefault(item._Name, {})
+        hook_counts = item_counts.setdefault(actual_hook_name, {"Total Count": {"count": 0}})
+        hook_counts.setdefault(caller_name, {"count": 0})["count"] += 1
+        hook_counts["Total Count"]["count"] += 1
+
+        self._log_loader("debug", item._Name, item_type, actual_hook_name, f"About to call {actual_hook_name}")
+        d = maybeDeferred(method,
+                          attributes={
+                              "called_by": called_by,
+                              "hook_name": actual_hook_name,
+                          },
+                          arguments=arguments)
+        if timeout is not None:
+            d.addTimeout(timeout, reactor)
+        d.addErrback(self.invoke_failure, item, actual_hook_name)
+        return d
 
     def import_component(self, path_name, component_name, component_type):
         """
@@ -796,6 +915,7 @@ class Loader(YomboLibrary):
         try:
             # Instantiate the class
             # logger.debug("Instantiate class: {pyclassname}", pyclassname=pyclassname)
+            self.reset_hook_dispatch(component_type)
             if component_type == "library":
                 module_instance = klass(self)  # Start the library class
                 if component_name.lower() == "modules":
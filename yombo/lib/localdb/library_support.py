@@ -20,6 +20,7 @@ from twisted.internet.defer import inlineCallbacks
 # Import Yombo libraries
 from yombo.core.exceptions import YomboWarning
 from yombo.core.log import get_logger
+from yombo.lib.statistics.rollups import choose_rollup_tier
 from yombo.utils.datatypes import coerce_value
 
 logger = get_logger("library.localdb.sqlbase_libraries")
@@ -268,7 +269,7 @@ class LibrarySupport:
             AND bucket_time <= %s
             ORDER BY bucket_time""" % (names_str, start, stop)
         # print("statistic_get_range: %s" % sql)
-        records = yield self.db_pool.runQuery(sql)
+        records = yield self.database.run_read_query(sql)
         results = []
         for record in records:
             if minimal in (None, False):
@@ -431,39 +432,158 @@ class LibrarySupport:
             stats[averagedata_name] = self._Tools.data_unpickle(stats[averagedata_name])
 
     @inlineCallbacks
-    def get_stats_sums(self, bucket_name, bucket_type=None, bucket_size=None, time_start=None, time_end=None):
+    def get_stats_sums(self, bucket_name, bucket_type=None, bucket_size=None, time_start=None, time_end=None,
+                       points=None):
+        """
+        Get the statistic values for a name, merged into buckets of bucket_size. Data is read from the coarsest
+        rollup tier that fits the bucket size. Anything newer than the tier's watermark is read from the raw
+        statistics table.
+
+        Counters are summed, datapoints and averages are averaged.
+
+        :param bucket_name: Name of the statistic.
+        :param bucket_type: Optional, one of: counter, datapoint, average.
+        :param bucket_size: Size of the buckets to return, in seconds. Default is 3600.
+        :param time_start: Start time.
+        :param time_end: End time.
+        :param points: If set, bucket_size is increased so the range fits within this many points.
+        :return: A list of dictionaries with: bucket, bucket_name, bucket_type, value
+        """
         if bucket_size is None:
             bucket_size = 3600
+        if time_start is None:
+            time_start = 0
+        if time_end is None:
+            time_end = time()
 
-        wheres = []
-        values = []
-
-        wheres.append("(bucket_name = ?)")
-        values.append(bucket_name)
+        bucket_size, tier = choose_rollup_tier(bucket_size, time_start, time_end, points)
+        watermark = time_start
+        placeholder = self.database.variable_placeholder
 
+        wheres = [f"bucket_name = {placeholder}"]
+        values = [bucket_name]
         if bucket_type is not None:
-            wheres.append("(bucket_type > ?)")
-            values.append(time_start)
-
-        if time_start is not None:
-            wheres.append("(bucket > ?)")
-            values.append(time_start)
-
-        if time_end is not None:
-            wheres.append("(bucket < ?)")
-            values.append(time_end)
-        where_final = [(" AND ").join(wheres)] + values
-
-        # records = yield self.dbconfig.select("statistics",
-        #             select="sum(value), bucket_name, bucket_type, round(bucket / 3600) * 3600 AS bucket",
-        select_fields = f"sum(bucket_value) as value, bucket_name, bucket_type, round(bucket_time / {bucket_size}) * " \
-                        f"{bucket_size} AS bucket"
-
-        records = yield self.dbconfig.select("statistics",
-                                             select=select_fields,
-                                             where=where_final,
-                                             group="bucket")
-        return records
+            wheres.append(f"bucket_type = {placeholder}")
+            values.append(bucket_type)
+
+        rows = []
+        if tier is not None:
+            watermarks = yield self.get_statistic_rollup_watermarks()
+            watermark = min(max(watermarks.get(tier, 0), time_start), time_end)
+            if watermark > time_start:
+                sql = f"SELECT bucket_type, CAST(bucket_time / {bucket_size} AS INTEGER) * {bucket_size} AS bucket, " \
+                      f"SUM(value_count), SUM(value_sum) FROM statistics_rollups " \
+                      f"WHERE {' AND '.join(wheres)} AND tier = {placeholder} " \
+                      f"AND bucket_time >= {placeholder} AND bucket_time < {placeholder} " \
+                      f"GROUP BY bucket_type, bucket"
+                records = yield self.database.run_read_query(sql, values + [tier, time_start, watermark])
+                rows.extend(records)
+
+        sql = f"SELECT bucket_type, CAST(bucket_time / {bucket_size} AS INTEGER) * {bucket_size} AS bucket, " \
+              f"COUNT(*), SUM(bucket_value) FROM statistics " \
+              f"WHERE {' AND '.join(wheres)} AND bucket_time >= {placeholder} AND bucket_time < {placeholder} " \
+              f"GROUP BY bucket_type, bucket"
+        records = yield self.database.run_read_query(sql, values + [watermark, time_end])
+        rows.extend(records)
+
+        # A bucket may straddle the watermark, combine the rollup and raw parts.
+        buckets = {}
+        for row_type, bucket, count, total in rows:
+            key = (row_type, bucket)
+            if key in buckets:
+                buckets[key][0] += count
+                buckets[key][1] += total
+            else:
+                buckets[key] = [count, total]
+
+        results = []
+        for (row_type, bucket), (count, total) in sorted(buckets.items(), key=lambda item: item[0][1]):
+            results.append({
+                "bucket": bucket,
+                "bucket_name": bucket_name,
+                "bucket_type": row_type,
+                "value": total if row_type == "counter" else total / count,
+            })
+        return results
+
+    @inlineCallbacks
+    def get_statistic_rollup_watermarks(self):
+        """
+        Get how far each rollup tier has been computed.
+
+        :return: Dictionary of tier: watermark.
+        """
+        records = yield self.db_pool.runQuery("SELECT tier, watermark FROM statistics_rollup_watermarks")
+        return {record[0]: record[1] for record in records}
+
+    @inlineCallbacks
+    def get_statistic_rollup_start(self, source_tier):
+        """
+        Get the oldest bucket time a tier can be computed from, used to seed a tier that doesn't have a
+        watermark yet.
+
+        :param source_tier: The tier to read from, None for the raw statistics table.
+        :return: Unix epoch time, or None if there's no data.
+        """
+        if source_tier is None:
+            records = yield self.db_pool.runQuery("SELECT MIN(bucket_time) FROM statistics")
+        else:
+            records = yield self.db_pool.runQuery(
+                f"SELECT MIN(bucket_time) FROM statistics_rollups WHERE tier = {self.database.variable_placeholder}",
+                (source_tier, ))
+        if len(records) == 0:
+            return None
+        return records[0][0]
+
+    def rollup_statistics_tier(self, tier, source_tier, start, end):
+        """
+        Compute the rollup rows for a tier between start and end, and move the tier watermark to end. Both times
+        must be aligned to the tier size. This is done within a single transaction.
+
+        :param tier: Tier size in seconds.
+        :param source_tier: The tier to read from, None to read from the raw statistics table.
+        :param start: Start time, inclusive.
+        :param end: End time, exclusive.
+        :return: A deferred.
+        """
+        placeholder = self.database.variable_placeholder
+        if source_tier is None:
+            select = f"SELECT {tier}, CAST(bucket_time / {tier} AS INTEGER) * {tier} AS rollup_time, " \
+                     f"bucket_type, bucket_name, COUNT(*), SUM(bucket_value), MIN(bucket_value), " \
+                     f"MAX(bucket_value) FROM statistics " \
+                     f"WHERE bucket_time >= {placeholder} AND bucket_time < {placeholder}"
+            args = [start, end]
+        else:
+            select = f"SELECT {tier}, CAST(bucket_time / {tier} AS INTEGER) * {tier} AS rollup_time, " \
+                     f"bucket_type, bucket_name, SUM(value_count), SUM(value_sum), MIN(value_min), " \
+                     f"MAX(value_max) FROM statistics_rollups " \
+                     f"WHERE tier = {placeholder} AND bucket_time >= {placeholder} AND bucket_time < {placeholder}"
+            args = [source_tier, start, end]
+
+        query = "REPLACE INTO statistics_rollups " \
+                "(tier, bucket_time, bucket_type, bucket_name, value_count, value_sum, value_min, value_max) " \
+                f"{select} GROUP BY rollup_time, bucket_type, bucket_name"
+        watermark_query = f"REPLACE INTO statistics_rollup_watermarks (tier, watermark) " \
+                          f"VALUES ({placeholder}, {placeholder})"
+
+        def do_rollup(txn):
+            txn.execute(query, args)
+            txn.execute(watermark_query, (tier, end))
+
+        return self.database.run_interaction(do_rollup)
+
+    def delete_expired_statistic_rollups(self, tier, older_than):
+        """
+        Delete rollup rows for a tier that are older than the provided time.
+
+        :param tier: Tier size in seconds.
+        :param older_than: Unix epoch time.
+        :return: A deferred.
+        """
+        return self.database.db_delete("statistics_rollups",
+                                       where=[f"tier = {self.database.variable_placeholder} AND "
+                                              f"bucket_time < {self.database.variable_placeholder}",
+                                              tier, int(older_than)])
 
 ############### Modules
     @inlineCallbacks
@@ -0,0 +1,37 @@
+"""
+Adds the statistics rollup tiers.
+
+.. moduleauthor:: Mitch Schwenk <mitch-gw@yombo.net>
+.. versionadded:: 0.24.0
+
+:copyright: Copyright 2020 by Yombo.
+:license: LICENSE for details.
+:view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/lib/localdb/migrations/sql/sql_20201016_statistics_rollups.html>`_
+"""
+from yombo.lib.localdb.migrations.sql import sql_create_index
+
+migration_lines = [
+      # Downsampled statistics, one row per tier, bucket window, and statistic.
+      """CREATE TABLE `statistics_rollups` (
+        `tier`           MEDIUMINT UNSIGNED NOT NULL,
+        `bucket_time`    INTEGER UNSIGNED NOT NULL,
+        `bucket_type`    VARCHAR(128) COLLATE utf8mb4_unicode_ci NOT NULL,
+        `bucket_name`    VARCHAR(128) COLLATE utf8mb4_unicode_ci NOT NULL,
+        `value_count`    INTEGER UNSIGNED NOT NULL,
+        `value_sum`      DECIMAL(20,4) NOT NULL,
+        `value_min`      DECIMAL(13,4) NOT NULL,
+        `value_max`      DECIMAL(13,4) NOT NULL);""",
+      """CREATE UNIQUE INDEX IF NOT EXISTS statistics_rollups_n_t_t_t_IDX
+       ON statistics_rollups (bucket_name, bucket_type, tier, bucket_time)""",
+      """CREATE INDEX IF NOT EXISTS statistics_rollups_t_t_IDX
+       ON statistics_rollups (tier, bucket_time)""",
+
+      # How far each tier has been computed.
+      """CREATE TABLE `statistics_rollup_watermarks` (
+        `tier`           MEDIUMINT UNSIGNED NOT NULL,
+        `watermark`      INTEGER UNSIGNED NOT NULL,
+        PRIMARY KEY(tier));""",
+
+      # Used to find raw statistics by time when computing the first tier.
+      sql_create_index("statistics", "bucket_time"),
+]
@@ -0,0 +1,23 @@
+"""
+Add the statistics rollup tables.
+
+Date created: 20201016
+
+.. moduleauthor:: Mitch Schwenk <mitch-gw@yombo.net>
+.. versionadded:: 0.24.0
+
+:copyright: Copyright 2020 by Yombo.
+:license: LICENSE for details.
+:view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/lib/localdb/migrations/sql/sqlite/20201016_statistics_rollups.html>`_
+"""
+from yoyo import step
+
+from yombo.lib.localdb.migrations.sql.sql_20201016_statistics_rollups import migration_lines
+from yombo.lib.localdb.migrations.sql import sqlite_convert_step_line
+
+__depends__ = {"20200325_initialize"}
+
+migration_lines = sqlite_convert_step_line(migration_lines)
+
+for migration_line in migration_lines:
+    step(migration_line)
@@ -556,10 +556,12 @@ class Modules(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
         # logger.debug("adding module: {module_id}:{module_label}", module_id=module_id, module_label=module_label)
         self.modules[module_id] = module_instance
         self.loaded_modules[module_instance] = module_instance._machine_label
+        self._Loader.reset_hook_dispatch("module")
 
     def del_imported_module(self, module_id, module_label):
         logger.debug("deleting module_id: {module_id} from this list: {list}", module_id=module_id, list=self.modules)
         del self.modules[module_id]
+        self._Loader.reset_hook_dispatch("module")
 
     def modules_invoke_log(self, level, label, type, method, msg=""):
         """
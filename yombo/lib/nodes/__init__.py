@@ -60,6 +60,7 @@ class Nodes(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
     _storage_search_fields: ClassVar[List[str]] = [
         "node_id", "node_type", "machine_label", "label"
     ]
+    _storage_index_fields: ClassVar[List[str]] = ["machine_label", "label", "node_type"]
     _storage_attribute_sort_key: ClassVar[str] = "machine_label"
 
     @inlineCallbacks
@@ -93,6 +94,8 @@ class Nodes(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
         files = yield self._Modules.search_modules_for_files("nodes/*.py")
         classes = yield self._Files.extract_classes_from_files(files)
         self.platforms.update(dict((k.lower(), v) for k, v in classes.items()))
+        self.node_children: Dict[Optional[str], List[str]] = {}  # parent_id -> child node_ids, ordered by weight.
+        self.node_parents: Dict[str, Optional[str]] = {}  # node_id -> parent_id, as indexed.
         yield self.load_from_database()
 
     def _storage_class_reference_getter(self, incoming: dict) -> Type[Node]:
@@ -142,6 +145,80 @@ class Nodes(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
             data["data"] = self._Tools.data_unpickle(data["data"], data["data_content_type"])
             return data
 
+    def load_an_item_to_memory_post_process(self, node: Node) -> None:
+        """
+        Add newly loaded nodes to the tree index.
+
+        :param node:
+        :return:
+        """
+        self.index_node(node)
+
+    def node_sort_key(self, node_id: str):
+        """
+        Sort key for children of a node: weight, then machine_label.
+
+        :param node_id:
+        :return:
+        """
+        node = self.nodes[node_id]
+        return node.weight if node.weight is not None else 0, node.machine_label or ""
+
+    def index_node(self, node: Node) -> None:
+        """
+        Adds a node to the tree index, or moves it if it's parent or weight has changed.
+
+        :param node: The node to index.
+        :return:
+        """
+        node_id = node.node_id
+        parent_id = node.node_parent_id
+        if node_id in self.node_parents:
+            old_parent_id = self.node_parents[node_id]
+            if old_parent_id != parent_id:
+                self.unindex_node(node_id)
+
+        self.node_parents[node_id] = parent_id
+        if parent_id not in self.node_children:
+            self.node_children[parent_id] = []
+        siblings = self.node_children[parent_id]
+        if node_id not in siblings:
+            siblings.append(node_id)
+        siblings.sort(key=self.node_sort_key)
+
+    def unindex_node(self, node_id: str) -> None:
+        """
+        Removes a node from the tree index. Any children are kept under the node_id so they can be found again
+        if the node is reloaded.
+
+        :param node_id: The node ID to remove.
+        :return:
+        """
+        if node_id not in self.node_parents:
+            return
+        parent_id = self.node_parents.pop(node_id)
+        siblings = self.node_children.get(parent_id)
+        if siblings is None:
+            return
+        try:
+            siblings.remove(node_id)
+        except ValueError:
+            pass
+        if len(siblings) == 0:
+            del self.node_children[parent_id]
+
+    def indexed_node(self, node: Node) -> Node:
+        """
+        Makes sure the node's place in the tree index is current. Attributes can be set directly on the node,
+        so a changed node_parent_id is picked up here when the node is next looked at.
+
+        :param node:
+        :return: The same node.
+        """
+        if node.node_id not in self.node_parents or self.node_parents[node.node_id] != node.node_parent_id:
+            self.index_node(node)
+        return node
+
     def get_parent(self, node_requested: str, limiter: Optional[float] = None) -> Node:
         """
         Looks up the requested node and attempts to locate it's parent.
@@ -155,16 +232,17 @@ class Nodes(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
         :param limiter: Default: .90 - A value between .5 and .99. Sets how close of a match it the search should be.
         :return: Pointer to requested node.
         """
-        found_node = self.get(node_requested, limiter=limiter)
+        found_node = self.indexed_node(self.get(node_requested, limiter=limiter))
 
-        if node.node_parent_id in self.nodes:
-            return self.nodes[found_node.node_parent_id]
+        parent_id = self.node_parents[found_node.node_id]
+        if parent_id in self.nodes:
+            return self.nodes[parent_id]
         else:
             raise YomboWarning("Parent ID not found.")
 
     def get_siblings(self, node_requested: str, limiter: Optional[float] = None) -> Dict[str, Node]:
         """
-        Returns a deferred! A sibling is defined as nodes having the same parent id.
+        A sibling is defined as nodes having the same parent id. The requested node is included.
 
         :raises YomboWarning: For invalid requests.
         :raises KeyError: When item requested cannot be found.
@@ -172,23 +250,19 @@ class Nodes(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
         :type node_requested: string
         :param limiter: Default: .89 - A value between .5 and .99. Sets how close of a match it the search should be.
         :type limiter: float
-        :return: Pointer to requested node.
+        :return: Siblings, ordered by weight.
         :rtype: dict
         """
-        found_node = self.get(node_requested, limiter=limiter)
+        found_node = self.indexed_node(self.get(node_requested, limiter=limiter))
 
         if found_node.node_parent_id is not None:
-            siblings = {}
-            for node_id, node_obj in self.nodes.items():
-                if node_obj.node_parent_id == found_node.node_parent_id:
-                    siblings[node_id] = node_obj
-            return siblings
+            return self.get_children_by_id(found_node.node_parent_id)
         else:
             raise YomboWarning("Node has no parent_id.")
 
     def get_children(self, node_requested: str, limiter: Optional[float] = None) -> Dict[str, Node]:
         """
-        Returns a deferred! A sibling is defined as nodes having the same parent id.
+        Returns the direct children of a node.
 
         :raises YomboWarning: For invalid requests.
         :raises KeyError: When item requested cannot be found.
@@ -196,17 +270,80 @@ class Nodes(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
         :type node_requested: string
         :param limiter: Default: .90 - A value between .5 and .99. Sets how close of a match it the search should be.
         :type limiter: float
-        :return: Pointer to requested node.
+        :return: Children, ordered by weight.
         :rtype: dict
         """
         found_node = self.get(node_requested, limiter=limiter)
+        return self.get_children_by_id(found_node.node_id)
+
+    def get_children_by_id(self, parent_id: str) -> Dict[str, Node]:
+        """
+        Returns the direct children of a node ID, ordered by weight. Children that were moved to another
+        parent since being indexed are re-indexed and skipped.
 
+        :param parent_id: The parent node ID.
+        :return:
+        """
         children = {}
-        for node_id, node_obj in self.nodes.items():
-            if node_obj.node_parent_id == found_node.node_id:
-                children[node_id] = node_obj
+        for node_id in tuple(self.node_children.get(parent_id, ())):
+            node = self.nodes.get(node_id)
+            if node is None:
+                self.unindex_node(node_id)
+                continue
+            if node.node_parent_id != parent_id:
+                self.index_node(node)
+                continue
+            children[node_id] = node
         return children
 
+    def get_subtree(self, node_requested: str, max_depth: Optional[int] = None,
+                    limiter: Optional[float] = None) -> List[tuple]:
+        """
+        Walks the tree below a node, depth first, in weight order. The requested node isn't included.
+
+        :raises KeyError: When item requested cannot be found.
+        :param node_requested: The node ID or node label to search for.
+        :param max_depth: How many levels to descend, None for all. 1 is the same as get_children().
+        :param limiter: Default: .90 - A value between .5 and .99. Sets how close of a match it the search should be.
+        :return: A list of (depth, node) tuples, direct children having a depth of 1.
+        """
+        found_node = self.get(node_requested, limiter=limiter)
+
+        results = []
+        seen = {found_node.node_id}
+        pending = [(1, node) for node in reversed(list(self.get_children_by_id(found_node.node_id).values()))]
+        while pending:
+            depth, node = pending.pop()
+            if node.node_id in seen:  # Protect against loops from bad data.
+                continue
+            seen.add(node.node_id)
+            results.append((depth, node))
+            if max_depth is None or depth < max_depth:
+                children = self.get_children_by_id(node.node_id)
+                pending.extend((depth + 1, child) for child in reversed(list(children.values())))
+        return results
+
+    def get_ancestors(self, node_requested: str, limiter: Optional[float] = None) -> List[Node]:
+        """
+        Returns the parent, grandparent, etc of a node. Stops at the first parent that isn't loaded.
+
+        :raises KeyError: When item requested cannot be found.
+        :param node_requested: The node ID or node label to search for.
+        :param limiter: Default: .90 - A value between .5 and .99. Sets how close of a match it the search should be.
+        :return: List of nodes, nearest parent first.
+        """
+        node = self.indexed_node(self.get(node_requested, limiter=limiter))
+
+        ancestors = []
+        seen = {node.node_id}
+        parent_id = self.node_parents[node.node_id]
+        while parent_id in self.nodes and parent_id not in seen:
+            node = self.indexed_node(self.nodes[parent_id])
+            ancestors.append(node)
+            seen.add(parent_id)
+            parent_id = self.node_parents[parent_id]
+        return ancestors
+
     @inlineCallbacks
     def new(self, node_type: str, machine_label: str,
             label: str, data: Any, gateway_id: Optional[str] = None,
@@ -355,22 +492,23 @@ class Nodes(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
         if new_status not in STATUS:
             raise YomboWarning("new_status must be an int: 0, 1, or 2.")
 
+        node = self.nodes.get(node_id)
         global_invoke_all(f"_node_before_{STATUS[new_status]}_",
                           called_by=self,
                           arguments={
                               "node_id": node_id,
-                              "node": self.nodes[node_id],
+                              "node": node,
                               }
                           )
         response = yield self.patch_node(node_id=node_id, api_data={"status": new_status},
                                          authorization=authorization)
 
-        if node_id in self.nodes:
-            node = self.nodes[node_id]
+        if node is not None:
             node._status = new_status
             if new_status == 2:
                 yield node.delete_from_db()
                 del self.nodes[node_id]
+                self.unindex_node(node_id)
             else:
                 yield node.save_to_db()
 
@@ -378,7 +516,7 @@ class Nodes(YomboLibrary, LibraryDBParentMixin, LibrarySearchMixin):
                           called_by=self,
                           arguments={
                               "node_id": node_id,
-                              "node": self.nodes[node_id],
+                              "node": node,
                               }
                           )
         return response
@@ -51,3 +51,13 @@ class Node(Entity, LibraryDBChildMixin):
     _Entity_type: ClassVar[str] = "Node"
     _Entity_label_attribute: ClassVar[str] = "node_id"
 
+
+    def update_attributes_post_process(self, incoming: Dict[str, Any]):
+        """
+        Moves the node within the parent's tree index if it was given a new parent or weight.
+
+        :param incoming:
+        :return:
+        """
+        if "node_parent_id" in incoming or "weight" in incoming:
+            self._Parent.index_node(self)
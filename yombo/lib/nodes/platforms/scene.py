@@ -21,7 +21,7 @@ import traceback
 from typing import Optional
 
 # Import twisted libraries
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import DeferredList, DeferredSemaphore, inlineCallbacks
 from twisted.internet import reactor
 
 # Import Yombo libraries
@@ -265,20 +265,33 @@ class Scene(Node):
 
         logger.info("Scene is starting: {label}", label=self.label)
 
-        for action_id, action in actions.items():
+        # Device commands are sent concurrently, up to max_parallel_actions at a time. Any other action
+        # waits for the pending device commands to complete first, keeping pauses and other steps in order.
+        semaphore = DeferredSemaphore(self._Scenes.max_parallel_actions)
+        pending_commands = []
+        for action in sorted(actions.values(), key=lambda i: i["weight"]):
             action_type = action["action_type"]
 
             if action_type == "device":
                 device = self._Devices[action["device_machine_label"]]
                 logger.info("Scene is firing {label}, device: {device}", label=self.label, device=device.label)
                 command = self._Commands[action["command_machine_label"]]
-                device.command(command=command,
-                               auth_id=self._Users.system_user,
-                               control_method="scene",
-                               inputs=action["inputs"],
-                               **kwargs)
-
-            elif action_type == "pause":
+                pending_commands.append(semaphore.run(device.command,
+                                                      command=command,
+                                                      auth_id=self._Users.system_user,
+                                                      control_method="scene",
+                                                      inputs=action["inputs"],
+                                                      **kwargs))
+                continue
+
+            if len(pending_commands):
+                yield self.wait_for_commands(pending_commands)
+                pending_commands = []
+                if self.run_state != "running":  # a way to kill this trigger
+                    self.run_state = "stopped"
+                    return False
+
+            if action_type == "pause":
                 final_duration = 0
                 loops = 0
                 sleep_duration = action["duration"]
@@ -314,7 +327,7 @@ class Scene(Node):
 
             elif action_type == "template":
                 try:
-                    yield self.scene_templates[action_id].render(
+                    yield self.scene_templates[action["action_id"]].render(
                         {"current_scene": self}
                     )
                 except Exception as e:
@@ -334,8 +347,24 @@ class Scene(Node):
                 self.run_state = "stopped"
                 return False
 
+        if len(pending_commands):
+            yield self.wait_for_commands(pending_commands)
         self.run_state = "stopped"
 
+    @inlineCallbacks
+    def wait_for_commands(self, pending_commands):
+        """
+        Waits for device commands sent by do_start() to complete, logging any that failed.
+
+        :param pending_commands: A list of deferreds.
+        :return:
+        """
+        results = yield DeferredList(pending_commands, consumeErrors=True)
+        for success, result in results:
+            if success is False:
+                logger.warn("Scene '{label}' had trouble sending a device command: {failure}",
+                            label=self.label, failure=result.getErrorMessage())
+
     def stop(self, scene_id, **kwargs):
         """
         Stop a currently running scene.
@@ -639,7 +668,7 @@ class Scene(Node):
         self.data["configs"]["allow_intents"] = True
         self.on_change()
         self._Scenes.trigger_monitor("scene",
-                                    scen=self,
+                                    scene=self,
                                     name=self.machine_label,
                                     action="enable_intent")
 
@@ -669,6 +698,8 @@ class Scene(Node):
         :return:
         """
         triggers = self.data["triggers"]
+        if isinstance(triggers, dict):
+            triggers = triggers.values()
 
         if trigger_type == "device":
             device = kwargs["device"]
@@ -686,11 +717,12 @@ class Scene(Node):
                 if trigger["scene_machine_label"] == scene.machine_label:
                     self.start()
                     return
-        elif trigger_type in self._Scenes.additional_triggers:
+        elif trigger_type in self._Scenes.additional_scene_triggers:
+            match_scene_trigger = self._Scenes.additional_scene_triggers[trigger_type]["match_scene_trigger"]
             for trigger in triggers:
                 if trigger["trigger_type"] != trigger_type:
                     continue
-                if self._Scenes.additional_triggers(self, trigger) is True:
+                if match_scene_trigger(self, trigger) is True:
                     self.start()
                     return
         else:
@@ -89,6 +89,15 @@ class Scenes(YomboLibrary, ParentStorageAccessorsMixin, LibrarySearchMixin):
         except KeyError:
             self.scenes = {}
 
+        # Maps a trigger to the scenes that reference it: trigger_type -> machine_label -> set(scene_ids)
+        # Addon trigger types don't reference a specific item and are stored under the key None.
+        self.trigger_index = {
+            "device": {},
+            "scene": {},
+        }
+        self.trigger_index_keys = {}  # scene_id -> [(trigger_type, key)], used to remove a scene from the index.
+        self.max_parallel_actions = self._Configs.get("scenes.max_parallel_actions", 10)
+
         # self.scenes_running = {}  # tracks if scene is running, stopping, or stopped
         # self.scene_templates = {}  # hold any templates for scenes here for caching.
         # self.scene_types_extra = {}  # any addition action types, fill by _scene_action_list_ hook.
@@ -195,6 +204,7 @@ class Scenes(YomboLibrary, ParentStorageAccessorsMixin, LibrarySearchMixin):
                 scene.scene_init(**kwargs)
             except Exception as e:
                 logger.warn("Error validating scene '{label}'", label=scene.label)
+            self.index_scene_triggers(scene)
 
     def _started_(self, **kwargs):
         """
@@ -503,8 +513,8 @@ class Scenes(YomboLibrary, ParentStorageAccessorsMixin, LibrarySearchMixin):
         yield global_invoke_all("_scene_added_",
                                 called_by=self,
                                 arguments={
-                                    "scene_id": scene_id,
-                                    "scene": scene,
+                                    "scene_id": new_scene.node_id,
+                                    "scene": new_scene,
                                     }
                                 )
         return new_scene
@@ -731,5 +741,82 @@ class Scenes(YomboLibrary, ParentStorageAccessorsMixin, LibrarySearchMixin):
         if "called_by" not in kwargs:
             kwargs["called_by"] = "trigger_monitor"
 
-        for scene_id, scene in self.scenes.items():
-            scene.check_for_triggers(trigger_type, **kwargs)
+        if trigger_type == "device":
+            key = kwargs["device"].machine_label
+        elif trigger_type == "scene":
+            key = kwargs["scene"].machine_label
+        else:
+            key = None
+
+        if trigger_type not in self.trigger_index or key not in self.trigger_index[trigger_type]:
+            return
+
+        for scene_id in list(self.trigger_index[trigger_type][key]):
+            try:
+                self.scenes[scene_id].check_for_triggers(trigger_type, **kwargs)
+            except YomboWarning as e:
+                logger.debug("Scene '{scene_id}' not started from trigger: {e}", scene_id=scene_id, e=e)
+
+    def index_scene_triggers(self, scene):
+        """
+        Adds the scene's triggers to the trigger index, replacing any existing entries for the scene. Called
+        when scenes are loaded, added, or edited.
+
+        :param scene:
+        :return:
+        """
+        scene_id = scene.scene_id
+        self.remove_scene_triggers(scene_id)
+        triggers = scene.data.get("triggers", {})
+        if isinstance(triggers, dict):
+            triggers = triggers.values()
+
+        index_keys = []
+        for trigger in triggers:
+            trigger_type = trigger.get("trigger_type")
+            if trigger_type == "device":
+                key = trigger.get("device_machine_label")
+            elif trigger_type == "scene":
+                key = trigger.get("scene_machine_label")
+            elif trigger_type is not None:
+                key = None
+            else:
+                continue
+            if trigger_type not in self.trigger_index:
+                self.trigger_index[trigger_type] = {}
+            if key not in self.trigger_index[trigger_type]:
+                self.trigger_index[trigger_type][key] = set()
+            self.trigger_index[trigger_type][key].add(scene_id)
+            index_keys.append((trigger_type, key))
+        if len(index_keys):
+            self.trigger_index_keys[scene_id] = index_keys
+
+    def remove_scene_triggers(self, scene_id):
+        """
+        Removes a scene from the trigger index.
+
+        :param scene_id:
+        :return:
+        """
+        if scene_id not in self.trigger_index_keys:
+            return
+        for trigger_type, key in self.trigger_index_keys.pop(scene_id):
+            scene_ids = self.trigger_index[trigger_type].get(key)
+            if scene_ids is None:
+                continue
+            scene_ids.discard(scene_id)
+            if len(scene_ids) == 0:
+                del self.trigger_index[trigger_type][key]
+
+    def _scene_added_(self, arguments, **kwargs):
+        self.index_scene_triggers(arguments["scene"])
+
+    def _scene_edited_(self, arguments, **kwargs):
+        self.index_scene_triggers(arguments["scene"])
+
+    def _scene_deleted_(self, arguments, **kwargs):
+        self.remove_scene_triggers(arguments["scene"].scene_id)
+
+    def _node_updated_(self, arguments, **kwargs):
+        if arguments["node_id"] in self.scenes:
+            self.index_scene_triggers(self.scenes[arguments["node_id"]])
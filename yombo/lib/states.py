@@ -67,6 +67,7 @@ from twisted.internet.defer import inlineCallbacks
 from twisted.internet.task import LoopingCall
 
 # Import Yombo libraries
+from yombo.classes.topictrie import TopicDict
 from yombo.constants import SENTINEL
 from yombo.core.entity import Entity
 from yombo.core.log import get_logger
@@ -104,7 +105,7 @@ class States(YomboLibrary, SystemDataParentMixin, LibraryDBParentMixin, LibraryS
     """
     Provides a base API to store common states among libraries and modules.
     """
-    states: dict = {"global": {}, "cluster": {}}
+    states: dict = {"global": TopicDict(), "cluster": TopicDict()}
 
     # The remaining attributes are used by various mixins.
     _storage_primary_field_name: ClassVar[str] = "state_id"
@@ -120,7 +121,7 @@ class States(YomboLibrary, SystemDataParentMixin, LibraryDBParentMixin, LibraryS
     @inlineCallbacks
     def _init_(self, **kwargs):
         self.logger = logger
-        self.states[self._gateway_id] = {}
+        self.states[self._gateway_id] = TopicDict()
         # print("states load from database...start")
         yield self.load_from_database()
         # print("states load from database...done")
@@ -135,6 +136,11 @@ class States(YomboLibrary, SystemDataParentMixin, LibraryDBParentMixin, LibraryS
         self.memory_usage_checker_loop = LoopingCall(self.memory_usage_checker)
         self.memory_usage_checker_loop.start(random_int(1800, .10))
 
+    @inlineCallbacks
+    def _stop_(self, **kwargs):
+        """ Save any coalesced state values before the events and database libraries unload. """
+        yield self.coalesce_flush_all()
+
     def get(self, item_requested: str, default: Optional[Any] = SENTINEL, gateway_id: Optional[str] = None,
             instance: Optional[bool] = None, **kwargs):
         """
@@ -88,9 +88,7 @@ the benefits of better averages, but mitigate loss of data. This is at a cost of
 :view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/_modules/yombo/lib/statistics/__init__.html>`_
 """
 # Import python libraries
-from difflib import SequenceMatcher
 import json
-import re
 from time import time
 from typing import Any, ClassVar, Dict, List, Optional, Union
 
@@ -103,13 +101,14 @@ from twisted.internet import reactor
 from yombo.core.exceptions import YomboWarning
 from yombo.core.library import YomboLibrary
 from yombo.core.log import get_logger
-from yombo.utils import percentile, pattern_search, random_int
+from yombo.utils import random_int
 from yombo.utils.dictionaries import recursive_dict_merge
 
-from yombo.utils.decorators import cached
 from yombo.utils.hookinvoke import global_invoke_all
 
 from yombo.lib.statistics.buckets_manager import BucketsManager
+from yombo.lib.statistics.columns import SampleColumns, StatRegistry, summarize_samples
+from yombo.lib.statistics.rollups import ROLLUP_MAX_WINDOWS, ROLLUP_TIERS, rollup_source_tier, rollup_tier_sizes
 logger = get_logger("library.statistics")
 
 
@@ -126,6 +125,7 @@ class Statistics(YomboLibrary):
     _counters = {}  # stores counter information before it's saved to database
     _averages = {}  # stores averages type information
     _datapoints = {}  # stores datapoint data
+    _average_samples = {}  # bucket_time -> SampleColumns, the raw values for averages.
     _datapoint_last_value = {}  # Used to track duplicates. Duplicate values are removed as it adds no value!
 
     bucket_lifetimes_default = {"size": 300, "lifetime": 360}  # 300 seconds, saved for 180 days.
@@ -139,6 +139,8 @@ class Statistics(YomboLibrary):
         "devices.#": {"size": 60, "lifetime": 0},
         "energy.#": {"size": 60, "lifetime": 0},
     }
+    # Interns bucket names to ids, caches their lifetimes, and used for wildcard searches by get_stat().
+    _stat_registry = StatRegistry(bucket_lifetimes, bucket_lifetimes_default)
 
     _storage_attribute_sort_key: ClassVar[str] = "updated_at"
     _storage_attribute_sort_key_order: ClassVar[str] = "desc"
@@ -167,12 +169,17 @@ class Statistics(YomboLibrary):
 
         self._upload_statistics_loop = LoopingCall(self._upload_statistics)
 
+        self.time_between_rollups = self._Configs.get("statistics.time_between_rollups", 300)
+        self.rollup_running = False
+        self._rollup_statistics_loop = LoopingCall(self._rollup_statistics)
+
         yield self.load_last_datapoints()
         self.last_upload_count = None
 
     def _start_(self, **kwargs):
         if self.enabled is True:
             self._upload_statistics_loop.start(random_int(60*10, .2), False)  # about every 10 minutes
+            self._rollup_statistics_loop.start(self.time_between_rollups, False)
 
     @inlineCallbacks
     def _stop_(self, **kwargs):
@@ -245,6 +252,14 @@ class Statistics(YomboLibrary):
                         self._datapoints[bucket_time][bucket_name]["restored_from_db"] = bucket_data["restored_from_db"]
                         self._datapoints[bucket_time][bucket_name]["restored_db_id"] = bucket_data["restored_db_id"]
 
+        for buckets in (self._counters, self._averages, self._datapoints):
+            for bucket_time, data in buckets.items():
+                for bucket_name in data:
+                    try:
+                        self._stat_registry.intern(bucket_name)
+                    except YomboWarning:
+                        pass
+
         # print("_counters: %s" % self._counters)
         # print("_averages: %s" % self._averages)
         # print("_datapoints: %s" % self._datapoints)
@@ -293,9 +308,8 @@ class Statistics(YomboLibrary):
             raise YomboWarning("Bucket lifetimes must have 'size' defined.")
         if "lifetime" not in values:
             raise YomboWarning("Bucket lifetimes must have 'lifetime' defined.")
-        self.bucket_lifetimes[bucket_name] = values
+        self._stat_registry.add_bucket_lifetime(bucket_name, values)
 
-    @cached(1)
     def _get_bucket_time(self, type, bucket_size=None, bucket_name=None, bucket_lifetime=None):
         """
         Internal function to get time for a given bucket type.
@@ -306,40 +320,43 @@ class Statistics(YomboLibrary):
         if bucket_name is None:
             raise YomboWarning("_get_bucket_time expects a bucket name, got None.")
 
-        suggested_bucket_size, suggested_bucket_lifetime = self.find_bucket_time(bucket_name)
+        suggested_bucket_size, suggested_bucket_lifetime = \
+            self._stat_registry.lifetimes[self._stat_registry.intern(bucket_name)]
         if bucket_size is None:
-            bucket_size = 1
+            bucket_size = suggested_bucket_size
         elif isinstance(bucket_size, int) is False and isinstance(bucket_size, float) is False:
             raise YomboWarning("Invalid bucket_time submitted to _get_bucket_time")
 
         if bucket_lifetime is None:
             bucket_lifetime = suggested_bucket_lifetime
 
-        if type == "datapoint":
-            try:
-                number_of_decimals = len(bucket_size.split(".")[1])
-            except:
-                number_of_decimals = 0
-
-            if number_of_decimals > 0:
-                the_time = round(round((time() / bucket_size), 1) * bucket_size, 1)
-            else:
-                the_time = int(int((time() / bucket_size)) * bucket_size)
-            return {"size": bucket_size,
-                    "time": the_time,
-                    "lifetime": bucket_lifetime}
-
         return {"size": bucket_size,
-                "time": int(int((time() / bucket_size)) * bucket_size),
+                "time": self.bucket_window(bucket_size),
                 "lifetime": bucket_lifetime}
 
-    @cached(1)  # use the version that support kwargs....
+    @staticmethod
+    def bucket_window(bucket_size, now=None):
+        """
+        Returns the start time of the bucket window that 'now' falls within.
+
+        :param bucket_size: Size of the bucket in seconds.
+        :param now: The time to use, default is the current time.
+        :return: Unix epoch time.
+        """
+        if now is None:
+            now = time()
+        if isinstance(bucket_size, float) and bucket_size.is_integer() is False:
+            return round(round(now / bucket_size, 1) * bucket_size, 1)
+        return int(now // bucket_size) * int(bucket_size)
+
     def _validate_name(self, bucket_name):
         """
         Validates the bucket_name being submitted is valid. No point in sending badly bucket_named
         items to the server, as the server will simply perform this same check and
         discard any invalid ones.
 
+        Names are only validated once, valid names are interned into the stats registry.
+
         .. note::
 
             If the server detects too many invalid bucket_names, the gateway will be blocked from
@@ -347,16 +364,52 @@ class Statistics(YomboLibrary):
 
         :param bucket_name: Label for the statistic
         :type bucket_name: string
+        :return: The stat id for the name.
+        """
+        return self._stat_registry.intern(bucket_name)
+
+    def _get_bucket(self, buckets, bucket_type, bucket_name, bucket_size, anon, lifetimes, value):
+        """
+        Gets the bucket for the statistic name within the current bucket window, creating it if needed.
+
+        :param buckets: One of: self._counters, self._averages, self._datapoints
+        :param bucket_type: One of: counter, average, datapoint
+        :param bucket_name: Name of the statistic.
+        :param bucket_size: Size of the bucket in seconds, default is from the bucket lifetimes.
+        :param anon: If anonymous type data.
+        :param lifetimes: Optional lifetime to add for the bucket name.
+        :param value: Starting value if the bucket is new.
+        :return: A tuple of the stat_id, bucket dictionary and True if the bucket was just created.
         """
-        parts = bucket_name.split(".", 10)
-        if len(parts) < 3:
-            raise YomboWarning("bucket_name must have at least 3 parts, preferably at least 4.")
-        elif len(parts) > 8:
-            raise YomboWarning("bucket_name has too many parts, no more than 8.")
+        if lifetimes is not None:
+            self.add_bucket_lifetime(bucket_name, lifetimes)
+        stat_id = self._stat_registry.intern(bucket_name)
 
-        for count in range(0, len(parts)):
-            if len(parts[count]) < 3:
-                raise YomboWarning(f"'{parts[count]}' is too short, must be at least 3 characters: ")
+        suggested_size, lifetime = self._stat_registry.lifetimes[stat_id]
+        if bucket_size is None:
+            bucket_size = suggested_size
+        bucket_time = self.bucket_window(bucket_size)
+
+        if bucket_time not in buckets:
+            buckets[bucket_time] = {}
+        window = buckets[bucket_time]
+        created = bucket_name not in window
+        if created:
+            window[bucket_name] = {
+                "time": bucket_time,
+                "size": bucket_size,
+                "lifetime": lifetime,
+                "type": bucket_type,
+                "name": bucket_name,
+                "anon": False,
+                "restored_from_db": False,
+                "touched": True,
+                "value": value,
+            }
+        bucket = window[bucket_name]
+        if anon is not None:
+            bucket["anon"] = anon is True
+        return stat_id, bucket, created
 
     def datapoint(self, bucket_name, value, anon=None, bucket_size=None, lifetimes=None):
         """
@@ -377,52 +430,22 @@ class Statistics(YomboLibrary):
         """
         if self.enabled is not True:
             return
-        try:
-            self._validate_name(bucket_name)
-        except YomboWarning as e:
-            return
 
         if bucket_name in self._datapoint_last_value:  # lookup last value saved.
             if self._datapoint_last_value[bucket_name] == value:  # we don't save duplicates!
-                # print("stats datapoint droping duplicate bucketname/value: %s/%s" % (bucket_name, value))
                 return
 
-        if lifetimes is not None:
-            self.add_bucket_lifetime(bucket_name, lifetimes)
-
         if bucket_size is None:
             bucket_size = 1
 
-        bucket = self._get_bucket_time("datapoint", bucket_size=bucket_size, bucket_name=bucket_name)
-        # print("stat datapoint bucket details: %s" % bucket)
-        if bucket["time"] not in self._datapoints:
-            self._datapoints[bucket["time"]] = {}
-        if bucket_name not in self._datapoints[bucket["time"]]:
-            self._datapoints[bucket["time"]][bucket_name] = {
-                "time": bucket["time"],
-                "lifetime": bucket["lifetime"],
-                "size": bucket_size,
-                "type": "datapoint",
-                "name": bucket_name,
-                "anon": False,
-                "restored_from_db": False,
-                "touched": True,
-                "value": value,
-            }
-        else:
-            self._datapoints[bucket["time"]][bucket_name].update(
-                {
-                    "value": value,
-                    "touched": True,
-                }
-            )
-
-        # print("datapoint final: %s" % self._datapoints[bucket["time"]][bucket_name])
-
-        if anon is True:
-            self._datapoints[bucket["time"]][bucket_name]["anon"] = True
-        else:
-            self._datapoints[bucket["time"]][bucket_name]["anon"] = False
+        try:
+            stat_id, bucket, created = self._get_bucket(self._datapoints, "datapoint", bucket_name, bucket_size,
+                                                        anon is True, lifetimes, value)
+        except YomboWarning:
+            return
+        if created is False:
+            bucket["value"] = value
+            bucket["touched"] = True
 
     def count(self, bucket_name, value, bucket_size=None, anon=None, lifetimes=None):
         """
@@ -440,46 +463,15 @@ class Statistics(YomboLibrary):
         """
         if self.enabled is not True:
             return
+
         try:
-            self._validate_name(bucket_name)
-        except YomboWarning as e:
+            stat_id, bucket, created = self._get_bucket(self._counters, "counter", bucket_name, bucket_size,
+                                                        anon, lifetimes, value)
+        except YomboWarning:
             return
-
-        if lifetimes is not None:
-            self.add_bucket_lifetime(bucket_name, lifetimes)
-
-        bucket = self._get_bucket_time("count", bucket_size=bucket_size, bucket_name=bucket_name)
-
-        if bucket["time"] not in self._counters:
-            self._counters[bucket["time"]] = {}
-
-        if bucket_name not in self._counters[bucket["time"]]:
-            self._counters[bucket["time"]][bucket_name] = {
-                "time": bucket["time"],
-                "size": bucket["size"],
-                "lifetime": bucket["lifetime"],
-                "type": "counter",
-                "name": bucket_name,
-                "anon": False,
-                "restored_from_db": False,
-                "touched": True,
-                "value": value,
-            }
-        else:
-            self._counters[bucket["time"]][bucket_name].update(
-                {
-                    "value": value,
-                    "touched": True,
-                }
-            )
-
-        if anon is None:
-            if "anon" not in self._counters[bucket["time"]][bucket_name]["anon"]:
-                self._counters[bucket["time"]][bucket_name]["anon"] = False
-        elif anon is True:
-            self._counters[bucket["time"]][bucket_name]["anon"] = True
-        elif anon is False:
-            self._counters[bucket["time"]][bucket_name]["anon"] = False
+        if created is False:
+            bucket["value"] = value
+            bucket["touched"] = True
 
     def increment(self, bucket_name, count=1, bucket_size=None, anon=None, lifetimes=None):
         """
@@ -500,46 +492,15 @@ class Statistics(YomboLibrary):
         """
         if self.enabled is not True:
             return
+
         try:
-            self._validate_name(bucket_name)
-        except YomboWarning as e:
+            stat_id, bucket, created = self._get_bucket(self._counters, "counter", bucket_name, bucket_size,
+                                                        anon, lifetimes, count)
+        except YomboWarning:
             return
-
-        if lifetimes is not None:
-            self.add_bucket_lifetime(bucket_name, lifetimes)
-
-        bucket = self._get_bucket_time("count", bucket_size=bucket_size, bucket_name=bucket_name)
-        # if bucket_name == "lib.configuration.set.new":
-        #     print("stat increment start: %s" % self._counters)
-        if bucket["time"] not in self._counters:
-            self._counters[bucket["time"]] = {}
-
-        if bucket_name not in self._counters[bucket["time"]]:
-            self._counters[bucket["time"]][bucket_name] = {
-                "time": bucket["time"],
-                "size": bucket["size"],
-                "lifetime": bucket["lifetime"],
-                "type": "counter",
-                "name": bucket_name,
-                "anon": False,
-                "restored_from_db": False,
-                "touched": True,
-                "value": count,
-            }
-        else:
-            self._counters[bucket["time"]][bucket_name]["value"] += count
-            self._counters[bucket["time"]][bucket_name]["touched"] = True
-
-        if anon is None:
-            if "anon" not in self._counters[bucket["time"]][bucket_name]["anon"]:
-                self._counters[bucket["time"]][bucket_name]["anon"] = False
-        elif anon is True:
-            self._counters[bucket["time"]][bucket_name]["anon"] = True
-        elif anon is False:
-            self._counters[bucket["time"]][bucket_name]["anon"] = False
-
-        # if bucket_name == "lib.configuration.set.new":
-        #     print("stat increment end: %s" % self._counters)
+        if created is False:
+            bucket["value"] += count
+            bucket["touched"] = True
 
     def decrement(self, bucket_name, count=1, bucket_size=None, anon=None, lifetimes=None):
         """
@@ -560,48 +521,24 @@ class Statistics(YomboLibrary):
         """
         if self.enabled is not True:
             return
+
         try:
-            self._validate_name(bucket_name)
-        except YomboWarning as e:
+            stat_id, bucket, created = self._get_bucket(self._counters, "counter", bucket_name, bucket_size,
+                                                        anon, lifetimes, -count)
+        except YomboWarning:
             return
-
-        if lifetimes is not None:
-            self.add_bucket_lifetime(bucket_name, lifetimes)
-
-        bucket = self._get_bucket_time("count", bucket_size=bucket_size, bucket_name=bucket_name)
-
-        if bucket["time"] not in self._counters:
-            self._counters[bucket["time"]] = {}
-
-        if bucket_name not in self._counters[bucket["time"]]:
-            self._counters[bucket["time"]][bucket_name] = {
-                "time": bucket["time"],
-                "size": bucket["size"],
-                "lifetime": bucket["lifetime"],
-                "type": "counter",
-                "name": bucket_name,
-                "anon": False,
-                "restored_from_db": False,
-                "touched": True,
-                "value": count,
-            }
-        else:
-            self._counters[bucket["time"]][bucket_name]["value"] -= count
-            self._counters[bucket["time"]][bucket_name]["touched"] = True
-
-        if anon is None:
-            if "anon" not in self._counters[bucket["time"]][bucket_name]["anon"]:
-                self._counters[bucket["time"]][bucket_name]["anon"] = False
-        elif anon is True:
-            self._counters[bucket["time"]][bucket_name]["anon"] = True
-        elif anon is False:
-            self._counters[bucket["time"]][bucket_name]["anon"] = False
+        if created is False:
+            bucket["value"] -= count
+            bucket["touched"] = True
 
     def averages(self, bucket_name, value, bucket_size=None, anon=None, lifetimes=None):
         """
         Set a time on how long something took to complete in milliseconds. A single timer can be set many times, but
         it will be averaged per bucket.
 
+        The values are stored in numpy columns per bucket window, see
+        :py:class:`~yombo.lib.statistics.columns.SampleColumns`.
+
         .. code-block:: python
         
            self._Statistics.averages("house.upstairs.den.temperature", data["den"])
@@ -617,51 +554,29 @@ class Statistics(YomboLibrary):
         """
         if self.enabled is not True:
             return
+
         try:
-            self._validate_name(bucket_name)
-        except YomboWarning as e:
+            stat_id, bucket, created = self._get_bucket(self._averages, "average", bucket_name, bucket_size,
+                                                        anon, lifetimes, None)
+        except YomboWarning:
             return
+        if created is True:
+            bucket["average_data"] = []
+        bucket["touched"] = True
 
-        if lifetimes is not None:
-            self.add_bucket_lifetime(bucket_name, lifetimes)
-
-        bucket = self._get_bucket_time("averages", bucket_size=bucket_size, bucket_name=bucket_name)
-
-        if bucket["time"] not in self._averages:
-            self._averages[bucket["time"]] = {}
-
-        if bucket_name not in self._averages[bucket["time"]]:
-            self._averages[bucket["time"]][bucket_name] = {
-                "time": bucket["time"],
-                "lifetime": bucket["lifetime"],
-                "values": [value],
-                "restored_from_db": False,
-                "anon": False,
-                "size": bucket["size"],
-                "type": "average",
-                "name": bucket_name,
-                "average_data": [],
-                "touched": True,
-            }
-        else:
-            self._averages[bucket["time"]][bucket_name]["average_data"].append(value)
-            self._counters[bucket["time"]][bucket_name]["touched"] = True
-
-        if anon is None:
-            if "anon" not in self._averages[bucket["time"]][bucket_name]["anon"]:
-                self._averages[bucket["time"]][bucket_name]["anon"] = False
-        elif anon is True:
-            self._averages[bucket["time"]][bucket_name]["anon"] = True
-        elif anon is False:
-            self._averages[bucket["time"]][bucket_name]["anon"] = False
+        bucket_time = bucket["time"]
+        if bucket_time not in self._average_samples:
+            self._average_samples[bucket_time] = SampleColumns()
+        self._average_samples[bucket_time].append(stat_id, value)
 
     def get_stat(self, bucket_name, bucket_type=None):
         results = []
         # sum(value) as value, bucket_name, type, round(bucket / %s) * %s AS bucket
         find_name = bucket_name.replace("%", "#")
+        stat_names = self._stat_registry.search(find_name)
         if bucket_type is None or bucket_type is "counter":
             for bucket in self._counters:
-                for stat in pattern_search(find_name, self._counters[bucket]):
+                for stat in [name for name in stat_names if name in self._counters[bucket]]:
                     too_add = self._counters[bucket][stat]
                     new_result = {
                         "name": stat,
@@ -673,7 +588,7 @@ class Statistics(YomboLibrary):
 
         if bucket_type is None or bucket_type is "average":
             for bucket in self._averages:
-                for stat in pattern_search(find_name, self._averages[bucket]):
+                for stat in [name for name in stat_names if name in self._averages[bucket]]:
                     too_add = self._averages[bucket][stat]
                     new_result = {
                         "name": stat,
@@ -685,7 +600,7 @@ class Statistics(YomboLibrary):
 
         if bucket_type is None or bucket_type is "datapoint":
             for bucket in self._datapoints:
-                for stat in pattern_search(find_name, self._datapoints[bucket]):
+                for stat in [name for name in stat_names if name in self._datapoints[bucket]]:
                     too_add = self._datapoints[bucket][stat]
                     new_result = {
                         "name": stat,
@@ -752,7 +667,8 @@ class Statistics(YomboLibrary):
         for bucket_time in list(self._counters.keys()):
             for bucket_name in list(self._counters[bucket_time].keys()):
                 current_bucket = self._counters[bucket_time][bucket_name]
-                current_bucket_time = self._get_bucket_time("count", bucket_name=bucket_name)
+                current_bucket_time = {"time": self.bucket_window(current_bucket["size"]),
+                                       "size": current_bucket["size"]}
                 if full or bucket_time < (current_bucket_time["time"]):
                     # print("count bucket: %s" % current_bucket)
                     if "restored_db_id" in current_bucket and current_bucket["restored_db_id"] is not False:
@@ -763,7 +679,7 @@ class Statistics(YomboLibrary):
                                     current_bucket,
                                     int(bucket_time < (current_bucket_time["time"]))
                                 )
-                            current_bucket_time["touched"] = False
+                            current_bucket["touched"] = False
                     else:
                         # print("_counters stats save bucket, finished: %s < %s" % (int(bucket_time), current_bucket_time))
                         od = {
@@ -787,7 +703,8 @@ class Statistics(YomboLibrary):
         for bucket_time in list(self._averages.keys()):
             for bucket_name in list(self._averages[bucket_time].keys()):
                 current_bucket = self._averages[bucket_time][bucket_name]
-                current_bucket_time = self._get_bucket_time("average", bucket_name=bucket_name)
+                current_bucket_time = {"time": self.bucket_window(current_bucket["size"]),
+                                       "size": current_bucket["size"]}
                 if full or bucket_time < (current_bucket_time["time"]):
 
                     try:
@@ -802,7 +719,7 @@ class Statistics(YomboLibrary):
                                 # print("_averages stats save bucket, updating existing")
                                 yield self._LocalDB.database.save_statistic(current_bucket,
                                                                    int(bucket_time < (current_bucket_time["time"])))
-                                current_bucket_time["touched"] = False
+                                current_bucket["touched"] = False
                         else:
                             # print("_averages stats save bucket, finished: %s < %s" % (
                             # int(bucket_time), int((current_bucket_time["time"]))))
@@ -824,16 +741,20 @@ class Statistics(YomboLibrary):
                         del self._averages[bucket_time][bucket_name]
             if len(self._averages[bucket_time]) == 0:
                 del self._averages[bucket_time]
+                if bucket_time in self._average_samples:
+                    del self._average_samples[bucket_time]
 
         for bucket_time in list(self._datapoints.keys()):
             for bucket_name in list(self._datapoints[bucket_time].keys()):
                 current_bucket = self._datapoints[bucket_time][bucket_name]
+                current_bucket_time = {"time": self.bucket_window(current_bucket["size"]),
+                                       "size": current_bucket["size"]}
                 if "restored_db_id" in current_bucket and current_bucket["restored_db_id"] is not False:
                     if current_bucket["touched"] is True:
                         if self.enabled is True:
                             yield self._LocalDB.database.save_statistic(current_bucket,
                                                                        int(bucket_time < (current_bucket_time["time"])))
-                        current_bucket_time["touched"] = False
+                        current_bucket["touched"] = False
                 else:
                     # print("_datapoints stats save bucket, finished: %s < %s" % (
                     # int(bucket_time), int((current_bucket_time["time"]))))
@@ -865,113 +786,98 @@ class Statistics(YomboLibrary):
             logger.warn("Error while trying to bulk save: {error}", error=error)
 
     def calc_averages(self, bucket_time, bucket_name):
-        values = self._averages[bucket_time][bucket_name]["values"]
-        if len(values) > 0:
-            sorted_values = sorted(values)
-
-            median = percentile(list(sorted_values), 0.50)
-            percentile90 = percentile(sorted_values, 0.90)
-            values_90 = []
+        """
+        Calculate the average data for an averages bucket using the samples collected within the bucket window.
+        If the bucket was restored from the database, the new values are merged using a weighted average.
 
-            for val in sorted_values:
-                if val <= percentile90:
-                    values_90.append(val)
-                else:
-                    break
-
-            median_90 = percentile(values_90, 0.50)
-
-            average_data = {
-                "count": len(sorted_values),
-                "median": median,
-                "upper": sorted_values[-1],
-                "lower": sorted_values[0],
-                "upper_90": values_90[0],
-                "lower_90": values_90[-1],
-                "median_90": median_90,
-            }
+        :param bucket_time: The bucket window.
+        :param bucket_name: Name of the statistic.
+        :return: Dictionary of average data.
+        """
+        bucket = self._averages[bucket_time][bucket_name]
+        average_data = None
+        if bucket_time in self._average_samples and bucket_name in self._stat_registry:
+            values = self._average_samples[bucket_time].values_for(self._stat_registry.ids[bucket_name])
+            average_data = summarize_samples(values)
 
-            restored_averages = self._averages[bucket_time][bucket_name]["restored_from_db"]
+        restored_averages = bucket["restored_from_db"]
+        if restored_averages is True:  # Keep the average data loaded from the database for merging.
+            restored_averages = bucket.setdefault("restored_average_data", bucket["average_data"])
 
-            if restored_averages is not False:
+        if average_data is not None:
+            if isinstance(restored_averages, dict):
                 counts = [restored_averages["count"], average_data["count"]]
-                medians = [restored_averages["median"], average_data["median"]]
-                uppers = [restored_averages["upper"], average_data["upper"]]
-                lowers = [restored_averages["lower"], average_data["lower"]]
-                upper_90s = [restored_averages["upper_90"], average_data["upper_90"]]
-                lower_90s = [restored_averages["lower_90"], average_data["lower_90"]]
-                median_90s = [restored_averages["median_90"], average_data["median_90"]]
-
+                total = sum(counts)
                 # found this weighted averaging method here:
                 # http://stackoverflow.com/questions/29330792/python-weighted-averaging-a-list
-                # new_average_data = {}
-                average_data["count"] = restored_averages["count"] + average_data["count"]
-                average_data["median"] = sum(x * y for x, y in zip(medians, counts)) / sum(counts)
-                average_data["upper"] = sum(x * y for x, y in zip(uppers, counts)) / sum(counts)
-                average_data["lower"] = sum(x * y for x, y in zip(lowers, counts)) / sum(counts)
-                average_data["upper_90"] = sum(x * y for x, y in zip(upper_90s, counts)) / sum(counts)
-                average_data["lower_90"] = sum(x * y for x, y in zip(lower_90s, counts)) / sum(counts)
-                average_data["median_90"] = sum(x * y for x, y in zip(median_90s, counts)) / sum(counts)
-
-                # self._averages[bucket_time][bucket_name]["restored_from_db"] = True
-            self._averages[bucket_time][bucket_name]["value"] = average_data["median_90"]
-            self._averages[bucket_time][bucket_name]["average_data"] = average_data
+                for key in ("median", "upper", "lower", "upper_90", "lower_90", "median_90"):
+                    average_data[key] = (restored_averages[key] * counts[0] + average_data[key] * counts[1]) / total
+                average_data["count"] = total
 
+            bucket["value"] = average_data["median_90"]
+            bucket["average_data"] = average_data
             return average_data
-        elif self._averages[bucket_time][bucket_name]["restored_from_db"] is not False:
-            self._averages[bucket_time][bucket_name]["average_data"] = \
-                self._averages[bucket_time][bucket_name]["restored_from_db"]
+        elif restored_averages is not False:
+            bucket["average_data"] = restored_averages
         else:
             raise YomboWarning("Calc_averages must have a list of ints or floats.")
 
     def find_bucket_time(self, bucket_name):
         """
-        :return:
+        Get the bucket size and lifetime for a statistic name. This is resolved once per name and cached.
+
+        :param bucket_name: Name of the statistic.
+        :return: A tuple of size, lifetime.
         """
-        def make_regex(bucket_lifetimes):
-            thelist = {}
-            for filter, data in bucket_lifetimes.items():
-                thelist[filter] = re.compile(filter.replace("#", ".*").replace("$", "\$").replace("+", "[/\$\s\w\d]+"))
-            return thelist
-
-        def select_closest( the_list, search_for):  # semi-reusing fuzzydict..
-            stringDiffLib = SequenceMatcher()
-            stringDiffLib.set_seq1(search_for.lower())
-            # examine each key in the dict
-            best_ratio = -1
-            best_match = None
-            for key in the_list:
-                # key must be a string, otherwise it is skipped!
-                try:
-                    stringDiffLib.set_seq2(key.lower())
-                except TypeError:
-                    continue                # might get here, even though it's not a string. Catch it!
-                try:
-                    # get the match ratio
-                    curRatio = stringDiffLib.ratio()
-                except TypeError:
-                    break
-                # if this is the best ratio so far - save it and the value
-                if curRatio > best_ratio:
-                    best_ratio = curRatio
-                    best_match = key
-            return best_match
-
-        regexs = make_regex(self.bucket_lifetimes)
-
-        # get all possible matching filters
-        filters = []
-        for filter, regex in regexs.items():
-            result = regex.match(bucket_name)
-            if result is not None:
-                filters.append(filter)
-
-        # now lets strip this down
-        if len("filters") > 0:
-            bucket_time = select_closest(regexs, bucket_name)
-            return self.bucket_lifetimes[bucket_time]["size"], self.bucket_lifetimes[bucket_time]["lifetime"]
-        else:
-            return self.bucket_lifetimes_default["size"], self.bucket_lifetimes_default["lifetime"]
+        try:
+            return self._stat_registry.lifetimes[self._stat_registry.intern(bucket_name)]
+        except YomboWarning:
+            return self._stat_registry.resolve_lifetime(bucket_name)
+
+    @inlineCallbacks
+    def _rollup_statistics(self):
+        """
+        Incrementally compute the rollup tiers. The first tier reads the raw statistics, each following tier reads
+        the tier before it. Each tier only processes the time between it's own watermark and the watermark of the
+        tier it's built from, so data is never read twice.
+
+        Raw buckets are still being updated until they are saved, so the first tier stays behind by the save
+        interval plus the largest bucket size.
+
+        A tier without a watermark starts at the oldest data of it's source. Each transaction computes at most
+        ROLLUP_MAX_WINDOWS windows of the tier, so catching up on a large history doesn't block the database.
+        """
+        if self.enabled is not True or self.rollup_running is True:
+            return
+        self.rollup_running = True
+        try:
+            current_time = time()
+            bucket_sizes = [values["size"] for values in self.bucket_lifetimes.values()]
+            lag = self.time_between_saves + max(bucket_sizes + [self.bucket_lifetimes_default["size"]]) + 60
+            watermarks = yield self._LocalDB.get_statistic_rollup_watermarks()
+            for tier in rollup_tier_sizes():
+                source_tier = rollup_source_tier(tier)
+                if source_tier is None:
+                    limit = self.bucket_window(tier, current_time - lag)
+                else:
+                    limit = self.bucket_window(tier, watermarks.get(source_tier, 0))
+                if tier in watermarks:
+                    start = watermarks[tier]
+                else:
+                    oldest = yield self._LocalDB.get_statistic_rollup_start(source_tier)
+                    if oldest is None:
+                        continue
+                    start = self.bucket_window(tier, oldest)
+                while start < limit:
+                    end = min(limit, start + tier * ROLLUP_MAX_WINDOWS)
+                    yield self._LocalDB.rollup_statistics_tier(tier, source_tier, start, end)
+                    watermarks[tier] = start = end
+
+            for tier, retention in ROLLUP_TIERS.items():
+                if retention > 0:
+                    yield self._LocalDB.delete_expired_statistic_rollups(tier, current_time - retention)
+        finally:
+            self.rollup_running = False
 
     @inlineCallbacks
     def _upload_statistics(self):
@@ -0,0 +1,220 @@
+# This file was created by Yombo for use with Yombo Python gateway automation
+# software.  Details can be found at https://yombo.net
+"""
+
+.. note::
+
+  For more information see: `Statistics @ Module Development <https://yombo.net/docs/libraries/statistics>`_
+
+Columnar storage helpers for the statistics library.
+
+* StatRegistry - Interns every statistic name to an integer id, validates the name once, and caches the bucket
+  lifetime resolved for the name.
+* SampleColumns - Preallocated numpy arrays that store the samples of the 'average' statistics for a single
+  bucket window.
+
+.. moduleauthor:: Mitch Schwenk <mitch-gw@yombo.net>
+.. versionadded:: 0.24.0
+
+:copyright: Copyright 2020 by Yombo.
+:license: LICENSE for details.
+:view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/_modules/yombo/lib/statistics/columns.html>`_
+"""
+from difflib import SequenceMatcher
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from yombo.classes.topictrie import TopicTrie
+from yombo.core.exceptions import YomboWarning
+
+EMPTY_SAMPLES = np.empty(0, dtype=np.float64)
+
+
+def compile_bucket_lifetime(bucket_filter: str):
+    """
+    Compile a bucket lifetime filter (such as "lib.atoms.#") into a regex.
+
+    :param bucket_filter: The filter to compile.
+    :return: Compiled regex.
+    """
+    return re.compile(bucket_filter.replace("#", ".*").replace("$", "\$").replace("+", "[/\$\s\w\d]+"))
+
+
+def validate_stat_name(bucket_name: str) -> None:
+    """
+    Validates the bucket_name being submitted is valid.
+
+    :raises YomboWarning: Raised when the name is invalid.
+    :param bucket_name: Label for the statistic
+    """
+    parts = bucket_name.split(".", 10)
+    if len(parts) < 3:
+        raise YomboWarning("bucket_name must have at least 3 parts, preferably at least 4.")
+    elif len(parts) > 8:
+        raise YomboWarning("bucket_name has too many parts, no more than 8.")
+
+    for count in range(0, len(parts)):
+        if len(parts[count]) < 3:
+            raise YomboWarning(f"'{parts[count]}' is too short, must be at least 3 characters: ")
+
+
+class StatRegistry:
+    """
+    Keeps track of all the statistic names. Each name gets an integer id, which is used as the key within the
+    sample columns. The bucket size and lifetime is resolved once per name and cached here.
+    """
+    def __init__(self, bucket_lifetimes: Dict[str, dict], bucket_lifetimes_default: dict):
+        self.ids = {}  # name -> stat_id
+        self.names = []  # stat_id -> name
+        self.lifetimes = []  # stat_id -> (size, lifetime)
+        self.invalid = set()  # names that failed validation
+        self.trie = TopicTrie()  # used for wildcard searches.
+        self.bucket_lifetimes = bucket_lifetimes
+        self.bucket_lifetimes_default = bucket_lifetimes_default
+        self.bucket_lifetime_regexs = {}
+        for bucket_filter in bucket_lifetimes:
+            self.bucket_lifetime_regexs[bucket_filter] = compile_bucket_lifetime(bucket_filter)
+
+    def __contains__(self, bucket_name: str) -> bool:
+        return bucket_name in self.ids
+
+    def intern(self, bucket_name: str) -> int:
+        """
+        Get the stat_id for a name, adding the name if needed.
+
+        :raises YomboWarning: Raised when the name is invalid.
+        :param bucket_name: Name of the statistic.
+        :return: The stat_id.
+        """
+        stat_id = self.ids.get(bucket_name)
+        if stat_id is not None:
+            return stat_id
+        if bucket_name in self.invalid:
+            raise YomboWarning(f"Invalid statistic name: {bucket_name}")
+        try:
+            validate_stat_name(bucket_name)
+        except YomboWarning:
+            self.invalid.add(bucket_name)
+            raise
+
+        stat_id = len(self.names)
+        self.ids[bucket_name] = stat_id
+        self.names.append(bucket_name)
+        self.lifetimes.append(self.resolve_lifetime(bucket_name))
+        self.trie.add(bucket_name)
+        return stat_id
+
+    def search(self, pattern: str) -> List[str]:
+        """ Return a list of names matching a wildcard pattern. """
+        return self.trie.search(pattern)
+
+    def add_bucket_lifetime(self, bucket_filter: str, values: dict) -> None:
+        """
+        Add or replace a bucket lifetime filter. The lifetimes of all known names are resolved again.
+
+        :param bucket_filter: Filter, such as "modules.mymodule.#"
+        :param values: Dictionary with size and lifetime.
+        """
+        self.bucket_lifetimes[bucket_filter] = values
+        self.bucket_lifetime_regexs[bucket_filter] = compile_bucket_lifetime(bucket_filter)
+        self.lifetimes = [self.resolve_lifetime(name) for name in self.names]
+
+    def resolve_lifetime(self, bucket_name: str) -> Tuple[int, int]:
+        """
+        Find the bucket size and lifetime for a name. Of all the matching filters, the closest match is used.
+
+        :param bucket_name: Name of the statistic.
+        :return: A tuple of size, lifetime.
+        """
+        matcher = SequenceMatcher()
+        matcher.set_seq2(bucket_name.lower())
+        best_ratio = -1
+        best_match = None
+        for bucket_filter, regex in self.bucket_lifetime_regexs.items():
+            if regex.match(bucket_name) is None:
+                continue
+            matcher.set_seq1(bucket_filter.lower())
+            ratio = matcher.ratio()
+            if ratio > best_ratio:
+                best_ratio = ratio
+                best_match = bucket_filter
+
+        if best_match is None:
+            return self.bucket_lifetimes_default["size"], self.bucket_lifetimes_default["lifetime"]
+        return self.bucket_lifetimes[best_match]["size"], self.bucket_lifetimes[best_match]["lifetime"]
+
+
+class SampleColumns:
+    """
+    Stores samples for a single bucket window in two parallel, preallocated numpy arrays: stat_ids and values.
+    The arrays double in size when full.
+    """
+    def __init__(self, capacity: Optional[int] = None):
+        if capacity is None:
+            capacity = 256
+        self.stat_ids = np.empty(capacity, dtype=np.int32)
+        self.values = np.empty(capacity, dtype=np.float64)
+        self.length = 0
+        self._groups = None
+
+    def __len__(self):
+        return self.length
+
+    def append(self, stat_id: int, value) -> None:
+        """
+        Add a sample.
+
+        :param stat_id: The stat id from StatRegistry.
+        :param value: Numeric value.
+        """
+        if self.length == len(self.values):
+            self.stat_ids = np.concatenate((self.stat_ids, np.empty(self.length, dtype=np.int32)))
+            self.values = np.concatenate((self.values, np.empty(self.length, dtype=np.float64)))
+        self.stat_ids[self.length] = stat_id
+        self.values[self.length] = value
+        self.length += 1
+        self._groups = None
+
+    def values_for(self, stat_id: int):
+        """
+        Get all the samples for a stat id.
+
+        :param stat_id: The stat id from StatRegistry.
+        :return: A numpy array of values, in the order they were added.
+        """
+        if self._groups is None:
+            stat_ids = self.stat_ids[:self.length]
+            order = np.argsort(stat_ids, kind="stable")
+            sorted_ids = stat_ids[order]
+            sorted_values = self.values[:self.length][order]
+            unique_ids, starts = np.unique(sorted_ids, return_index=True)
+            ends = np.append(starts[1:], self.length)
+            self._groups = {int(unique_id): sorted_values[start:end]
+                            for unique_id, start, end in zip(unique_ids, starts, ends)}
+        return self._groups.get(stat_id, EMPTY_SAMPLES)
+
+
+def summarize_samples(values) -> Optional[dict]:
+    """
+    Calculate the average data (count, median, upper, lower, and the 90th percentile versions) for a set
+    of samples.
+
+    :param values: A numpy array of samples.
+    :return: Dictionary of average data, or None if there are no samples.
+    """
+    if values.size == 0:
+        return None
+    sorted_values = np.sort(values)
+    median, percentile90 = np.percentile(sorted_values, (50, 90))
+    values_90 = sorted_values[sorted_values <= percentile90]
+    return {
+        "count": int(sorted_values.size),
+        "median": float(median),
+        "upper": float(sorted_values[-1]),
+        "lower": float(sorted_values[0]),
+        "upper_90": float(values_90[-1]),
+        "lower_90": float(values_90[0]),
+        "median_90": float(np.percentile(values_90, 50)),
+    }
@@ -0,0 +1,92 @@
+# This file was created by Yombo for use with Yombo Python gateway automation
+# software.  Details can be found at https://yombo.net
+"""
+
+.. note::
+
+  For more information see: `Statistics @ Module Development <https://yombo.net/docs/libraries/statistics>`_
+
+Defines the fixed rollup tiers for statistics. Raw statistics are rolled up into 1 minute buckets, which are then
+rolled up into 15 minute, 1 hour, and 1 day buckets. Each tier is computed from the tier below it, only processing
+the time between the tier's watermark and the watermark of the tier it's built from.
+
+Each rollup row stores the count, sum, min, and max of the values within the window. This allows any coarser
+window to be computed from the finer windows without going back to the raw data.
+
+A tier is only read for ranges that are still within it's retention, older ranges use a coarser tier or the raw
+statistics.
+
+.. moduleauthor:: Mitch Schwenk <mitch-gw@yombo.net>
+.. versionadded:: 0.24.0
+
+:copyright: Copyright 2020 by Yombo.
+:license: LICENSE for details.
+:view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/_modules/yombo/lib/statistics/rollups.html>`_
+"""
+from time import time
+from typing import List, Optional, Tuple
+
+# tier size in seconds: retention in seconds, 0 keeps forever. Must be sorted from smallest to largest and each
+# tier must be a multiple of the tier before it.
+ROLLUP_TIERS = {
+    60: 86400 * 2,
+    900: 86400 * 31,
+    3600: 86400 * 400,
+    86400: 0,
+}
+
+# Max number of tier windows computed within a single database transaction.
+ROLLUP_MAX_WINDOWS = 1440
+
+
+def rollup_tier_sizes() -> List[int]:
+    """ Returns the tier sizes, smallest first. """
+    return sorted(ROLLUP_TIERS)
+
+
+def rollup_source_tier(tier: int) -> Optional[int]:
+    """
+    Returns the tier that the given tier is computed from. None means the raw statistics table.
+
+    :param tier: Tier size in seconds.
+    :return: Source tier size, or None.
+    """
+    tiers = rollup_tier_sizes()
+    index = tiers.index(tier)
+    if index == 0:
+        return None
+    return tiers[index - 1]
+
+
+def choose_rollup_tier(bucket_size: int, time_start: Optional[float] = None, time_end: Optional[float] = None,
+                       points: Optional[int] = None, now: Optional[float] = None) -> Tuple[int, Optional[int]]:
+    """
+    Selects the coarsest tier that can still deliver the requested resolution. If a point count is requested, the
+    bucket size is increased so that the range fits within the requested number of points. Tiers that have
+    already purged the start of the range are skipped.
+
+    :param bucket_size: Requested bucket size in seconds.
+    :param time_start: Start of the range.
+    :param time_end: End of the range.
+    :param points: Max number of points wanted.
+    :param now: The current time, used to check the tier retention. Default is the current time.
+    :return: A tuple of the bucket size to use and the tier to read from. The tier is None if no tier fits.
+    """
+    if now is None:
+        now = time()
+    if points is not None and points > 0 and time_start is not None and time_end is not None:
+        bucket_size = max(bucket_size, int((time_end - time_start) // points))
+        # Round up to a tier boundary so the buckets line up with the tier windows.
+        for tier in rollup_tier_sizes():
+            if bucket_size <= tier:
+                bucket_size = tier
+                break
+
+    selected = None
+    for tier in rollup_tier_sizes():
+        retention = ROLLUP_TIERS[tier]
+        if retention > 0 and (time_start or 0) < now - retention:
+            continue
+        if tier <= bucket_size and bucket_size % tier == 0:
+            selected = tier
+    return bucket_size, selected
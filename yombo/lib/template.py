@@ -246,6 +246,28 @@ class JinjaTemplate(object):
         results = yield threads.deferToThread(self._render, variables)
         return results
 
+    def render_now(self, variables=None):
+        """
+        Render the already set template within the current thread and return the results. Used for small,
+        precompiled templates where handing the render off to a thread costs more than the render itself.
+
+        :param variables: Additional values to provide to the template.
+        :return: The rendered template.
+        """
+        if variables is None:
+            variables = {}
+
+        if self._compiled is None:
+            self._ensure_compiled()
+        return self._render(variables)
+
+    def compile(self):
+        """
+        Compile the template now instead of on the first render. Raises YomboWarning if it's invalid.
+        """
+        if self._compiled is None:
+            self._ensure_compiled()
+
     def _render(self, variables):
         """
         Do the actual rendering. This was split up from the previous method so that it can
@@ -19,6 +19,11 @@ above or below the horizon (saturn, moon, sun, etc), and then they will transiti
    times = self._Times
    moonrise = times.item_rise(dayOffset=1, item="Moon") # 1 - we want the next moon rise
 
+Rise and set times for the sun, twilight, and moon are computed ahead of time for the next several days
+(times.ephemeris_days, default 7) in a thread and saved to disk. This is redone every night at midnight. Most
+lookups, such as sunrise(), item_visible(item="Sun"), and is_light are then simple table lookups. Anything not
+covered by the table is computed using ephem directly.
+
 
 .. todo::
 
@@ -34,6 +39,7 @@ above or below the horizon (saturn, moon, sun, etc), and then they will transiti
 :view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/_modules/yombo/lib/times.html>`_
 """
 # Import python libraries
+from bisect import bisect_left, bisect_right
 from calendar import timegm as CalTimegm
 from datetime import datetime, timedelta
 import ephem
@@ -42,7 +48,8 @@ import time
 from typing import Any, ClassVar, Optional, Dict, List
 
 # Import twisted libraries
-from twisted.internet import reactor
+from twisted.internet import reactor, threads
+from twisted.internet.defer import inlineCallbacks
 
 # Import Yombo libraries
 from yombo.core.exceptions import YomboInvalidArgument, YomboHookStopProcessing
@@ -55,6 +62,66 @@ from yombo.utils.hookinvoke import global_invoke_all
 
 logger = get_logger("library.times")
 
+EPHEMERIS_TABLE_VERSION = 1
+
+# Events stored in the ephemeris table: event name: (body, observer, method, use_center)
+# The observer is either "obs" (horizon 0) or "twilight" (times.twilighthorizon).
+EPHEMERIS_EVENTS = {
+    "sunrise": ("Sun", "obs", "next_rising", False),
+    "sunset": ("Sun", "obs", "next_setting", False),
+    "twilight_rise": ("Sun", "twilight", "next_rising", True),
+    "twilight_set": ("Sun", "twilight", "next_setting", True),
+    "moonrise": ("Moon", "obs", "next_rising", False),
+    "moonset": ("Moon", "obs", "next_setting", False),
+}
+
+
+def compute_ephemeris_table(location: list, start: float, end: float) -> dict:
+    """
+    Computes the rise and set times for the sun, twilight, and moon between start and end. This is CPU heavy
+    and is meant to be called within a thread.
+
+    :param location: List of latitude, longitude, elevation, twilight horizon.
+    :param start: Timestamp to start from.
+    :param end: Timestamp to end at.
+    :return: A dictionary of event names, each a sorted list of timestamps.
+    """
+    latitude, longitude, elevation, twilight_horizon = location
+    observers = {}
+    for observer_type in ("obs", "twilight"):
+        observer = ephem.Observer()
+        observer.lat = str(latitude)
+        observer.lon = str(longitude)
+        observer.elevation = int(elevation)
+        if observer_type == "twilight":
+            observer.horizon = str(twilight_horizon)
+        observers[observer_type] = observer
+
+    start_date = ephem.Date(datetime.utcfromtimestamp(start))
+    end_date = ephem.Date(datetime.utcfromtimestamp(end))
+    table = {
+        "version": EPHEMERIS_TABLE_VERSION,
+        "location": location,
+        "start": start,
+        "end": end,
+    }
+    for event_name, (body, observer_type, method, use_center) in EPHEMERIS_EVENTS.items():
+        observer = observers[observer_type]
+        observer.date = start_date
+        event_times = []
+        while observer.date < end_date:
+            try:
+                event = getattr(observer, method)(getattr(ephem, body)(), use_center=use_center)
+            except (ephem.AlwaysUpError, ephem.NeverUpError):
+                observer.date += 1  # Polar day or night, try the next day.
+                continue
+            if event > end_date:
+                break
+            event_times.append(CalTimegm(event.tuple()))
+            observer.date = event + ephem.minute
+        table[event_name] = event_times
+    return table
+
 
 class Times(YomboLibrary):
     """
@@ -63,7 +130,9 @@ class Times(YomboLibrary):
     """
     obs: ClassVar = None
     obsTwilight: ClassVar = None
+    ephemeris: ClassVar[Optional[dict]] = None  # Precomputed rise/set times, see compute_ephemeris_table()
 
+    @inlineCallbacks
     def _init_(self, test_environment: Optional[bool] = False):
         """
         Setup various common objects, setup frame work if isday/night/dark/twilight.
@@ -75,6 +144,10 @@ class Times(YomboLibrary):
             self.runned_for_tests()
 
         self.setup_obs()
+        self.ephemeris_path = f"{self._working_dir}/etc/ephemeris.json"
+        self.ephemeris_days = int(self._Configs.get("times.ephemeris_days", 7))
+        if not test_environment:
+            yield self.load_ephemeris()
 
         self.is_now_init = True
         self._setup_light_dark_events()
@@ -98,6 +171,95 @@ class Times(YomboLibrary):
         self.obsTwilight.lon = str(self._Configs.get("location.longitude", -121.493259))
         self.obsTwilight.elevation = int(self._Configs.get("location.elevation", 800))
 
+    def ephemeris_location(self) -> list:
+        """ Returns the location settings that the ephemeris table is computed for. """
+        return [
+            str(self._Configs.get("location.latitude", 38.576694)),
+            str(self._Configs.get("location.longitude", -121.493259)),
+            int(self._Configs.get("location.elevation", 800)),
+            str(self._Configs.get("times.twilighthorizon", "-6")),
+        ]
+
+    @inlineCallbacks
+    def load_ephemeris(self):
+        """
+        Loads the ephemeris table from disk. If it's missing, for a different location, or doesn't cover
+        the next day, it's computed again.
+        """
+        cur_time = time.time()
+        try:
+            table = yield self._Files.read(self.ephemeris_path, unpickle="json")
+        except Exception as e:
+            logger.debug("Unable to read ephemeris table, will create a new one: {e}", e=e)
+            table = None
+
+        if isinstance(table, dict) and table.get("version") == EPHEMERIS_TABLE_VERSION and \
+                table.get("location") == self.ephemeris_location() and \
+                table["start"] <= cur_time - 86400 and table["end"] >= cur_time + 86400:
+            self.ephemeris = table
+            self._CallLater.new(dt.get_next_time("12:00am")[0] - cur_time, self.update_ephemeris)
+        else:
+            yield self.update_ephemeris()
+
+    @inlineCallbacks
+    def update_ephemeris(self):
+        """
+        Computes the ephemeris table in a thread, starting 2 days ago so previous rise and set times are
+        available. Saves it to disk and schedules the next update for midnight.
+        """
+        cur_time = time.time()
+        try:
+            self.ephemeris = yield threads.deferToThread(compute_ephemeris_table,
+                                                         self.ephemeris_location(),
+                                                         cur_time - 86400 * 2,
+                                                         cur_time + 86400 * self.ephemeris_days)
+            yield self._Files.save(self.ephemeris_path, self._Tools.data_pickle(self.ephemeris, "json"))
+        except Exception as e:
+            logger.warn("Unable to update ephemeris table: {e}", e=e)
+        self._CallLater.new(dt.get_next_time("12:00am")[0] - time.time(), self.update_ephemeris)
+
+    def ephemeris_next(self, event: str, after: Optional[float] = None) -> Optional[float]:
+        """
+        Returns the first time of an event after the provided timestamp, using the ephemeris table. Returns None
+        if the table doesn't cover the requested time.
+
+        :param event: One of the EPHEMERIS_EVENTS, such as "sunrise".
+        :param after: Timestamp, default is now.
+        """
+        table = self.ephemeris
+        if table is None:
+            return None
+        if after is None:
+            after = time.time()
+        if after < table["start"]:
+            return None
+        event_times = table[event]
+        index = bisect_right(event_times, after)
+        if index >= len(event_times):
+            return None
+        return event_times[index]
+
+    def ephemeris_previous(self, event: str, before: Optional[float] = None) -> Optional[float]:
+        """
+        Returns the last time of an event before the provided timestamp, using the ephemeris table. Returns None
+        if the table doesn't cover the requested time.
+
+        :param event: One of the EPHEMERIS_EVENTS, such as "sunrise".
+        :param before: Timestamp, default is now.
+        """
+        table = self.ephemeris
+        if table is None:
+            return None
+        if before is None:
+            before = time.time()
+        if before > table["end"]:
+            return None
+        event_times = table[event]
+        index = bisect_left(event_times, before) - 1
+        if index < 0:
+            return None
+        return event_times[index]
+
     @property
     def next_new_moon(self):
         return self._timegm(ephem.next_new_moon(datetime.now()))
@@ -437,8 +599,14 @@ class Times(YomboLibrary):
             obj = getattr(ephem, item)
         except AttributeError:
             raise AttributeError(f"PyEphem doesn't have requested item: {item}")
-        self.obs.date = datetime.utcnow()
 
+        if item in ("Sun", "Moon"):
+            previous_rising = self.ephemeris_previous(f"{item.lower()}rise")
+            previous_setting = self.ephemeris_previous(f"{item.lower()}set")
+            if previous_rising is not None and previous_setting is not None:
+                return previous_rising >= previous_setting
+
+        self.obs.date = datetime.utcnow()
         if self._timegm(self._previous_rising(self.obs, obj())) < self._timegm(self._previous_setting(self.obs, obj())):
             return False
         else:
@@ -477,6 +645,12 @@ class Times(YomboLibrary):
             obj = getattr(ephem, item)
         except AttributeError:
             raise AttributeError(f"PyEphem doesn't have requested item: {item}")
+
+        if item in ("Sun", "Moon"):
+            results = self.ephemeris_next(f"{item.lower()}rise", time.time() + dayOffset * 86400)
+            if results is not None:
+                return results
+
         self.obs.date = datetime.utcnow() + timedelta(days=dayOffset)
         temp = self._next_rising(self.obs, obj())
         return self._timegm(temp)
@@ -511,6 +685,12 @@ class Times(YomboLibrary):
             obj = getattr(ephem, item)
         except AttributeError:
             raise AttributeError(f"PyEphem doesn't have requested item: {item}")
+
+        if item in ("Sun", "Moon"):
+            results = self.ephemeris_next(f"{item.lower()}set", time.time() + dayOffset * 86400)
+            if results is not None:
+                return results
+
         # we want the date part only, but date.today() isn't UTC.
         self.obs.date = datetime.utcnow() + timedelta(days=dayOffset)
 
@@ -565,6 +745,11 @@ class Times(YomboLibrary):
         except AttributeError:
             raise AttributeError(f"PyEphem doesn't have requested item: {item}")
 
+        if item == "Sun":
+            results = self.ephemeris_next("twilight_rise", time.time() + dayOffset * 86400)
+            if results is not None:
+                return results
+
         self.obsTwilight.date = datetime.utcnow() + timedelta(days=dayOffset)
         temp = self._next_rising(self.obsTwilight, obj(), use_center=True)
         return self._timegm(temp)
@@ -591,6 +776,11 @@ class Times(YomboLibrary):
         except AttributeError:
             raise AttributeError(f"PyEphem doesn't have requested item: {item}")
 
+        if item == "Sun":
+            results = self.ephemeris_next("twilight_set", time.time() + dayOffset * 86400)
+            if results is not None:
+                return results
+
         # we want the date part only, but date.today() isn't UTC.
         dt = datetime.utcnow() + timedelta(days=dayOffset)
         self.obsTwilight.date = dt
@@ -932,6 +1122,11 @@ class Times(YomboLibrary):
         So the TWILIGHT events occur when (N(set)>N(rise) AND  N(Tset)<N(Trise))
         This condition should work on polar day/night also.
         """
+        next_events = [self.ephemeris_next(event) for event in ("twilight_set", "twilight_rise", "sunset", "sunrise")]
+        if None not in next_events:
+            self.is_twilight = next_events[0] < next_events[1] and next_events[2] > next_events[3]
+            return
+
         self.obs.date = datetime.utcnow()
         self.obsTwilight.date = datetime.utcnow()
 
@@ -946,6 +1141,13 @@ class Times(YomboLibrary):
         """
         Sets the is_light and is_dark vars.  It's light if the sun is up and it's twilight.
         """
+        previous_rising = self.ephemeris_previous("twilight_rise")
+        previous_setting = self.ephemeris_previous("twilight_set")
+        if previous_rising is not None and previous_setting is not None:
+            self.is_light = previous_rising >= previous_setting
+            self.is_dark = not self.is_light
+            return
+
         self.obs.date = datetime.utcnow()
         self.obsTwilight.date = datetime.utcnow()
         #logger.info("is_light: %s < %s", self._previous_rising(self.obsTwilight,ephem.Sun(),use_center=True),
@@ -962,6 +1164,13 @@ class Times(YomboLibrary):
         """
         Sets up is_day and is_night. Is day if the sun is not below horizon.
         """
+        previous_rising = self.ephemeris_previous("sunrise")
+        previous_setting = self.ephemeris_previous("sunset")
+        if previous_rising is not None and previous_setting is not None:
+            self.is_day = previous_rising >= previous_setting
+            self.is_night = not self.is_day
+            return
+
         self.obs.date = datetime.utcnow()
         self.obsTwilight.date = datetime.utcnow()
         if self._previous_rising(self.obs, ephem.Sun()) < self._previous_setting(self.obs, ephem.Sun()):
@@ -110,6 +110,7 @@ def route_api_v1_devices(webapp):
                     if DC.status_id >= 100:
                         exit_while = True
 
+            yield webinterface._DeviceStates.load_history(device)
             if len(device.state_history) > 0:
                 status_current = device.state_history[0].to_dict(include_meta=False)
             else:
@@ -40,6 +40,7 @@ def route_api_v1_statistics(webapp):
             stat_type = request.args.get("stat_type", [None, ])
             stat_name = request.args.get("stat_name", [None, ])
             bucket_size = request.args.get("bucket_size", [3600, ])
+            points = request.args.get("points", [None, ])[0]
             if chart_label is None:
                 chart_label = stat_name
             try:
@@ -68,6 +69,14 @@ def route_api_v1_statistics(webapp):
             if my_time_start is None:
                 return return_error(request, f"'time_start' not included for stat: {stat_name}")
 
+            if points is not None:
+                try:
+                    points = int(points)
+                except Exception:
+                    return return_error(request, "'points' must be an int and must be greater than 0")
+                if points < 1:
+                    return return_error(request, "'points' must be an int and must be greater than 0")
+
             try:
                 if time_end is not None:
                     if not isinstance(time_end, int) or time_end < 0:
@@ -142,12 +151,13 @@ def route_api_v1_statistics(webapp):
                 except Exception as e:
                     my_bucket_size = bucket_size
 
-                records = yield webinterface._LocalDB.database.get_stats_sums(my_stat_name,
-                                                                                  bucket_size=my_bucket_size,
-                                                                                  bucket_type=my_stat_type,
-                                                                                  time_start=my_time_start,
-                                                                                  time_end=my_time_end,
-                                                                                  )
+                records = yield webinterface._LocalDB.get_stats_sums(my_stat_name,
+                                                                     bucket_size=my_bucket_size,
+                                                                     bucket_type=my_stat_type,
+                                                                     time_start=my_time_start,
+                                                                     time_end=my_time_end,
+                                                                     points=points,
+                                                                     )
 
                 labels = []
                 data = []
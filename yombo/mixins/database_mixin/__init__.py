@@ -15,10 +15,8 @@ to migration files compatible with YoYo.  See 'lib/localdb/migrations' path for
 :view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/_modules/yombo/classes/database/__init__.html>`_
 """
 # Import python libraries
-from copy import deepcopy
 import traceback
-from typing import Any, ClassVar, Dict, Optional, Type
-from sqlite3 import IntegrityError
+from typing import ClassVar, Dict, Optional, Type
 import sys
 
 # Import twisted libraries
@@ -28,7 +26,7 @@ from twisted.internet.task import LoopingCall
 # Import Yombo libraries
 from yombo.core.exceptions import YomboCritical
 from yombo.core.log import get_logger
-from yombo.utils import sleep
+from yombo.mixins.database_mixin.write_behind import WriteBehindQueue
 from yombo.utils.decorators import cached
 
 logger = get_logger("mixins.database")
@@ -56,13 +54,10 @@ class DatabaseMixin:
             raise YomboCritical("Only sqlite, mariabdb, or mysql databases are currently supported.")
 
         self.database = None  # Reference to the database connection.
-        self.db_bulk_queue: Dict[str, Any] = {}
-        self.db_bulk_queue_id_cols: Dict[str, Any] = {}
+        self.db_write_queue = None  # Write behind queue, used by add_bulk_queue().
         self.db_pool = None
         self.db_model: Dict[str, dict] = {}  # store generated database model here.
 
-        self.db_save_bulk_queue_running = False
-        self.db_save_bulk_queue_run_again = False
         self.db_save_bulk_queue_loop = None
         self.db_cleanup_loop = None
         self.db_cleanup_running = False
@@ -97,17 +92,21 @@ class DatabaseMixin:
         self.db_pool = self.database.db_pool  # to be removed in future
         self.db_model = yield maybeDeferred(self.database.db_generate_model)
         # print(f"self.db_model: {self.db_model}")
-        self.db_save_bulk_queue_loop = LoopingCall(self.db_save_bulk_queue, slow=True)
-        self.db_save_bulk_queue_loop.start(5, False)
+        self.db_write_queue = WriteBehindQueue(self.database,
+                                               max_pending=self._Configs.get("database.write_max_pending", 2000),
+                                               max_age=self._Configs.get("database.write_max_age", 5))
+        self.db_save_bulk_queue_loop = LoopingCall(self.db_write_queue.check_age)
+        self.db_save_bulk_queue_loop.start(1, False)
         self._CronTab.new(self.database.db_cleanup, mins=0, hours=3,  # Clean database at 3am every day.
                           label="Periodically clean the database.",
                           load_source="system")
 
     @inlineCallbacks
     def _unload_(self, **kwargs):
-        yield self.db_save_bulk_queue()
         if self.db_save_bulk_queue_loop is not None and self.db_save_bulk_queue_loop.running:
             self.db_save_bulk_queue_loop.stop()
+        yield self.db_save_bulk_queue()
+        yield maybeDeferred(self.database.db_unload)
 
     ########################
     # Basic SQL Operations #
@@ -182,6 +181,36 @@ class DatabaseMixin:
         results = yield self.database.db_insert(*args, **kwargs)
         return results
 
+    @inlineCallbacks
+    def db_insert_many(self, *args, **kwargs):
+        """
+        Insert a list of records into a table using executemany, within a single transaction.
+
+        :param table: Table to insert records into.
+        :type table: str
+        :param rows: A list of dictionaries of values to insert.
+        :type rows: List[dict]
+        :param prefix: Insert prefix, such as "OR IGNORE".
+        :type prefix: str
+        """
+        results = yield self.database.db_insert_many(*args, **kwargs)
+        return results
+
+    @inlineCallbacks
+    def db_upsert_many(self, *args, **kwargs):
+        """
+        Insert a list of records into a table, updating any existing records with the same key.
+
+        :param table: Table to insert records into.
+        :type table: str
+        :param rows: A list of dictionaries of values to insert.
+        :type rows: List[dict]
+        :param key_columns: Column name (or list of column names) of the unique key.
+        :type key_columns: str, List[str]
+        """
+        results = yield self.database.db_upsert_many(*args, **kwargs)
+        return results
+
     @inlineCallbacks
     def db_select(self, *args, **kwargs):
         """
@@ -205,6 +234,20 @@ class DatabaseMixin:
         results = yield self.database.db_select(*args, **kwargs)
         return results
 
+    @inlineCallbacks
+    def db_select_query(self, *args, **kwargs):
+        """
+        Run a complete SELECT query, using the read only connection pool if available.
+
+        results = yield db_select_query("SELECT * FROM some_table WHERE label = ?", ["mylabel"])
+
+        :param query: The query string, using ? for variable placeholders.
+        :param args: A list of arguments for the placeholders.
+        :return: A list of dictionaries.
+        """
+        results = yield self.database.db_select_query(*args, **kwargs)
+        return results
+
     @inlineCallbacks
     def db_truncate(self, *args, **kwargs):
         """
@@ -238,7 +281,7 @@ class DatabaseMixin:
     @inlineCallbacks
     def db_update_many(self, *args, **kwargs):
         """
-        Update a bunch of records. Currently, this just iterates the values in 'the_items' and calls db_update.
+        Update a bunch of records. Uses executemany within a single transaction.
 
         :param table: Table to update records.
         :type table: str
@@ -291,121 +334,29 @@ class DatabaseMixin:
 
         add_bulk_queue("statistics", "insert", {"colname": "data1", "colname2": "data2"})
 
+        Changes are coalesced by the id column and saved later in a single transaction, see
+        :py:class:`WriteBehindQueue <yombo.mixins.database_mixin.write_behind.WriteBehindQueue>`.
+
         :param table: The table to interact with.
         :param queue_type: One of: insert, update, or delete
         :param data: A dictionary of data items. This must be the complete record to update.
         :param id_col: Which column within the table to use for the ID row.
-        :param insert_blind:
+        :param insert_blind: If true, the insert isn't coalesced with other changes to the same id.
         :return:
         """
         if table not in self.db_model:
             raise KeyError(f"Table '{table}' doesn't exist in 'add_bulk_queue'.")
-        if id_col is None:
-            id_col = "id"
-        self.db_bulk_queue_id_cols[table] = id_col
-
         if queue_type not in ("update", "insert", "delete"):
             return
-        if table not in self.db_bulk_queue:
-            self.db_bulk_queue[table] = {
-                "insert": {},
-                "insert_blind": [],
-                "update": {},
-                "delete": [],
-            }
-
-        # print(f"add_bulk_queue, data: {table} - {queue_type} - {data}")
-        if queue_type == "insert":
-            if insert_blind is True:
-                self.db_bulk_queue[table]["insert_blind"].append(data)
-            else:
-                self.db_bulk_queue[table]["insert"][data["id"]] = data
-        elif queue_type == "update":
-            # Check if item exists in the insert first, just update that. Less DB work.
-            if table in self.db_bulk_queue and data["id"] in self.db_bulk_queue[table]["insert"]:
-                # print("add_bulk_queue - update, going to change update to insert")
-                for key, value in data.items():
-                    self.db_bulk_queue[table]["insert"][data["id"]][key] = value
-            else:
-                if data["id"] in self.db_bulk_queue[table]["update"]:
-                    for key, value in data.items():
-                        self.db_bulk_queue[table]["update"][data["id"]][key] = value
-                elif data["id"] in self.db_bulk_queue[table]["update"]:
-                    for key, value in data.items():
-                        self.db_bulk_queue[table]["update"][data["id"]][key] = value
-                else:
-                    self.db_bulk_queue[table]["update"][data["id"]] = data
-        elif queue_type == "delete":
-            self.db_bulk_queue[table]["delete"].append(data["id"])
+        self.db_write_queue.add(table, queue_type, data, id_column=id_col, insert_blind=insert_blind)
 
-    @inlineCallbacks
     def db_save_bulk_queue(self, slow: Optional[bool] = None):
         """
-        Saves the bulk data to the database.
+        Saves the bulk data to the database, within a single transaction.
 
-        :param slow: If true, sleeps 1 second between tables to give the system breathing room.
-        :return:
+        :param slow: Not used, kept for compatibility.
+        :return: A deferred.
         """
-        if len(self.db_bulk_queue) == 0:
-            return
-
-        if self.db_save_bulk_queue_running == True:
-            self.db_save_bulk_queue_run_again = True
+        if self.db_write_queue is None:
             return
-        self.db_save_bulk_queue_running = True
-        # print("saving bulk data: %s" % self.db_bulk_queue)
-        for table in list(self.db_bulk_queue):
-            # print("saving bulk table: %s" % table)
-            table_data = deepcopy(self.db_bulk_queue[table])
-            del self.db_bulk_queue[table]
-
-            for queue_type in table_data.keys():
-                if len(table_data[queue_type]) > 0:
-                    data_values = table_data[queue_type].copy()
-                    table_data[queue_type].clear()
-                    if queue_type == "insert":
-                        save_data = []
-                        for key, value in data_values.items():
-                            save_data.append(value)
-                        try:
-                            # print(f"save bulk queue, type {queue_type}, table: {table}, data: {save_data}")
-                            yield self.db_insert(table, save_data)
-                            yield sleep(0.01)
-                        except IntegrityError as e:
-                            logger.warn("Error trying to insert in bulk save: {e}", e=e)
-                            logger.warn("Table: {table}, data: {save_data}", table=table, save_data=save_data)
-                    elif queue_type == "insert_blind":
-                        save_data = []
-                        for data in data_values:
-                            save_data.append(data)
-                        try:
-                            # print(f"save bulk queue, type {queue_type}, table: {table}, data: {save_data}")
-                            yield self.db_insert(table, save_data)
-                            yield sleep(0.01)
-                        except IntegrityError as e:
-                            logger.warn("Error trying to insert_blind in bulk save: {e}", e=e)
-                            logger.warn("Table: {table}, data: {save_data}", table=table, save_data=save_data)
-                    elif queue_type == "update":
-                        save_data = []
-                        for key, value in data_values.items():
-                            save_data.append(value)
-                        try:
-                            # print(f"save bulk queue, type {queue_type}, table: {table}, data: {save_data}")
-                            yield self.db_update_many(table, save_data, self.db_bulk_queue_id_cols[table])
-                            yield sleep(0.01)
-                        except IntegrityError as e:
-                            logger.warn("Error trying to update_many in bulk save: {e}", e=e)
-                            logger.warn("Table: {table}, data: {save_data}", table=table, save_data=save_data)
-                    elif queue_type == "delete":
-                        try:
-                            # print(f"save bulk queue, type {queue_type}, table: {table}, data: {save_data}")
-                            yield self.db_delete_many(table, data_values)
-                            yield sleep(0.01)
-                        except IntegrityError as e:
-                            logger.warn("Error trying to delete_many in bulk save: {e}", e=e)
-                            logger.warn("Table: {table}, data: {save_data}", table=table, save_data=save_data)
-
-        self.db_save_bulk_queue_running = False
-        if self.db_save_bulk_queue_run_again is True:
-            self.db_save_bulk_queue_run_again = False
-            yield self.db_save_bulk_queue()
\ No newline at end of file
+        return self.db_write_queue.flush()
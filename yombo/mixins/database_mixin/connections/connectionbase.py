@@ -39,11 +39,19 @@ class ConnectionBase(Entity):
         self.variable_placeholder: ClassVar[str] = "%s"
         self.db_cleanup_running: ClassVar[bool] = False
         self.db_pool: ClassVar = None
+        self.db_read_pool: ClassVar = None  # Optional pool for read only queries, if the connection supports it.
 
     def init(self) -> None:
         """ Setup the database connection. """
         raise NotImplemented
 
+    def db_unload(self) -> None:
+        """
+        Called when the gateway is shutting down, after the pending writes have been saved. Stop any timers
+        that use the connection here.
+        """
+        pass
+
     def db_list_tables(self) -> List[str]:
         """
         Gets a list of all tables within the database.
@@ -80,6 +80,27 @@ class MySQL(SQLBase):
         except Exception as e:
             raise YomboWarning(f"Error connecting to mysql/mariadb database: {e}")
 
+    def upsert_statement(self, table: str, columns: tuple, key_columns: tuple) -> str:
+        """
+        Returns an insert statement that updates the existing row on a duplicate key. MySQL uses the unique
+        indexes of the table, so key_columns is only used to know which columns not to update.
+
+        :param table: Table name.
+        :param columns: Tuple of column names.
+        :param key_columns: Tuple of the unique key column names.
+        :return: The SQL statement.
+        """
+        cache_key = ("upsert", table, columns, key_columns)
+        if cache_key not in self._statement_cache:
+            update_columns = [column for column in columns if column not in key_columns]
+            if len(update_columns) == 0:
+                query = self.insert_statement(table, columns, "IGNORE")
+            else:
+                query = self.insert_statement(table, columns) + " ON DUPLICATE KEY UPDATE " + \
+                    ",".join([f"{column} = VALUES({column})" for column in self.escape_col_names(update_columns)])
+            self._statement_cache[cache_key] = query
+        return self._statement_cache[cache_key]
+
     @inlineCallbacks
     def db_list_tables(self) -> List[str]:
         """
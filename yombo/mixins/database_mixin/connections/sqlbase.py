@@ -19,7 +19,6 @@ from twisted.internet import threads
 from twisted.internet.defer import inlineCallbacks, maybeDeferred
 
 from yombo.core.log import get_logger
-from yombo.core.exceptions import YomboWarning
 from yombo.mixins.database_mixin.connections.connectionbase import ConnectionBase
 from yombo.utils import sleep, bytes_to_unicode
 
@@ -33,6 +32,7 @@ class SQLBase(ConnectionBase):
     def __init__(self, parent, *args, **kwargs):
         super().__init__(parent, *args, **kwargs)
         self.variable_placeholder: ClassVar[str] = "%s"
+        self._statement_cache: Dict[tuple, str] = {}  # Bulk statements, by (type, table, columns) shape.
 
     @inlineCallbacks
     def init(self) -> None:
@@ -155,45 +155,216 @@ class SQLBase(ConnectionBase):
 
         yield self._LocalDB.database.db_insert("events", data)
 
+        A list of dictionaries is inserted using executemany within one transaction, use db_insert_many() to get
+        the number of rows instead of the last row id.
+
         :param table: Table to insert a row into.
         :param vals: A dictionary or list of dictionaries of values to insert.
         :param txn: If txn is given it will be used for the query, otherwise a typical runQuery will be used
-        :return: A Deferred that calls a callback with the id of new row.
+        :param prefix: Insert prefix, such as "OR IGNORE" or "OR REPLACE".
+        :return: A Deferred that calls a callback with the id of new row, the last row for a list.
         """
         if len(vals) == 0:
             logger.info("sql insert for table '{table}' received no values, skipping.", table=table)
             return
 
-        params, values = self.create_insert_segments(vals)
-        if params is None:
-            logger.info("sql insert for table '{table}' has no values, skipping.", table=table)
-            return
-
-        if isinstance(vals, dict):
-            escaped_colnames = self.escape_col_names(vals.keys())
-        elif isinstance(vals, list):
-            escaped_colnames = self.escape_col_names(vals[0].keys())
-
-        colnames = "(" + ",".join(escaped_colnames) + ")"
-        params = f"VALUES {params}"
+        if isinstance(vals, list):
+            batches = [(self.insert_statement(table, columns, prefix), values)
+                       for columns, values in self.group_rows_by_columns(vals).items()]
+            if len(batches) == 0:
+                logger.info("sql insert for table '{table}' has no values, skipping.", table=table)
+                return
+            # executemany doesn't set the last row id, so the last row is inserted on it's own.
+            last_query, values = batches[-1]
+            batches[-1] = (last_query, values[:-1])
+            last_values = values[-1]
+
+            def _insert_many(txn):
+                self.execute_batches(txn, batches)
+                self.execute_transaction(txn, last_query, last_values)
+                return self.get_last_insert_id(txn)
+
+            if txn is not None:
+                return _insert_many(txn)
+            results = yield self.run_interaction(_insert_many)
+            return results
 
-        insert_prefix = ''
-        if prefix is not None:
-            insert_prefix = ' ' + prefix + ' '
-        query = f"INSERT {insert_prefix} INTO {table} {colnames} {params}"
+        query = self.insert_statement(table, tuple(vals.keys()), prefix)
+        values = list(vals.values())
 
         # if we have a transaction use it
         if txn is not None:
-            yield self.execute_transaction(txn, query, list(values))
+            yield self.execute_transaction(txn, query, values)
             return self.get_last_insert_id(txn)
 
-        def _insert(txn, query, vals):
-            self.execute_transaction(txn, query, list(values))
+        def _insert(txn, query, values):
+            self.execute_transaction(txn, query, values)
             return self.get_last_insert_id(txn)
 
-        results = yield self.run_interaction(_insert, query, vals)
+        results = yield self.run_interaction(_insert, query, values)
+        return results
+
+    def db_insert_many(self, table: str, rows: List[dict], txn=None, prefix: Optional[str] = None):
+        """
+        Insert many rows using executemany. Rows are grouped by their column names, each group is a single
+        statement. Everything is done within one transaction.
+
+        :param table: Table to insert rows into.
+        :param rows: A list of dictionaries.
+        :param txn: If txn is given it will be used, otherwise a new interaction is started.
+        :param prefix: Insert prefix, such as "OR IGNORE" or "OR REPLACE".
+        :return: A Deferred that calls a callback with the number of rows submitted.
+        """
+        batches = [(self.insert_statement(table, columns, prefix), values)
+                   for columns, values in self.group_rows_by_columns(rows).items()]
+        return self.db_execute_batches(batches, txn)
+
+    def db_upsert_many(self, table: str, rows: List[dict], key_columns: Union[str, List[str]], txn=None):
+        """
+        Insert many rows, updating the existing row if the key columns conflict with an existing row. The
+        key columns must have a unique index.
+
+        :param table: Table to insert rows into.
+        :param rows: A list of dictionaries.
+        :param key_columns: A column name, or list of column names, of the unique key.
+        :param txn: If txn is given it will be used, otherwise a new interaction is started.
+        :return: A Deferred that calls a callback with the number of rows submitted.
+        """
+        if isinstance(key_columns, str):
+            key_columns = [key_columns]
+        batches = [(self.upsert_statement(table, columns, tuple(key_columns)), values)
+                   for columns, values in self.group_rows_by_columns(rows).items()]
+        return self.db_execute_batches(batches, txn)
+
+    @staticmethod
+    def group_rows_by_columns(rows: List[dict], where_column: Optional[str] = None) -> Dict[tuple, List[list]]:
+        """
+        Groups rows by the column names they have. Returns a dictionary of column names tuple: list of value lists.
+        If where_column is provided, it's removed from the column names and it's value is added to the end of
+        each value list. This is the form needed for UPDATE ... WHERE where_column = ?.
+
+        :param rows: A list of dictionaries.
+        :param where_column: Optional column to move to the end.
+        :return: Dictionary of grouped values.
+        """
+        results = {}
+        for row in rows:
+            if len(row) == 0:
+                continue
+            if where_column is None:
+                columns = tuple(row.keys())
+                values = list(row.values())
+            else:
+                columns = tuple(key for key in row.keys() if key != where_column)
+                values = [row[key] for key in columns]
+                values.append(row[where_column])
+            if columns not in results:
+                results[columns] = []
+            results[columns].append(values)
         return results
 
+    def insert_statement(self, table: str, columns: tuple, prefix: Optional[str] = None) -> str:
+        """
+        Returns an INSERT statement for the table and columns. Statements are cached by shape.
+
+        :param table: Table name.
+        :param columns: Tuple of column names.
+        :param prefix: Insert prefix, such as "OR IGNORE" or "OR REPLACE".
+        :return: The SQL statement.
+        """
+        cache_key = ("insert", table, columns, prefix)
+        if cache_key not in self._statement_cache:
+            colnames = ",".join(self.escape_col_names(columns))
+            placeholders = ",".join([self.variable_placeholder] * len(columns))
+            insert_prefix = f" {prefix} " if prefix is not None else " "
+            self._statement_cache[cache_key] = f"INSERT{insert_prefix}INTO {table} ({colnames}) VALUES ({placeholders})"
+        return self._statement_cache[cache_key]
+
+    def update_statement(self, table: str, columns: tuple, where_column: str) -> str:
+        """
+        Returns an UPDATE statement that updates the columns for a single row. Statements are cached by shape.
+
+        :param table: Table name.
+        :param columns: Tuple of column names to update.
+        :param where_column: Column used to select the row.
+        :return: The SQL statement.
+        """
+        cache_key = ("update", table, columns, where_column)
+        if cache_key not in self._statement_cache:
+            set_string = ",".join([f"{column} = {self.variable_placeholder}"
+                                   for column in self.escape_col_names(columns)])
+            self._statement_cache[cache_key] = \
+                f"UPDATE {table} SET {set_string} WHERE {where_column} = {self.variable_placeholder}"
+        return self._statement_cache[cache_key]
+
+    def upsert_statement(self, table: str, columns: tuple, key_columns: tuple) -> str:
+        """
+        Returns an insert statement that updates the existing row on a key conflict. Statements are cached by
+        shape. This is the SQLite/PostgreSQL form, other databases must override this.
+
+        :param table: Table name.
+        :param columns: Tuple of column names.
+        :param key_columns: Tuple of the unique key column names.
+        :return: The SQL statement.
+        """
+        cache_key = ("upsert", table, columns, key_columns)
+        if cache_key not in self._statement_cache:
+            update_columns = [column for column in columns if column not in key_columns]
+            query = self.insert_statement(table, columns) + \
+                f" ON CONFLICT({','.join(self.escape_col_names(key_columns))}) DO "
+            if len(update_columns) == 0:
+                query += "NOTHING"
+            else:
+                query += "UPDATE SET " + ",".join([f"{column} = excluded.{column}"
+                                                   for column in self.escape_col_names(update_columns)])
+            self._statement_cache[cache_key] = query
+        return self._statement_cache[cache_key]
+
+    def delete_statement(self, table: str, where_column: str) -> str:
+        """
+        Returns a DELETE statement that deletes a single row. Statements are cached by shape.
+
+        :param table: Table name.
+        :param where_column: Column used to select the row.
+        :return: The SQL statement.
+        """
+        cache_key = ("delete", table, where_column)
+        if cache_key not in self._statement_cache:
+            self._statement_cache[cache_key] = f"DELETE FROM {table} WHERE {where_column} = {self.variable_placeholder}"
+        return self._statement_cache[cache_key]
+
+    @inlineCallbacks
+    def db_execute_batches(self, batches: List[tuple], txn=None):
+        """
+        Runs a list of (query, list of values) using executemany, all within a single transaction.
+
+        :param batches: List of tuples: query, list of value lists.
+        :param txn: If txn is given it will be used, otherwise a new interaction is started.
+        :return: The number of rows submitted.
+        """
+        if len(batches) == 0:
+            return 0
+        if txn is not None:
+            return self.execute_batches(txn, batches)
+        results = yield self.run_interaction(self.execute_batches, batches)
+        return results
+
+    @staticmethod
+    def execute_batches(txn, batches: List[tuple]) -> int:
+        """
+        Runs a list of (query, list of values) using executemany within the given transaction.
+
+        :param txn: A transaction pointer.
+        :param batches: List of tuples: query, list of value lists.
+        :return: The number of rows submitted.
+        """
+        count = 0
+        for query, values in batches:
+            if len(values):
+                txn.executemany(query, values)
+                count += len(values)
+        return count
+
     @inlineCallbacks
     def db_select(self, table: str, columns: Optional[str] = None, where: Optional[Union[list, dict, str]] = None,
                   groupby: Optional[str] = None, limit: Optional[int] = None, offset: Optional[int] = None,
@@ -249,12 +420,32 @@ class SQLBase(ConnectionBase):
 
         # print(f"sqlbase, select, query: {query} - {args}")
         cache_hash = sha224(f"{table}:{columns}".encode()).digest()
-        results = yield self.run_interaction(self._do_select, query, args, return_one, cache_hash)
+        results = yield self.run_read_interaction(self._do_select, query, args, return_one, cache_hash)
         if to_unicode is not False:
             return bytes_to_unicode(results)
         else:
             return results
 
+    @inlineCallbacks
+    def db_select_query(self, query: str, args: Optional[list] = None, to_unicode: Optional[bool] = None):
+        """
+        Run a complete SELECT query, such as one with sub queries or window functions, using the read only
+        pool if available.
+
+        results = yield db_select_query("SELECT * FROM some_table WHERE label = ?", ["mylabel"])
+
+        :param query: The query string, using ? for variable placeholders.
+        :param args: A list of arguments for the placeholders.
+        :param to_unicode: Coverts results to unicode. Default is True
+        :return: A list of dictionaries.
+        """
+        query = query.replace("?", self.variable_placeholder)
+        cache_hash = sha224(query.encode()).digest()
+        results = yield self.run_read_interaction(self._do_select, query, args or [], False, cache_hash)
+        if to_unicode is not False:
+            return bytes_to_unicode(results)
+        return results
+
     def _do_select(self, txn, query: str, args: list, return_one: bool, cache_hash: str):
         """
         Does the actual select in a transaction. This gets the raw database and then converts it to a more usable
@@ -334,21 +525,24 @@ class SQLBase(ConnectionBase):
         results = yield self.run_operation(query, args)
         return results
 
-    @inlineCallbacks
-    def db_update_many(self, table: str, the_items: list, where_column: Optional[str] = None):
+    def db_update_many(self, table: str, the_items: list, where_column: Optional[str] = None, txn=None):
         """
-        Update many rows into a given table.
+        Update many rows into a given table. Uses executemany, one statement per set of columns, all within a
+        single transaction.
 
         :param table: Table to update.
         :param the_items: The items to update.
         :param where_column: The column to use for update selection.
+        :param txn: If txn is given it will be used, otherwise a new interaction is started.
         :return: A Deferred
         """
         where_column = where_column or "id"
-
-        for item in the_items:
-            where = [f"{where_column} = {self.variable_placeholder}", item[where_column]]
-            yield self.db_update(table, item, where)
+        batches = []
+        for columns, values in self.group_rows_by_columns(the_items, where_column).items():
+            if len(columns) == 0:
+                continue
+            batches.append((self.update_statement(table, columns, where_column), values))
+        return self.db_execute_batches(batches, txn)
 
     def db_backup(self) -> None:
         """
@@ -581,39 +775,6 @@ class SQLBase(ConnectionBase):
             results[colname] = values[index]
         return results
 
-    def create_insert_segments(self, vals: Union[List[Dict[str, Any]], Dict[str, Any]]) -> Union[str, None]:
-        """
-        A helper function for "insert()". This converts a list of dictionaries or a single dictionary into
-        soemthing that be used to insert into a database. For example:
-
-        {"name": "value", "name2": "value2"} would return a string: (value, value2)
-
-        :param vals: A dictionary or list of dictionaries of values to insert.
-        """
-        def generate_values(input):
-            if len(input):
-                return "(" + ",".join([self.variable_placeholder for _ in input.items()]) + ")"
-            raise YomboWarning("sql insert has no values, skipping.")
-
-        if isinstance(vals, dict):
-            try:
-                return generate_values(vals), list(vals.values())
-            except YomboWarning:
-                return None
-        elif isinstance(vals, list):
-            result_string = []
-            result_values = []
-
-            for val in vals:
-                try:
-                    result_string.append(generate_values(val))
-                    result_values = result_values + list(val.values())
-                except YomboWarning:
-                    continue
-            if len(result_string):
-                return ", ".join(result_string), result_values
-        return None
-
     def escape_col_names(self, colnames: List[str]) -> List[str]:
         """
         Escape column names for insertion into SQL statement.
@@ -691,6 +852,17 @@ class SQLBase(ConnectionBase):
         return results
 
     @inlineCallbacks
+    def run_read_query(self, query, *args, **kwargs):
+        """
+        Same as run_query, but uses the read only connection pool if available. Only use for SELECT statements.
+
+        :param query: Query string to run.
+        :return: A Deferred that returns the results.
+        """
+        db_pool = self.db_read_pool if self.db_read_pool is not None else self.db_pool
+        results = yield db_pool.runQuery(query, *args, **kwargs)
+        return results
+
     def run_interaction(self, interaction: Callable, *args, **kwargs):
         """
         Runs an interaction using the db_pool.
@@ -700,11 +872,29 @@ class SQLBase(ConnectionBase):
         :param kwargs: KWArgs to send to interaction.
         :return:
         """
+        return self._run_pool_interaction(self.db_pool, "run_interaction", interaction, *args, **kwargs)
+
+    def run_read_interaction(self, interaction: Callable, *args, **kwargs):
+        """
+        Runs an interaction using the read only pool. If the connection doesn't have a read only pool, the
+        db_pool is used. The interaction must not modify the database.
+
+        :param interaction: The callable to use to run the interaction.
+        :param args: Arguments to send to interaction.
+        :param kwargs: KWArgs to send to interaction.
+        :return:
+        """
+        db_pool = self.db_read_pool if self.db_read_pool is not None else self.db_pool
+        return self._run_pool_interaction(db_pool, "run_read_interaction", interaction, *args, **kwargs)
+
+    @inlineCallbacks
+    def _run_pool_interaction(self, db_pool, label: str, interaction: Callable, *args, **kwargs):
+        """ Runs the interaction on the provided pool, logs any errors. """
         try:
-            results = yield self.db_pool.runInteraction(interaction, *args, **kwargs)
+            results = yield db_pool.runInteraction(interaction, *args, **kwargs)
             return results
         except Exception as e:
-            logger.error("-----------==(SQLite: run_interaction)==----------------")
+            logger.error("-----------==(SQLite: {label})==----------------", label=label)
             logger.error("{e}", e=e)
             logger.error("----------------==(call details)==----------------------")
             logger.error("interaction: {interaction}", interaction=interaction)
@@ -14,6 +14,7 @@ from typing import Any, Callable, ClassVar, Dict, List, Type, Optional, Union
 
 from twisted.enterprise import adbapi
 from twisted.internet.defer import inlineCallbacks
+from twisted.internet.task import LoopingCall
 from twisted.internet.utils import getProcessOutput
 
 from yombo.core.exceptions import YomboWarning
@@ -26,10 +27,15 @@ logger = get_logger("mixins.database_mixin.connections.sqlite")
 class SQLiteDB(SQLBase):
     """
     Modifications from SQLBase for SQLite specific items.
+
+    The database is used in WAL mode. All writes go through a single writer connection (db_pool), while
+    db_select() and other read only queries use a separate pool of read only connections (db_read_pool). This
+    allows reads to happen while a large write is in progress.
     """
     def __init__(self, parent, *args, **kwargs):
         super().__init__(parent, *args, **kwargs)
         self.variable_placeholder: ClassVar[str] = "?"
+        self.checkpoint_loop: ClassVar = None
 
     @inlineCallbacks
     def db_migrate_pre(self):
@@ -38,13 +44,44 @@ class SQLiteDB(SQLBase):
 
     @inlineCallbacks
     def db_migrate_post(self) -> None:
-        """Do actions before migration. Setup sync to 2, and chmod to databse to 600 for security."""
-        yield self.run_operation("PRAGMA synchronous=2;")
+        """
+        Do actions after migration. Setup sync to normal, enable incremental vacuum, and chmod to databse to 600
+        for security.
+        """
+        yield self.run_operation("PRAGMA synchronous=1;")
+        auto_vacuum = yield self.run_query("PRAGMA auto_vacuum;")
+        if auto_vacuum[0][0] != 2:  # 2 is incremental. Changing this requires one last full vacuum.
+            logger.info("Enabling incremental vacuum on the database, this can take a bit of time.")
+            yield self.run_operation("PRAGMA auto_vacuum=2;")
+            yield self.run_operation("VACUUM")
         yield self._Files.chmod(self._Parent.database_path, 0o600)
 
+    @inlineCallbacks
     def db_cleanup_post_process(self, **kwargs):
-        """ Do any activities to cleanup the database. """
-        return self.run_operation("VACUUM")
+        """
+        Do any activities to cleanup the database. Releases free pages in small steps instead of a full VACUUM,
+        which would block all readers and writers.
+        """
+        yield self.run_query("PRAGMA incremental_vacuum;")
+        yield self.db_checkpoint()
+
+    @inlineCallbacks
+    def db_unload(self) -> None:
+        """
+        Stops the periodic WAL checkpoint and does a final checkpoint, so the loop can't fire against a
+        closed pool while shutting down.
+        """
+        if self.checkpoint_loop is not None and self.checkpoint_loop.running:
+            self.checkpoint_loop.stop()
+        self.checkpoint_loop = None
+        if self.db_pool is not None:
+            yield self.db_checkpoint()
+
+    def db_checkpoint(self):
+        """
+        Moves the WAL contents into the database file and truncates the WAL file so it doesn't keep growing.
+        """
+        return self.run_query("PRAGMA wal_checkpoint(TRUNCATE);")
 
     @property
     def connection_string(self) -> str:
@@ -63,19 +100,54 @@ class SQLiteDB(SQLBase):
                                                  self._Parent.database_path,
                                                  check_same_thread=False,
                                                  cp_min=1,
-                                                 cp_max=1
+                                                 cp_max=1,
+                                                 cp_openfun=self._setup_write_connection,
                                                  )
         except Exception as e:
             raise YomboWarning(f"Error connecting to sqlite database: {e}")
 
-        yield self.run_operation("PRAGMA synchronous=2;")
+        # The first connection creates the database file and switches it to WAL mode. WAL mode is stored
+        # within the database file.
+        yield self.run_query("PRAGMA journal_mode=WAL;")
+
+        read_connections = self._Configs.get("database.read_connections", 3)
+        if read_connections > 0:
+            try:
+                self.db_read_pool = adbapi.ConnectionPool("sqlite3",
+                                                          f"file:{self._Parent.database_path}?mode=ro",
+                                                          uri=True,
+                                                          check_same_thread=False,
+                                                          cp_min=1,
+                                                          cp_max=read_connections,
+                                                          cp_openfun=self._setup_read_connection,
+                                                          )
+            except Exception as e:
+                raise YomboWarning(f"Error connecting to sqlite database (read pool): {e}")
+
+        self.checkpoint_loop = LoopingCall(self.db_checkpoint)
+        self.checkpoint_loop.start(self._Configs.get("database.checkpoint_interval", 900), False)
+
+    @staticmethod
+    def _setup_write_connection(connection) -> None:
+        """ Called by the connection pool for each new writer connection. """
+        connection.execute("PRAGMA journal_mode=WAL;")
+        connection.execute("PRAGMA synchronous=1;")
+
+    @staticmethod
+    def _setup_read_connection(connection) -> None:
+        """ Called by the connection pool for each new read only connection. """
+        connection.execute("PRAGMA query_only=1;")
 
+    @inlineCallbacks
     def db_optimize(self) -> None:
         """
         Rebuild the sqlite database file. For details: http://www.sqlitetutorial.net/sqlite-vacuum/
+
+        This blocks all database access while running, db_cleanup_post_process() is used for regular cleanup.
         :return:
         """
-        return self.run_operation("VACUUM")
+        yield self.run_operation("VACUUM")
+        yield self.db_checkpoint()
 
     @inlineCallbacks
     def db_list_tables(self) -> List[str]:
@@ -0,0 +1,306 @@
+"""
+A write behind queue for the database mixin. Changes are queued in memory and flushed to the database in a
+single transaction.
+
+Changes to the same row (by the id column) are coalesced into a single final operation:
+
+* insert + update -> insert with the updated values
+* update + update -> one update with all the values
+* insert + delete -> nothing, the row never reaches the database
+* update + delete -> delete
+* delete + insert -> upsert
+* delete + update -> delete, the update would not change anything
+
+The queue is flushed when it's holding too many rows, when the oldest change has waited long enough, or when
+flush() is called directly (such as during shutdown).
+
+Changes that fail to save (other than integrity errors) are put back into the queue and retried with the next
+flush. After max_retries failed flushes in a row, the changes for that table are dropped and counted in
+'dropped', so a table that keeps failing can't grow the queue forever.
+
+.. moduleauthor:: Mitch Schwenk <mitch-gw@yombo.net>
+.. versionadded:: 0.24.0
+
+:copyright: Copyright 2020 by Yombo.
+:license: LICENSE for details.
+:view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/_modules/yombo/mixins/database_mixin/write_behind.html>`_
+"""
+# Import python libraries
+from sqlite3 import IntegrityError
+from time import time
+from typing import Any, Dict, List, Optional
+
+# Import twisted libraries
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, inlineCallbacks, succeed
+
+# Import Yombo libraries
+from yombo.core.log import get_logger
+
+logger = get_logger("mixins.database_mixin.write_behind")
+
+OP_INSERT = "insert"
+OP_UPDATE = "update"
+OP_DELETE = "delete"
+OP_UPSERT = "upsert"
+
+
+class WriteBehindQueue:
+    """
+    Collects inserts, updates, and deletes per table and writes them as one grouped commit.
+    """
+    def __init__(self, database, max_pending: Optional[int] = None, max_age: Optional[float] = None,
+                 max_retries: Optional[int] = None):
+        """
+        Setup the queue.
+
+        :param database: The database connection, such as SQLiteDB.
+        :param max_pending: Flush once this many rows are waiting, default is 2000.
+        :param max_age: Flush once the oldest change is this many seconds old, default is 5.
+        :param max_retries: Drop a table's changes after this many failed flushes in a row, default is 5.
+        """
+        self.database = database
+        self.max_pending = max_pending or 2000
+        self.max_age = max_age or 5
+        self.max_retries = max_retries or 5
+        self.retries: Dict[str, int] = {}  # table -> failed flushes in a row.
+        self.dropped = 0  # Rows dropped because they failed to save too many times.
+        self.tables: Dict[str, Dict[Any, list]] = {}  # table -> {row_id: [operation, row]}
+        self.blind_inserts: Dict[str, List[dict]] = {}  # table -> rows, inserted without an id to track.
+        self.id_columns: Dict[str, str] = {}
+        self.pending = 0
+        self.oldest = None
+        self.flushing = False
+        self.flush_again = False
+        self._flush_waiters: List[Deferred] = []  # Callers of flush() waiting on the running flush.
+        self._flush_callLater = None
+
+    def __len__(self):
+        return self.pending
+
+    def add(self, table: str, operation: str, data: dict, id_column: Optional[str] = None,
+            insert_blind: Optional[bool] = None) -> None:
+        """
+        Add a change to the queue.
+
+        :param table: The table to change.
+        :param operation: One of: insert, update, delete
+        :param data: A dictionary of the row. For updates, this can be just the changed columns and the id.
+        :param id_column: The id column for the table, default is "id".
+        :param insert_blind: If true, the row is only inserted and isn't coalesced with other changes.
+        """
+        id_column = id_column or "id"
+        self.id_columns[table] = id_column
+
+        if operation == OP_INSERT and insert_blind is True:
+            if table not in self.blind_inserts:
+                self.blind_inserts[table] = []
+            self.blind_inserts[table].append(data)
+            self.pending += 1
+        else:
+            if table not in self.tables:
+                self.tables[table] = {}
+            rows = self.tables[table]
+            row_id = data[id_column]
+            if row_id not in rows:
+                rows[row_id] = [operation, data]
+                self.pending += 1
+            else:
+                self._coalesce(rows, row_id, operation, data)
+
+        if self.oldest is None:
+            self.oldest = time()
+        if self.pending >= self.max_pending:
+            self.schedule_flush()
+
+    def _coalesce(self, rows: Dict[Any, list], row_id, operation: str, data: dict) -> None:
+        """ Merge a new operation for a row that already has a pending operation. """
+        current = rows[row_id]
+        current_operation = current[0]
+        if operation == OP_DELETE:
+            if current_operation == OP_INSERT:
+                del rows[row_id]  # Never made it to the database, nothing to do.
+                self.pending -= 1
+            else:
+                rows[row_id] = [OP_DELETE, data]
+        elif current_operation == OP_DELETE:
+            if operation in (OP_INSERT, OP_UPSERT):
+                rows[row_id] = [OP_UPSERT, data]
+            # An update to a deleted row only has some of the columns, keep the delete.
+        elif operation in (OP_INSERT, OP_UPSERT) and current_operation == OP_UPDATE:
+            rows[row_id] = [OP_UPSERT, {**current[1], **data}]
+        else:  # Keep the current operation, just with the latest values.
+            current[1] = {**current[1], **data}
+
+    def check_age(self) -> None:
+        """ Flush the queue if the oldest change is old enough. Called periodically. """
+        if self.oldest is not None and time() - self.oldest >= self.max_age:
+            self.schedule_flush()
+
+    def schedule_flush(self) -> None:
+        """ Flush on the next reactor iteration. """
+        if self._flush_callLater is not None and self._flush_callLater.active():
+            return
+        self._flush_callLater = reactor.callLater(0, self.flush)
+
+    def table_batches(self, table: str, rows: Dict[Any, list], blind_rows: List[dict]) -> list:
+        """
+        Converts the pending changes for one table to a list of (query, values) batches.
+
+        :param table: The table name.
+        :param rows: The coalesced changes, {row_id: [operation, row]}.
+        :param blind_rows: Rows to insert without coalescing.
+        :return: List of batches for db_execute_batches().
+        """
+        database = self.database
+        batches = []
+        if len(rows):
+            id_column = self.id_columns[table]
+            grouped = {OP_INSERT: [], OP_UPDATE: [], OP_UPSERT: [], OP_DELETE: []}
+            for operation, data in rows.values():
+                grouped[operation].append(data)
+
+            for columns, values in database.group_rows_by_columns(grouped[OP_INSERT]).items():
+                batches.append((database.insert_statement(table, columns), values))
+            for columns, values in database.group_rows_by_columns(grouped[OP_UPSERT]).items():
+                batches.append((database.upsert_statement(table, columns, (id_column,)), values))
+            for columns, values in database.group_rows_by_columns(grouped[OP_UPDATE], id_column).items():
+                if len(columns) > 0:
+                    batches.append((database.update_statement(table, columns, id_column), values))
+            if len(grouped[OP_DELETE]):
+                batches.append((database.delete_statement(table, id_column),
+                                [[data[id_column]] for data in grouped[OP_DELETE]]))
+
+        for columns, values in database.group_rows_by_columns(blind_rows).items():
+            batches.append((database.insert_statement(table, columns), values))
+        return batches
+
+    def take_changes(self) -> Dict[str, tuple]:
+        """
+        Removes everything from the queue.
+
+        :return: Dictionary of table: (rows, blind rows), see table_batches().
+        """
+        changes = {}
+        for table, rows in self.tables.items():
+            changes[table] = (rows, [])
+        for table, rows in self.blind_inserts.items():
+            if table in changes:
+                changes[table] = (changes[table][0], rows)
+            else:
+                changes[table] = ({}, rows)
+
+        self.tables = {}
+        self.blind_inserts = {}
+        self.pending = 0
+        self.oldest = None
+        return changes
+
+    def requeue(self, table: str, rows: Dict[Any, list], blind_rows: List[dict]) -> None:
+        """
+        Puts changes that couldn't be saved back into the queue, ahead of any newer changes for the same rows.
+        If the table has already failed max_retries times in a row, the changes are dropped instead.
+
+        :param table: The table name.
+        :param rows: The coalesced changes, {row_id: [operation, row]}.
+        :param blind_rows: Rows to insert without coalescing.
+        """
+        self.retries[table] = self.retries.get(table, 0) + 1
+        if self.retries[table] > self.max_retries:
+            count = len(rows) + len(blind_rows)
+            self.dropped += count
+            del self.retries[table]
+            logger.error("Dropping {count} changes for table '{table}', still failing after {retries} retries.",
+                         count=count, table=table, retries=self.max_retries)
+            return
+
+        newer = self.tables.get(table, {})
+        self.tables[table] = rows
+        self.pending += len(rows)
+        for row_id, (operation, data) in newer.items():
+            if row_id in rows:
+                self.pending -= 1  # Both were counted, they now share a single row.
+                self._coalesce(rows, row_id, operation, data)
+            else:
+                rows[row_id] = [operation, data]
+        if len(blind_rows):
+            self.blind_inserts[table] = blind_rows + self.blind_inserts.get(table, [])
+            self.pending += len(blind_rows)
+        if self.oldest is None:
+            self.oldest = time()
+
+    @inlineCallbacks
+    def save_changes(self, changes: Dict[str, tuple]):
+        """
+        Saves the changes within a single transaction. If that fails, each table is saved within it's own
+        transaction. Tables with an integrity error are logged and dropped, like the previous bulk save did.
+        Tables that failed for any other reason are put back into the queue for the next flush.
+
+        :param changes: From take_changes().
+        """
+        batches = {table: self.table_batches(table, rows, blind_rows)
+                   for table, (rows, blind_rows) in changes.items()}
+        try:
+            yield self.database.db_execute_batches([batch for table_batches in batches.values()
+                                                    for batch in table_batches])
+            for table in batches:
+                self.retries.pop(table, None)
+            return
+        except Exception as e:
+            if len(batches) == 1 and isinstance(e, IntegrityError) is False:
+                logger.warn("Error saving write behind queue to database, will retry: {e}", e=e)
+                for table, (rows, blind_rows) in changes.items():
+                    self.requeue(table, rows, blind_rows)
+                return
+
+        for table, table_batches in batches.items():
+            try:
+                yield self.database.db_execute_batches(table_batches)
+                self.retries.pop(table, None)
+            except IntegrityError as e:
+                logger.warn("Error saving write behind queue for table '{table}', dropping changes: {e}",
+                            table=table, e=e)
+                self.retries.pop(table, None)
+                self.dropped += len(changes[table][0]) + len(changes[table][1])
+            except Exception as e:
+                logger.warn("Error saving write behind queue for table '{table}', will retry: {e}",
+                            table=table, e=e)
+                self.requeue(table, *changes[table])
+
+    def flush(self):
+        """
+        Write everything in the queue to the database. If a flush is already running, another flush is done as
+        soon as it completes.
+
+        :return: A Deferred that fires once the queue has been written, including any flush that was requested
+            while this one was running.
+        """
+        if self.flushing is True:
+            self.flush_again = True
+            waiter = Deferred()
+            self._flush_waiters.append(waiter)
+            return waiter
+        if self.pending == 0:
+            return succeed(None)
+        return self._flush()
+
+    @inlineCallbacks
+    def _flush(self):
+        """ Runs the flush loop and then fires any callers that were waiting on it. """
+        self.flushing = True
+        try:
+            while True:
+                self.flush_again = False
+                changes = self.take_changes()
+                if len(changes):
+                    yield self.save_changes(changes)
+                if self.flush_again is False:
+                    break
+        except Exception as e:
+            logger.warn("Error saving write behind queue to database: {e}", e=e)
+        finally:
+            self.flushing = False
+            waiters = self._flush_waiters
+            self._flush_waiters = []
+            for waiter in waiters:
+                waiter.callback(None)
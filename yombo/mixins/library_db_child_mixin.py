@@ -92,9 +92,26 @@ class LibraryDBChildMixin(ChildStorageAccessorsMixin):
             self.__dict__[name] = value
         elif self._sync_data_delay > 0:
             self.__dict__[name] = value
-            reactor.callLater(0.0001, self.sync_item_data)
+            if self._sync_data_callLater is None or self._sync_data_callLater.active() is False:
+                reactor.callLater(0.0001, self.sync_item_data)
         else:
             raise YomboWarning('Cannot set attribute directly, use "object.update({dict})" instead.')
+        if name[0] != "_":
+            self._storage_index_changed((name, ))
+
+    def _storage_index_changed(self, names) -> None:
+        """
+        Let the parent update it's secondary search index if any indexed attributes were changed.
+
+        :param names: Attribute names that were set.
+        """
+        index_fields = getattr(self._Parent, "_storage_index_fields", None)
+        if not index_fields:
+            return
+        fields = [name for name in names if name in index_fields]
+        if len(fields) == 0 or hasattr(self._Parent, "storage_index_item") is False:
+            return
+        self._Parent.storage_index_item(self, fields=fields)
 
     ########################
     ##   Startup Items    ##
@@ -118,6 +135,7 @@ class LibraryDBChildMixin(ChildStorageAccessorsMixin):
         self.__dict__["_meta"]["item_type"] = self._Parent._storage_label_name
 
         self._sync_data_callLater = None
+        self._sync_data_mode = 0  # Sync modes requested while waiting for the sync_data_callLater.
         self._deleted = False
         self._in_database = False
         if self._meta["load_source"] == "database":
@@ -238,6 +256,7 @@ class LibraryDBChildMixin(ChildStorageAccessorsMixin):
                     else:
                         logger.debug(f"{name} - setting via local dictionary", name=name)
                         self.__dict__[name] = value
+        self._storage_index_changed(incoming)
         self.load_attribute_values_post_process(incoming)
 
     def from_database(self, incoming):
@@ -310,6 +329,7 @@ class LibraryDBChildMixin(ChildStorageAccessorsMixin):
             else:
                 self.__dict__[name] = value
                 save_data_keys.append([name])
+        self._storage_index_changed(incoming_items)
 
         # If still loading the item, just load it and skip syncing.
         if len(save_data_keys) == 0:
@@ -454,15 +474,22 @@ class LibraryDBChildMixin(ChildStorageAccessorsMixin):
         if sync_mode is None:
             sync_mode = self._sync_compute_sync_mode(load_source)
 
+        # Changes made while a sync is pending are picked up by that sync, the values are read when it runs.
+        self._sync_data_mode |= sync_mode
         if self._sync_data_callLater is not None and self._sync_data_callLater.active():
-            self._sync_data_callLater.cancel()
+            if sync_mode & SYNC_NOW:
+                self._sync_data_callLater.reset(0.001)
+            return
         sync_delay = self._sync_data_delay
         if sync_delay in (0, None):
             sync_delay = 0.001
-        self._sync_data_callLater = reactor.callLater(sync_delay, self._do_sync_item_data, sync_mode)
+        self._sync_data_callLater = reactor.callLater(sync_delay, self._do_sync_item_data)
 
     @inlineCallbacks
     def _do_sync_item_data(self, sync_mode: Optional[int] = None):
+        if sync_mode is None:
+            sync_mode = self._sync_data_mode
+        self._sync_data_mode = 0
         if sync_mode & SYNC_TO_API:
             try:
                 if self._Entity_type == "Device":
@@ -13,6 +13,20 @@ To use this class, the following attributes must be defined within the library a
 * _storage_attribute_name - The name both the variable inside the library where data is stored and the database
   table name.
 
+**Hooks called**:
+
+Once the gateway reaches the 'libraries_started' phase (run phase 4000), loading items calls these hooks.
+Items loaded earlier, such as during startup, don't call any load hooks.
+
+* _<storage_label_name>_before_load_ - Per item, before the item is loaded. Example: _device_before_load_
+* _<storage_label_name>_loaded_ - Per item, after the item is loaded. Example: _device_loaded_
+* _<storage_attribute_name>_before_load_bulk_ - Once per load_db_items_to_memory() call, receives "items", a list
+  of {"id": item id, "data": item data}. Example: _devicecommands_before_load_bulk_
+* _<storage_attribute_name>_loaded_bulk_ - Once per load_db_items_to_memory() call, receives "items", a dictionary
+  of the loaded instances. Example: _devicecommands_loaded_bulk_
+
+The per item hooks are only called if a library or module implements them, so prefer the bulk hooks.
+
 
 .. moduleauthor:: Mitch Schwenk <mitch-gw@yombo.net>
 .. versionadded:: 0.24.0
@@ -34,7 +48,7 @@ from yombo.constants import LOCAL_SOURCES
 from yombo.core.exceptions import YomboWarning, YomboMarshmallowValidationError
 from yombo.core.log import get_logger
 from yombo.mixins.parent_storage_accessors_mixin import ParentStorageAccessorsMixin
-from yombo.utils.hookinvoke import global_invoke_all
+from yombo.utils.hookinvoke import global_invoke_all, global_hook_implemented
 
 logger = get_logger("mixins.library_db_parent_mixin")
 
@@ -154,11 +168,23 @@ class LibraryDBParentMixin(ParentStorageAccessorsMixin):
         results = yield self.load_db_items_to_memory(db_items, load_source="database")
         return results
 
+    def load_hooks_enabled(self) -> bool:
+        """
+        Returns True if the load hooks should be called. Hooks are skipped until just before
+        'libraries_started', that's when we start processing automation triggers.
+        """
+        run_phase_name, run_phase_int = self._Loader.run_phase
+        return run_phase_int >= 4000
+
     @inlineCallbacks
     def load_db_items_to_memory(self, items, load_source=None, save_into_storage: Optional[bool] = None, **kwargs):
         """
         This loads multiple items into memory, a list of pointers to the new items will be returned.
 
+        Calls the bulk hooks once for the entire list of items, "_<storage_attribute_name>_before_load_bulk_" and
+        "_<storage_attribute_name>_loaded_bulk_". Like the per item hooks, they are skipped during startup, see
+        load_hooks_enabled().
+
         :param items:
         :param load_source:
         :param save_into_storage: If false, won't save into the library storage
@@ -172,6 +198,19 @@ class LibraryDBParentMixin(ParentStorageAccessorsMixin):
         if isinstance(items, list) is False:
             items = [items]
 
+        call_hooks = self.load_hooks_enabled()
+        hook_prefix = f"_{self._Parent._storage_attribute_name}"
+        if call_hooks and global_hook_implemented(f"{hook_prefix}_before_load_bulk_"):
+            yield global_invoke_all(f"{hook_prefix}_before_load_bulk_",
+                                    called_by=self,
+                                    arguments={
+                                        "items": [
+                                            {"id": item.get(self._storage_primary_field_name, item.get("id")),
+                                             "data": item,
+                                             } for item in items],
+                                        },
+                                    )
+
         results = {}
         for item in items:
             # print(f"parent, about to call load_an_item_to_memory: {item}")
@@ -187,6 +226,14 @@ class LibraryDBParentMixin(ParentStorageAccessorsMixin):
                 continue
             # print(f"load_db_items_to_memory, instance: {instance.__dict__}")
             results[instance._primary_field_id] = instance
+
+        if call_hooks and len(results) and global_hook_implemented(f"{hook_prefix}_loaded_bulk_"):
+            yield global_invoke_all(f"{hook_prefix}_loaded_bulk_",
+                                    called_by=self,
+                                    arguments={
+                                        "items": results,
+                                        },
+                                    )
         return results
 
     def load_an_item_to_memory_pre_check(self, incoming, load_source):
@@ -279,11 +326,7 @@ class LibraryDBParentMixin(ParentStorageAccessorsMixin):
             else:
                 storage_id = incoming["id"]
 
-        run_phase_name, run_phase_int = self._Loader.run_phase
-        if run_phase_int < 4000:  # just before 'libraries_started' is when we start processing automation triggers.
-            call_hooks = False
-        else:
-            call_hooks = True
+        call_hooks = self.load_hooks_enabled()
 
         if storage_id is not None and storage_id in storage:
             raise YomboWarning(f"Cannot add {self._storage_label_name} item to memory, already exists: {storage_id}")
@@ -295,7 +338,7 @@ class LibraryDBParentMixin(ParentStorageAccessorsMixin):
                         class_storage_attribute_name=self._storage_attribute_name, e=e)
             return
 
-        if call_hooks:
+        if call_hooks and global_hook_implemented(f"_{self._Parent._storage_label_name}_before_load_"):
             yield global_invoke_all(f"_{self._Parent._storage_label_name}_before_load_",
                                     called_by=self,
                                     arguments={
@@ -331,7 +374,7 @@ class LibraryDBParentMixin(ParentStorageAccessorsMixin):
                 raise YomboWarning(f"Error while running _init_ for: {self._Parent._storage_label_name} "
                                    f"Additional details: {e}")
 
-        if call_hooks:
+        if call_hooks and global_hook_implemented(f"_{self._Parent._storage_label_name}_loaded_"):
             yield global_invoke_all(f"_{self._Parent._storage_label_name}_loaded_",
                                     called_by=self,
                                     arguments={
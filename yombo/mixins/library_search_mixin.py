@@ -9,6 +9,14 @@
 
 Add get, get_advanced, search, and search_advanced functions to libraries.
 
+Exact match lookups on the fields listed in _storage_index_fields are answered from a hash index instead of
+scanning every item. The same fields also have a trigram index so fuzzy searches only score likely candidates.
+The indexes are built on first use and kept current by LibraryDBChildMixin as attributes are set.
+
+Indexing is opt in: _storage_index_fields is empty by default. Only list fields if every item stored in the library
+is a LibraryDBChildMixin instance whose _Parent is this library, otherwise changes to the items won't reach the
+index and lookups will return stale results.
+
 .. warning::
 
    This helper module is intended for libraries, but can be adapted to modules as well.
@@ -23,6 +31,7 @@ Add get, get_advanced, search, and search_advanced functions to libraries.
 from typing import Any, ClassVar, Dict, List, Optional, Type, Union
 
 # Import Yombo libraries
+from yombo.classes.ngramindex import NGramIndex
 from yombo.core.exceptions import YomboWarning
 from yombo.utils import do_search_instance
 
@@ -33,13 +42,112 @@ class LibrarySearchMixin:
     """
     _storage_attribute_sort_key: ClassVar[str] = "label"
     _storage_attribute_sort_key_order: ClassVar[str] = "asc"
+    _storage_index_fields: ClassVar[List[str]] = []  # Opt in, see the module docstring.
+
+    def storage_index(self) -> Dict[str, Dict[Any, set]]:
+        """
+        Returns the secondary index: {field: {value: set(item_ids)}}. Builds the index on first use, and
+        picks up any items that were added or removed from storage without going through the child mixin.
+
+        :return:
+        """
+        items = getattr(self, self._storage_attribute_name)
+        if "_storage_index_data" not in self.__dict__:
+            self._storage_index_data = {field: {} for field in self._storage_index_fields}
+            self._storage_index_values = {}  # item_id -> {field: value}, as indexed.
+            self._storage_ngram_indexes = {field: NGramIndex() for field in self._storage_index_fields}
+        if len(self._storage_index_values) != len(items):
+            for item_id in [item_id for item_id in self._storage_index_values if item_id not in items]:
+                self.storage_index_remove(item_id)
+            for item_id, item in items.items():
+                if item_id not in self._storage_index_values:
+                    self.storage_index_item(item, item_id=item_id)
+        return self._storage_index_data
+
+    def storage_index_item(self, item, fields: Optional[List[str]] = None, item_id: Optional[str] = None) -> None:
+        """
+        Add an item to the secondary index, or update it's entries after attributes have changed. Does nothing
+        until the index has been built.
 
-    def get(self, item_requested):
+        :param item: The item instance.
+        :param fields: Only update these fields, default is all indexed fields.
+        :param item_id: The storage ID for the item, default is the item's primary field.
+        """
+        if "_storage_index_data" not in self.__dict__:
+            return
+        if item_id is None:
+            item_id = getattr(item, self._storage_primary_field_name, None)
+            if item_id is None:
+                return
+        if fields is None:
+            fields = self._storage_index_fields
+
+        indexed = self._storage_index_values.setdefault(item_id, {})
+        for field in fields:
+            if field not in self._storage_index_data:
+                continue
+            value = getattr(item, field, None)
+            if field in indexed:
+                if indexed[field] == value:
+                    continue
+                self._storage_index_discard(field, indexed[field], item_id)
+            indexed[field] = value
+            self._storage_ngram_indexes[field].add(item_id, value)
+            try:
+                self._storage_index_data[field].setdefault(value, set()).add(item_id)
+            except TypeError:  # Unhashable values can only be found with a scan.
+                pass
+
+    def storage_index_remove(self, item_id: str) -> None:
+        """
+        Remove an item from the secondary index.
+
+        :param item_id: The storage ID for the item.
+        """
+        if "_storage_index_data" not in self.__dict__ or item_id not in self._storage_index_values:
+            return
+        for field, value in self._storage_index_values.pop(item_id).items():
+            self._storage_index_discard(field, value, item_id)
+            self._storage_ngram_indexes[field].remove(item_id)
+
+    def _storage_index_discard(self, field: str, value: Any, item_id: str) -> None:
+        """ Remove a single index entry, dropping the value once it's empty. """
+        try:
+            item_ids = self._storage_index_data[field].get(value)
+        except TypeError:
+            return
+        if item_ids is not None:
+            item_ids.discard(item_id)
+            if len(item_ids) == 0:
+                del self._storage_index_data[field][value]
+
+    def storage_index_find(self, field: str, value: Any) -> Dict[str, Any]:
+        """
+        Exact match lookup of an indexed field.
+
+        :param field: An attribute listed in _storage_index_fields.
+        :param value: The value to match.
+        :return: Dictionary of matching items, may be empty.
+        """
+        items = getattr(self, self._storage_attribute_name)
+        try:
+            item_ids = self.storage_index()[field].get(value, ())
+        except TypeError:
+            return {item_id: item for item_id, item in items.items() if getattr(item, field, None) == value}
+        results = {}
+        for item_id in tuple(item_ids):
+            item = items.get(item_id)
+            if item is not None and getattr(item, field, None) == value:
+                results[item_id] = item
+        return results
+
+    def get(self, item_requested, limiter=None):
         """
         Get an item by it's ID or machine_label. Unlike search(), this doesn't use any fuzzy logic to search
-        for the requested item. This is a wrapper for get_advanced().
+        for the requested item unless a limiter is provided. This is a wrapper for get_advanced().
 
         :param item_requested: The item ID or machine label to get.
+        :param limiter: If set, and no exact match is found, return the best search() result above this ratio.
         :return:
         """
         items_to_search = getattr(self, self._storage_attribute_name)
@@ -68,38 +176,64 @@ class LibrarySearchMixin:
         try:
             return self.get_advanced(criteria, multiple=False)
         except KeyError:
+            if limiter is None:
+                raise KeyError(f"No matching {self._storage_attribute_name} found: {item_requested}")
+
+        try:
+            return next(iter(self.search(item_requested, limiter=limiter, max_results=1).values()))
+        except (KeyError, StopIteration):
             raise KeyError(f"No matching {self._storage_attribute_name} found: {item_requested}")
 
-    def get_advanced(self, criteria, multiple=None):
+    def get_advanced(self, criteria, multiple=None, match_all=None):
         """
         Searching through the items looking for exact matches using various criteria.
 
-        If multiple is True, returns a dictionary of items; otherwise returns the single item.
+        If multiple is True, returns a dictionary of items; otherwise returns the single item. By default, an
+        item matches if any of the criteria match, set match_all to True to require all of them. Fields
+        in _storage_index_fields are looked up from the index, any others are scanned.
 
         self._Nodes.get_advanced({"item_type": "scene"})
         self._Commands.get_advanced({"machine_label": "on"})
+        self._Devices.get_advanced({"device_type_id": "abc", "label": "Porch"}, match_all=True)
 
         :param criteria: A dictionary of elements and values to search for.
         :param multiple: If multiple items should be returned, default is False.
+        :param match_all: If true, items must match every criteria, default is False.
         :return:
         """
         items_to_search = getattr(self, self._storage_attribute_name)
         if multiple is None:
             multiple = True
+
+        # Indexed fields first, so a single item request can usually return before any scan.
+        keys = sorted((key for key in criteria if key in self._storage_search_fields),
+                      key=lambda key: key not in self._storage_index_fields)
+        matches = []
+        for key in keys:
+            value = criteria[key]
+            if key in self._storage_index_fields:
+                found = self.storage_index_find(key, value)
+            else:
+                found = {item_id: item for item_id, item in items_to_search.items() if value == getattr(item, key)}
+            if match_all is not True and multiple is False and len(found):
+                return next(iter(found.values()))
+            matches.append(found)
+
         results = {}
-        for item_id, item in items_to_search.items():
-            for key, value in criteria.items():
-                if key not in self._storage_search_fields:
-                    continue
+        if match_all is True:
+            if len(matches):
+                matches.sort(key=len)
+                results = matches[0]
+                for found in matches[1:]:
+                    results = {item_id: item for item_id, item in results.items() if item_id in found}
+        else:
+            for found in matches:
+                results.update(found)
 
-                if value == getattr(item, key):
-                    if multiple is False:
-                        return item
-                    results[item_id] = item
         if len(results) == 0:
-            # for item_id, item in items_to_search.items():
-            #     print(f"Searching: {item_id}: {item.__dict__}")
             raise KeyError(f"No matching {self._storage_attribute_name} found.")
+        if multiple is False:
+            return next(iter(results.values()))
         return results
 
     def search(self, item_requested, limiter=None, max_results=None, status=None):
@@ -220,6 +354,11 @@ class LibrarySearchMixin:
         :rtype: dict
         """
         items_to_search = getattr(self, self._storage_attribute_name)
+        indexes = None
+        if len(self._storage_index_fields):  # Only libraries that opted in keep their index current.
+            self.storage_index()  # Make sure the ngram indexes have every item.
+            indexes = {field: index for field, index in self._storage_ngram_indexes.items()
+                       if field in self._storage_search_fields}
 
         try:
             # logger.debug("item.search() is about to call do_search_instance...: %s" % item_requested)
@@ -232,6 +371,7 @@ class LibrarySearchMixin:
                                          required_value=required_value,
                                          ignore_field=ignore_field,
                                          ignore_value=ignore_value,
+                                         indexes=indexes,
                                          )
             # logger.debug("found item by search: others: {others}", others=others)
             if results["was_found"]:
@@ -27,9 +27,10 @@ from twisted.internet import reactor
 from twisted.internet.defer import inlineCallbacks
 
 # Import Yombo libraries
+from yombo.classes.topictrie import TopicDict
 from yombo.constants import SENTINEL
 from yombo.core.exceptions import YomboWarning, YomboHookStopProcessing
-from yombo.utils import pattern_search, is_true_false, get_yombo_instance_type
+from yombo.utils import is_true_false, get_yombo_instance_type
 from yombo.utils.caller import caller_string
 import yombo.utils.converters as converters
 from yombo.utils.hookinvoke import global_invoke_all
@@ -62,6 +63,49 @@ class SystemDataParentMixin:
     values.
     """
     _storage_pickled_fields: ClassVar[Dict[str, str]] = {"value": "msgpack"}  # preserve int/string/dict/etc.
+    _access_counts: Optional[Dict[tuple, int]] = None  # (gateway_id, key) -> reads since the last flush.
+    _access_flush_callLater = None
+    _coalesce_windows: Optional[Dict[str, float]] = None  # key -> seconds, overrides the configured default.
+    _coalesce_default: Optional[float] = None
+    _coalesce_until: Optional[Dict[tuple, float]] = None  # (gateway_id, key) -> end of the current window.
+    _coalesce_pending: Optional[Dict[tuple, dict]] = None  # (gateway_id, key) -> held set() arguments.
+
+    def record_access(self, gateway_id: str, key: str) -> None:
+        """
+        Count a read of a data item. Reads are only counted here, last_access_at and the statistics are
+        updated by flush_access_counts() on a timer, so reading a value doesn't mark it as changed.
+
+        :param gateway_id:
+        :param key:
+        """
+        counts = self._access_counts
+        if counts is None:
+            counts = self._access_counts = {}
+        access_key = (gateway_id, key)
+        if access_key in counts:
+            counts[access_key] += 1
+            return
+        counts[access_key] = 1
+        if self._access_flush_callLater is None or self._access_flush_callLater.active() is False:
+            interval = self._Configs.get(f"{self._storage_attribute_name}.access_flush_interval", 60, False)
+            self._access_flush_callLater = reactor.callLater(interval, self.flush_access_counts)
+
+    def flush_access_counts(self) -> None:
+        """
+        Save the read counts collected by record_access(): sets last_access_at once for every item read since
+        the last flush and adds the total to the get statistic.
+        """
+        counts = self._access_counts
+        self._access_counts = {}
+        if not counts:
+            return
+        data = getattr(self, self._storage_attribute_name)
+        now = int(time())
+        for (gateway_id, key) in counts:
+            if gateway_id in data and key in data[gateway_id]:
+                data[gateway_id][key].update({"last_access_at": now}, broadcast=False)
+        self._Statistics.increment(f"lib.{self._storage_attribute_name}.get", count=sum(counts.values()),
+                                   bucket_size=15, anon=True)
 
     def __delitem__(self, item_requested):
         """
@@ -220,6 +264,9 @@ class SystemDataParentMixin:
         """
         Get the value of a given data item (key).
 
+        If a value for the item is being held by it's coalescing window, the held value is returned. The
+        instance (instance=True) always has the last value that set_yield() accepted.
+
         :raises KeyError: Raised when request is not found.
         :param item_requested: Name of data item to retrieve.
         :param default: Default value to return in a data instance if the requested item is missing.
@@ -237,28 +284,30 @@ class SystemDataParentMixin:
         if gateway_id not in data:
             raise KeyError(f"gateway_id '{gateway_id}' not found in '{self._storage_attribute_name}'")
 
-        self._Statistics.increment(f"lib.{self._storage_attribute_name}.get", bucket_size=15, anon=True)
-        if any(s in item_requested for s in ["#", "+"]):
+        if "#" in item_requested or "+" in item_requested:
             if gateway_id not in data:
                 return {}
-            results = pattern_search(item_requested, data[gateway_id])
-            if len(results) > 1:
+            results = data[gateway_id].search(item_requested)
+            if len(results) > 0:
                 values = {}
                 for item in results:
                     if instance is True:
                         values[item] = data[gateway_id][item]
                     else:
-                        values[item] = data[gateway_id][item].value
+                        values[item] = self.coalesce_value(gateway_id, item, data[gateway_id][item].value)
                 return values
             else:
                 raise KeyError(f"Searched for {self._storage_attribute_name}, none found: {item_requested}")
 
-        if item_requested in data[gateway_id]:
-            data[gateway_id][item_requested]. update({"last_access_at": int(time())})
+        items = data[gateway_id]
+        if item_requested in items:
+            self.record_access(gateway_id, item_requested)
             if instance is True:
-                return data[gateway_id][item_requested]
+                return items[item_requested]
             else:
-                return data[gateway_id][item_requested].value
+                return self.coalesce_value(gateway_id, item_requested, items[item_requested].value)
+        elif instance is not True and (gateway_id, item_requested) in (self._coalesce_pending or {}):
+            return self.coalesce_value(gateway_id, item_requested)
         elif default is SENTINEL:
             raise KeyError(f"'{item_requested}' not found in '{self._storage_label_name}'")
         else:
@@ -268,6 +317,112 @@ class SystemDataParentMixin:
             else:
                 return default
 
+    def set_coalesce_window(self, key: str, window: Optional[float]) -> None:
+        """
+        Set the coalescing window for a data item. When the item is set several times within the window,
+        only the first and the latest values go through set_yield(), the values in between are dropped.
+
+        :param key: Name of the data item.
+        :param window: Seconds, 0 to disable, None to use the configured default.
+        """
+        if self._coalesce_windows is None:
+            self._coalesce_windows = {}
+        if window is None:
+            self._coalesce_windows.pop(key, None)
+        else:
+            self._coalesce_windows[key] = window
+
+    def coalesce_window(self, key: str) -> float:
+        """
+        Returns the coalescing window, in seconds, for a data item. The default comes from the
+        '<states|atoms>.coalesce_window' config, which is 0 (disabled).
+
+        :param key: Name of the data item.
+        """
+        if self._coalesce_windows is not None and key in self._coalesce_windows:
+            return self._coalesce_windows[key]
+        if self._coalesce_default is None:
+            self._coalesce_default = self._Configs.get(f"{self._storage_attribute_name}.coalesce_window", 0, False)
+        return self._coalesce_default
+
+    def coalesce_set(self, key: str, gateway_id: Optional[str], arguments: dict) -> bool:
+        """
+        Check if a set() should be held because the item was already set within it's coalescing window.
+        Held values are not set in memory, the latest one is sent to set_yield() when the window ends so
+        the preset hooks can still reject it. Until then, get() returns the held value, see coalesce_value().
+
+        :param key: Name of the data item.
+        :param gateway_id:
+        :param arguments: The arguments for set_yield().
+        :return: True if the value was held.
+        """
+        window = self.coalesce_window(key)
+        if not window:
+            return False
+        if gateway_id is None:
+            gateway_id = self._gateway_id
+        if self._coalesce_until is None:
+            self._coalesce_until = {}
+            self._coalesce_pending = {}
+        pending_key = (gateway_id, key)
+        now = time()
+        pending = self._coalesce_pending.get(pending_key)
+        if pending is None:
+            if now >= self._coalesce_until.get(pending_key, 0):
+                self._coalesce_until[pending_key] = now + window
+                return False
+            self._coalesce_pending[pending_key] = {
+                "arguments": arguments,
+                "call_later": reactor.callLater(self._coalesce_until[pending_key] - now,
+                                                self.coalesce_flush, pending_key),
+            }
+        else:
+            pending["arguments"] = arguments
+        return True
+
+    def coalesce_value(self, gateway_id: str, key: str, default: Optional[Any] = None) -> Any:
+        """
+        Returns the latest held value for a data item, or the default if nothing is held. If the preset hooks
+        reject the held value when it's flushed, get() goes back to returning the value in memory.
+
+        :param gateway_id:
+        :param key: Name of the data item.
+        :param default: Returned if no value is held, usually the value in memory.
+        """
+        if self._coalesce_pending is None:
+            return default
+        pending = self._coalesce_pending.get((gateway_id, key))
+        if pending is None:
+            return default
+        return pending["arguments"]["value"]
+
+    def coalesce_flush(self, pending_key: tuple):
+        """
+        The coalescing window has ended, send the latest held value to set_yield(). This starts a new window.
+
+        set_yield() compares the held value against the value in memory, which is always the last value it
+        accepted, so a value that ended up back where it started isn't saved again.
+
+        :param pending_key: (gateway_id, key)
+        """
+        pending = self._coalesce_pending.pop(pending_key, None)
+        if pending is None:
+            return
+        if pending["call_later"].active():
+            pending["call_later"].cancel()
+        self._coalesce_until[pending_key] = time() + self.coalesce_window(pending_key[1])
+        return self.set_yield(pending_key[1], **pending["arguments"])
+
+    @inlineCallbacks
+    def coalesce_flush_all(self):
+        """
+        Send every held value to set_yield(), called when stopping so held values aren't lost.
+        """
+        if self._coalesce_pending is None:
+            return
+        for pending_key in list(self._coalesce_pending):
+            yield self.coalesce_flush(pending_key)
+
     def set(self, key, value, value_human=None, value_type=None, gateway_id=None,
             request_by: Optional[str] = None, request_by_type: Optional[str] = None,
             request_context: Optional[str] = None,
@@ -305,10 +460,21 @@ class SystemDataParentMixin:
         :return: Data item instance
         :rtype: instance
         """
-        reactor.callLater(0.0001, self.set_yield, key, value, value_human=value_human, value_type=value_type,
-                          gateway_id=gateway_id, request_by=request_by, request_by_type=request_by_type,
-                          request_context=request_context, authentication=authentication, created_at=created_at,
-                          updated_at=updated_at)
+        arguments = {
+            "value": value,
+            "value_human": value_human,
+            "value_type": value_type,
+            "gateway_id": gateway_id,
+            "request_by": request_by,
+            "request_by_type": request_by_type,
+            "request_context": request_context,
+            "authentication": authentication,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+        if self.coalesce_set(key, gateway_id, arguments):
+            return
+        reactor.callLater(0.0001, self.set_yield, key, **arguments)
 
     @inlineCallbacks
     def set_yield(self, key, value, value_human=None, value_type=None, gateway_id=None,
@@ -361,7 +527,7 @@ class SystemDataParentMixin:
         data = getattr(self, self._storage_attribute_name)
 
         if gateway_id not in data:
-            data[gateway_id] = {}
+            data[gateway_id] = TopicDict()
 
         if updated_at is None:
             updated_at = int(time())
@@ -475,6 +641,8 @@ class SystemDataParentMixin:
         :param item_id:
         :return:
         """
+        if instance.gateway_id not in storage:
+            storage[instance.gateway_id] = TopicDict()
         storage[instance.gateway_id][item_id] = instance
 
     @inlineCallbacks
@@ -291,7 +291,7 @@ def percentile(data_list, percent, key=lambda x:x):
 
 def do_search_instance(attributes, haystack, allowed_keys, limiter=None, max_results=None,
                        required_field=None, required_value=None,
-                       ignore_field=None, ignore_value=None):
+                       ignore_field=None, ignore_value=None, indexes=None):
     """
     Does the actual search of the devices. It scans through each item in haystack, and searches for any
     supplied attributes using fuzzy logic. The limiter (either specified in the attributes or the limiter
@@ -304,7 +304,8 @@ def do_search_instance(attributes, haystack, allowed_keys, limiter=None, max_res
     :param attributes: Either a list of dictionaries containing: field, value, limiter or a dictionary
       containing field:values to match.
     :type attributes: list of dictionaries, or a dictionary of attributes/value.
-    :param operation: Set weather to all matching, or highest matching. Either "any" or "highest".
+    :param indexes: Optional dictionary of field: NGramIndex, keyed by the haystack keys. Only the candidates
+      from the index are scored for these fields, other fields are checked against every item.
     """
     if limiter is None:
         limiter = .90
@@ -354,16 +355,23 @@ def do_search_instance(attributes, haystack, allowed_keys, limiter=None, max_res
 
     key_list = []
 
-    for item_id, item in haystack.items():
-        if ignore_field is not None:
-            if getattr(item, ignore_field) == ignore_value:
-                continue
-        if required_field is not None:
-            if getattr(item, required_field) != required_value:
+    for attr in attributes:
+        if indexes is not None and attr["field"] in indexes:
+            candidates = indexes[attr["field"]].candidates(attr["value"], limiter)
+            items = [(item_id, haystack[item_id]) for item_id in candidates if item_id in haystack]
+        else:
+            items = haystack.items()
+        stringDiff.set_seq2(str(attr["value"]))  # SequenceMatcher caches details about the second sequence.
+        for item_id, item in items:
+            if ignore_field is not None:
+                if getattr(item, ignore_field) == ignore_value:
+                    continue
+            if required_field is not None:
+                if getattr(item, required_field) != required_value:
+                    continue
+            stringDiff.set_seq1(str(getattr(item, attr["field"])))
+            if stringDiff.real_quick_ratio() < limiter or stringDiff.quick_ratio() < limiter:
                 continue
-        for attr in attributes:
-            stringDiff.set_seq1(str(attr["value"]))
-            stringDiff.set_seq2(str(getattr(item, attr["field"])))
             ratio = stringDiff.ratio()
 
             if ratio < limiter:
@@ -9,8 +9,38 @@ Determine who called a function.
 :view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/_modules/yombo/utils.html>`_
 """
 # Import python libraries
-import inspect
+from contextlib import contextmanager
+from contextvars import ContextVar
 import sys
+from typing import Dict, Optional, Tuple
+
+# The request context string, if set with caller_context(). When set, the call stack isn't inspected.
+CALLER_CONTEXT: ContextVar = ContextVar("caller_context", default=None)
+
+# Code object -> (module name, method name, if the method has a "self" local)
+_CODE_DETAILS: Dict = {}
+# (code object, class name) -> string, so the string is only built once per caller.
+_CALLER_STRINGS: Dict[Tuple, str] = {}
+
+
+@contextmanager
+def caller_context(context: str):
+    """
+    Set the caller string for everything called within the block, including anything called by it. Use at a
+    request or module boundary so caller_string() doesn't have to inspect the call stack.
+
+    .. code-block:: python
+
+       with caller_context("f=yombo.lib.webinterface,m=api_devices"):
+           device.set_state(...)
+
+    :param context: The string caller_string() should return.
+    """
+    token = CALLER_CONTEXT.set(context)
+    try:
+        yield
+    finally:
+        CALLER_CONTEXT.reset(token)
 
 
 def caller_string(offset=None, prefix=None):
@@ -29,11 +59,56 @@ def caller_string(offset=None, prefix=None):
     if this function was called within yombo.lib.module.somemodule and want to get the method
     that directly called it, use offset "1".  If the previous caller is desired, use 2, etc.
 
+    If a context was set using caller_context() and no offset was requested, that is returned instead.
+
     :param offset: How far back to go in the stack. Default is 1, use 0 for current function.
     :param prefix: What to prefix the string with: Ex,"g=<gw_id>"
     :return:
     """
-    return caller(offset=offset, prefix=prefix)["string"]
+    context = CALLER_CONTEXT.get()
+    if context is None or offset is not None:
+        offset = offset if isinstance(offset, int) else 1
+        context = _frame_details(sys._getframe(offset))[3]
+    if prefix is not None:
+        return f"{prefix},{context}"
+    return context
+
+
+def _frame_details(frame) -> Tuple[str, str, Optional[str], str]:
+    """
+    Returns the module name, method name, class name, and caller string for a frame. Details are cached by the
+    frame's code object, so repeated calls from the same place don't need to look anything up again.
+
+    :param frame:
+    :return:
+    """
+    code = frame.f_code
+    try:
+        module_name, method, has_self = _CODE_DETAILS[code]
+    except KeyError:
+        module_name = frame.f_globals.get("__name__", None)
+        if module_name is None:
+            module_name = "__unknown__"
+        method = code.co_name
+        has_self = "self" in code.co_varnames or "self" in code.co_cellvars or "self" in code.co_freevars
+        _CODE_DETAILS[code] = (module_name, method, has_self)
+
+    class_name = None
+    if has_self:
+        instance = frame.f_locals.get("self", None)
+        if instance is not None:
+            class_name = instance.__class__.__name__
+
+    key = (code, class_name)
+    try:
+        string = _CALLER_STRINGS[key]
+    except KeyError:
+        if class_name is None:
+            string = f"f={module_name},m={method}"
+        else:
+            string = f"f={module_name},c={class_name},m={method}"
+        _CALLER_STRINGS[key] = string
+    return module_name, method, class_name, string
 
 
 def caller(offset=None, prefix=None):
@@ -56,18 +131,14 @@ def caller(offset=None, prefix=None):
     """
     offset = offset if isinstance(offset, int) else 1
     offset = offset + 1
-    calling_frame = sys._getframe(offset)
-    mod = inspect.getmodule(calling_frame)
+    module_name, method, class_name, string = _frame_details(sys._getframe(offset))
     results = {
-        "file": mod.__name__,
-        "method": calling_frame.f_code.co_name,
+        "file": module_name,
+        "method": method,
     }
-    if "self" in calling_frame.f_locals:
-        results["class"] = calling_frame.f_locals['self'].__class__.__name__
-        results["string"] = f"f={mod.__name__},c={calling_frame.f_locals['self'].__class__.__name__}" \
-                            f",m={calling_frame.f_code.co_name}"
-    else:
-        results["string"] = f"f={mod.__name__},m={calling_frame.f_code.co_name}"
+    if class_name is not None:
+        results["class"] = class_name
+    results["string"] = string
     if prefix is not None:
         results["string"] = f"{prefix},{results['string']}"
         results["prefix"] = prefix
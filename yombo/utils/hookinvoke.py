@@ -9,31 +9,42 @@ and modules.
 :license: See LICENSE for details.
 :view-source: `View Source Code <https://yombo.net/docs/gateway/html/current/_modules/yombo/hookinvoke.html>`_
 """
-from twisted.internet.defer import inlineCallbacks
+from typing import Optional
+
+from twisted.internet.defer import inlineCallbacks, DeferredList
 
 from yombo.utils.dictionaries import recursive_dict_merge
 
 
 @inlineCallbacks
-def global_invoke_all(hook, called_by, **kwargs):
+def global_invoke_all(hook, called_by, concurrent: Optional[bool] = None, timeout: Optional[float] = None, **kwargs):
     """
     Call all hooks in libraries and modules. Basically a shortcut for calling module_invoke_all and libraries_invoke_all
     methods.
 
+    If concurrent is True, the library and module hooks are all fired at the same time instead of one after
+    another, unless the hook has been set as ordered with the loader's set_hook_options() or stop_on_error is True.
+
     :param hook: The hook name to call.
     :param called_by: Reference of the caller.
+    :param concurrent: If True, call all hooks at the same time.
+    :param timeout: Seconds each hook is allowed to run.
     :param kwargs: kwargs to send to the function.
     :return: a dictionary of results.
     """
     # print(f"global_invoke_all: {hook}, {called_by}, {kwargs}")
-    lib_results = yield get_component("yombo.lib.loader").invoke_all("library",
-                                                                     hook,
-                                                                     called_by=called_by,
-                                                                     **kwargs)
-    modules_results = yield get_component("yombo.lib.loader").invoke_all("module",
-                                                                         hook,
-                                                                         called_by=called_by,
-                                                                         **kwargs)
+    loader = get_component("yombo.lib.loader")
+    if concurrent is True and kwargs.get("stop_on_error", False) is not True and loader.hook_is_ordered(hook) is False:
+        responses = yield DeferredList([
+            loader.invoke_all("library", hook, called_by=called_by, concurrent=True, timeout=timeout, **kwargs),
+            loader.invoke_all("module", hook, called_by=called_by, concurrent=True, timeout=timeout, **kwargs),
+            ], consumeErrors=True)
+        lib_results = responses[0][1] if responses[0][0] else {}
+        modules_results = responses[1][1] if responses[1][0] else {}
+        return recursive_dict_merge(modules_results, lib_results)
+
+    lib_results = yield loader.invoke_all("library", hook, called_by=called_by, timeout=timeout, **kwargs)
+    modules_results = yield loader.invoke_all("module", hook, called_by=called_by, timeout=timeout, **kwargs)
     return recursive_dict_merge(modules_results, lib_results)
 
 
@@ -75,6 +86,16 @@ def global_invoke_modules(hook, called_by, **kwargs):
     return modules_results
 
 
+def global_hook_implemented(hook):
+    """
+    Checks if any library or module implements the hook.
+
+    :param hook: The hook name to check.
+    :return: True if at least one library or module implements the hook.
+    """
+    return get_component("yombo.lib.loader").hook_implemented(hook)
+
+
 def get_component(name):
     """
     Return loaded component (module or library). This can be used to find